@@ -14,4 +14,7 @@
 
 
 from .compiler import Compiler
+from ._compile_cache import CompileCache
+from ._profiler import CompileProfiler
+from ._workflow_analyzer import WorkflowAnalysis, analyze_workflow
 from ..containers._component_builder import build_python_component, build_docker_image, VersionedDependency
\ No newline at end of file
@@ -0,0 +1,285 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__all__ = [
+    'CompileCache',
+]
+
+import hashlib
+import inspect
+import json
+import os
+import sys
+import sysconfig
+import time
+import warnings
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Text
+
+from ._k8s_helper import convert_k8s_obj_to_json
+from .. import dsl
+
+
+CACHE_DIR_ENV_VAR = 'KFP_COMPILE_CACHE_DIR'
+
+_WORKFLOW_FILE_SUFFIX = '.workflow.json'
+_YAML_FILE_SUFFIX = '.pipeline.yaml'
+
+
+class CompileCache:
+    '''On-disk cache of compiled workflows.
+
+    The cache is opt-in. Pass an instance to the compiler to enable it:
+
+        compiler.Compiler(cache=compiler.CompileCache('/tmp/kfp-cache')).compile(my_pipeline, 'pipeline.tar.gz')
+
+    The cache key is a content hash of the pipeline function source, the source file that defines it,
+    the source files of the modules, functions and classes that the pipeline function and its helper
+    functions reference (except the standard library, the installed packages and kfp), the specs of the
+    components that the pipeline function references, the PipelineConf, the compile arguments and the
+    compiler version.
+    Anything else that changes the DSL function behavior (e.g. the environment, the installed packages
+    or files read by the function) is not part of the key, so clear the cache when such inputs change.
+
+    Cache entries are evicted when they are older than max_age_seconds or, least recently used first,
+    when the total cache size exceeds max_size_bytes.
+    '''
+    def __init__(self, cache_dir: Text = None, max_size_bytes: int = 256 * 1024 * 1024, max_age_seconds: int = 7 * 24 * 60 * 60):
+        '''Creates a compile cache.
+
+        Args:
+            cache_dir: Directory where the cache entries are stored. Defaults to the value of the KFP_COMPILE_CACHE_DIR environment variable or ~/.cache/kfp/compiler.
+            max_size_bytes: Maximum total size of the cache entries.
+            max_age_seconds: Maximum age of a cache entry since it was last used.
+        '''
+        cache_dir = cache_dir or os.environ.get(CACHE_DIR_ENV_VAR) or os.path.join('~', '.cache', 'kfp', 'compiler')
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.max_size_bytes = max_size_bytes
+        self.max_age_seconds = max_age_seconds
+
+    def make_key(
+        self,
+        pipeline_func: Callable,
+        pipeline_name: Text = None,
+        pipeline_description: Text = None,
+        params_list: List[dsl.PipelineParam] = None,
+        pipeline_conf: dsl.PipelineConf = None,
+    ) -> Optional[Text]:
+        '''Calculates the cache key for compiling the pipeline function.
+
+        Returns:
+            The key or None if the pipeline function source is not available (e.g. it was defined interactively). Such pipelines are not cached.
+        '''
+        import kfp
+        try:
+            func_source = inspect.getsource(pipeline_func)
+            func_file_path = inspect.getsourcefile(pipeline_func)
+        except (OSError, TypeError):
+            return None
+        if not func_file_path or not os.path.isfile(func_file_path):
+            return None
+
+        key_data = {
+            'compiler_version': kfp.__version__,
+            'type_check': kfp.TYPE_CHECK,
+            'func_source': func_source,
+            'func_file_hash': _calculate_file_hash(func_file_path),
+            'referenced_file_hashes': _get_referenced_source_file_hashes(pipeline_func),
+            'component_specs': _get_referenced_component_specs(pipeline_func),
+            'pipeline_name': pipeline_name,
+            'pipeline_description': pipeline_description,
+            'params': [
+                (param.name, _to_json_or_str(param.value), _to_json_or_str(param.param_type))
+                for param in params_list or []
+            ],
+            'pipeline_conf': _pipeline_conf_to_struct(pipeline_conf) if pipeline_conf else None,
+        }
+        key_doc = json.dumps(key_data, sort_keys=True, default=str)
+        return hashlib.sha256(key_doc.encode('utf-8')).hexdigest()
+
+    def get_workflow(self, key: Text) -> Optional[Dict[Text, Any]]:
+        '''Returns the cached workflow dict or None if it's not in the cache.'''
+        text = self._read(key + _WORKFLOW_FILE_SUFFIX)
+        return json.loads(text) if text is not None else None
+
+    def put_workflow(self, key: Text, workflow: Dict[Text, Any]):
+        self._write(key + _WORKFLOW_FILE_SUFFIX, json.dumps(workflow, sort_keys=True))
+
+    def get_yaml(self, key: Text) -> Optional[Text]:
+        '''Returns the cached workflow YAML text or None if it's not in the cache.'''
+        return self._read(key + _YAML_FILE_SUFFIX)
+
+    def put_yaml(self, key: Text, yaml_text: Text):
+        self._write(key + _YAML_FILE_SUFFIX, yaml_text)
+
+    def clear(self):
+        for path in self._entry_paths():
+            path.unlink()
+
+    def evict(self):
+        '''Removes the expired entries and then the least recently used entries until the cache fits in max_size_bytes.'''
+        now = time.time()
+        entries = []
+        for path in self._entry_paths():
+            stat = path.stat()
+            if now - stat.st_mtime > self.max_age_seconds:
+                path.unlink()
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total_size <= self.max_size_bytes:
+                break
+            path.unlink()
+            total_size -= size
+
+    def _entry_paths(self) -> List[Path]:
+        if not self.cache_dir.is_dir():
+            return []
+        return [
+            path for path in self.cache_dir.iterdir()
+            if path.name.endswith(_WORKFLOW_FILE_SUFFIX) or path.name.endswith(_YAML_FILE_SUFFIX)
+        ]
+
+    def _read(self, file_name: Text) -> Optional[Text]:
+        path = self.cache_dir / file_name
+        try:
+            text = path.read_text()
+            # Updating the modification time which is used as the last access time for eviction.
+            # The entry can be evicted by a concurrent compilation after it's read, so this can fail too.
+            os.utime(str(path))
+        except OSError:
+            return None
+        return text
+
+    def _write(self, file_name: Text, text: Text):
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # Writing to a temporary file first so that concurrent compilations never read partial entries.
+            path = self.cache_dir / file_name
+            tmp_path = self.cache_dir / (file_name + '.' + str(os.getpid()) + '.tmp')
+            tmp_path.write_text(text)
+            os.replace(str(tmp_path), str(path))
+            self.evict()
+        except OSError as e:
+            warnings.warn('Failed to write the compile cache entry "{}": {}'.format(file_name, e))
+
+
+def _calculate_file_hash(file_path: Text) -> Text:
+    with open(file_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _to_json_or_str(obj):
+    return json.dumps(obj, sort_keys=True, default=str)
+
+
+def _callable_to_struct(func: Callable):
+    try:
+        return inspect.getsource(func)
+    except (OSError, TypeError):
+        return getattr(func, '__qualname__', repr(func))
+
+
+def _pipeline_conf_to_struct(pipeline_conf: dsl.PipelineConf):
+    return {
+        key: (
+            [_callable_to_struct(func) for func in value] if key == 'op_transformers'
+            else convert_k8s_obj_to_json(value)
+        )
+        for key, value in pipeline_conf.__dict__.items()
+    }
+
+
+def _get_referenced_component_specs(pipeline_func: Callable) -> List[Text]:
+    '''Returns the serialized specs of the components referenced by name in the pipeline function.'''
+    try:
+        closure_vars = inspect.getclosurevars(inspect.unwrap(pipeline_func))
+    except TypeError:
+        return []
+    referenced_values = dict(closure_vars.globals)
+    referenced_values.update(closure_vars.nonlocals)
+    component_specs = []
+    for name, value in sorted(referenced_values.items(), key=lambda item: item[0]):
+        component_spec = getattr(value, 'component_spec', None)
+        if component_spec is not None and hasattr(component_spec, 'to_dict'):
+            component_specs.append(name + ':' + json.dumps(component_spec.to_dict(), sort_keys=True))
+    return component_specs
+
+
+def _get_referenced_source_file_hashes(pipeline_func: Callable) -> List[List[Text]]:
+    '''Returns the [module name, file hash] pairs of the source files that the pipeline function references.
+
+    The modules, functions and classes referenced by the pipeline function globals are included. The
+    functions and the functions of the referenced modules are followed recursively, so the modules used
+    by the helper functions are included too.
+    The standard library, the installed packages and kfp are skipped since they only change with the environment.
+    '''
+    skipped_dirs = _get_skipped_source_dirs()
+    module_names = set()
+    visited_func_ids = set()
+    visited_module_names = set()
+
+    def add_referenced_values(func):
+        func = inspect.unwrap(func)
+        if id(func) in visited_func_ids:
+            return
+        visited_func_ids.add(id(func))
+        try:
+            closure_vars = inspect.getclosurevars(func)
+        except TypeError:
+            return
+        for value in list(closure_vars.globals.values()) + list(closure_vars.nonlocals.values()):
+            if inspect.ismodule(value):
+                module_name = value.__name__
+            elif inspect.isfunction(value) or inspect.isclass(value):
+                module_name = getattr(value, '__module__', None)
+            else:
+                continue
+            module = sys.modules.get(module_name)
+            module_file = getattr(module, '__file__', None)
+            if not module_file or module_file.endswith(('.so', '.pyd')) or _is_in_dirs(module_file, skipped_dirs):
+                continue
+            module_names.add(module_name)
+            if inspect.isfunction(value):
+                add_referenced_values(value)
+            elif inspect.ismodule(value) and module_name not in visited_module_names:
+                visited_module_names.add(module_name)
+                # The pipeline can call any function of the module, so all of them are followed.
+                for module_value in list(vars(value).values()):
+                    if inspect.isfunction(module_value) and module_value.__module__ == module_name:
+                        add_referenced_values(module_value)
+
+    add_referenced_values(pipeline_func)
+    file_hashes = []
+    for module_name in sorted(module_names):
+        module_file = sys.modules[module_name].__file__
+        if module_file.endswith('.pyc'):
+            module_file = module_file[:-1]
+        if os.path.isfile(module_file):
+            file_hashes.append([module_name, _calculate_file_hash(module_file)])
+    return file_hashes
+
+
+def _get_skipped_source_dirs() -> List[Text]:
+    import kfp
+    paths = sysconfig.get_paths()
+    dirs = {paths[name] for name in ('stdlib', 'platstdlib', 'purelib', 'platlib') if name in paths}
+    dirs.add(os.path.dirname(kfp.__file__))
+    return [os.path.realpath(dir) for dir in dirs]
+
+
+def _is_in_dirs(file_path: Text, dirs: List[Text]) -> bool:
+    file_path = os.path.realpath(file_path)
+    return any(file_path.startswith(dir + os.sep) for dir in dirs)
@@ -1,12 +1,12 @@
 import copy
-import json
 import re
 from typing import List, Optional, Set
 
-def fix_big_data_passing(workflow: dict) -> dict:
+def fix_big_data_passing(workflow: dict, in_place: bool = False) -> dict:
     '''fix_big_data_passing converts a workflow where some artifact data is passed as parameters and converts it to a workflow where this data is passed as artifacts.
     Args:
         workflow: The workflow to fix
+        in_place: Whether to modify the passed workflow instead of a deep copy. The compiler owns the workflow it has just created, so it can skip copying the whole workflow.
     Returns:
         The fixed workflow
 
@@ -26,27 +26,70 @@ def fix_big_data_passing(workflow: dict) -> dict:
     4. Convert the inputs, outputs and arguments based on how they're consumed downstream.
     '''
 
-    workflow = copy.deepcopy(workflow)
+    if not in_place:
+        workflow = copy.deepcopy(workflow)
     templates = workflow['spec']['templates']
 
-    container_templates = [template for template in workflow['spec']['templates'] if 'container' in template]
-    dag_templates = [template for template in workflow['spec']['templates'] if 'dag' in template]
-    resource_templates = [template for template in workflow['spec']['templates'] if 'resource' in template]  # TODO: Handle these
-    resource_template_names = set(template['name'] for template in resource_templates)
+    index = DataPassingIndex()
+    # Steps 1 and 2
+    for template in templates:
+        index.add_template(template)
+    # Step 3
+    index.propagate()
+    # Step 4
+    for template in templates:
+        index.rewrite_template(template)
+    index.rewrite_workflow_arguments(workflow['spec'])
+    return workflow
 
-    # 1. Index the DAGs to understand how data is being passed and which inputs/outputs are connected to each other.
-    template_input_to_parent_dag_inputs = {} # (task_template_name, task_input_name) -> Set[(dag_template_name, dag_input_name)]
-    template_input_to_parent_task_outputs = {} # (task_template_name, task_input_name) -> Set[(upstream_template_name, upstream_output_name)]
-    template_input_to_parent_constant_arguments = {} #(task_template_name, task_input_name) -> Set[argument_value] # Unused
-    dag_output_to_parent_template_outputs = {} # (dag_template_name, output_name) -> Set[(upstream_template_name, upstream_output_name)]
 
-    for template in dag_templates:
+class DataPassingIndex:
+    '''Index of the data passing between the workflow templates. See fix_big_data_passing.
+
+    The index only keeps the template/input/output names, so the templates can be added and rewritten one at a time.
+    All templates must be added before calling propagate and the templates must be rewritten after that.
+    '''
+    def __init__(self):
+        self.template_input_to_parent_dag_inputs = {} # (task_template_name, task_input_name) -> Set[(dag_template_name, dag_input_name)]
+        self.template_input_to_parent_task_outputs = {} # (task_template_name, task_input_name) -> Set[(upstream_template_name, upstream_output_name)]
+        self.template_input_to_parent_constant_arguments = {} #(task_template_name, task_input_name) -> Set[argument_value] # Unused
+        self.dag_output_to_parent_template_outputs = {} # (dag_template_name, output_name) -> Set[(upstream_template_name, upstream_output_name)]
+        self.resource_template_names = set()
+
+        self.inputs_directly_consumed_as_parameters = set()
+        self.inputs_directly_consumed_as_artifacts = set()
+        self.outputs_directly_consumed_as_parameters = set()
+
+        self.inputs_consumed_as_parameters = set()
+        self.inputs_consumed_as_artifacts = set()
+        self.outputs_consumed_as_parameters = set()
+        self.outputs_consumed_as_artifacts = set()
+
+    def add_template(self, template: dict):
+        '''Indexes how the template passes the data (step 1) and which inputs it consumes directly (step 2). The template is not modified.'''
+        if 'dag' in template:
+            self._add_dag_template(template)
+        if 'resource' in template:
+            self.resource_template_names.add(template['name'])  # TODO: Handle these
+        if 'container' in template or 'resource' in template:
+            self._add_container_or_resource_template(template)
+
+    def _add_dag_template(self, template: dict):
+        # 1. Index the DAGs to understand how data is being passed and which inputs/outputs are connected to each other.
         dag_template_name = template['name']
         # Indexing task arguments
         dag_tasks = template['dag']['tasks']
         task_name_to_template_name = {task['name']: task['template'] for task in dag_tasks}
         for task in dag_tasks:
             task_template_name = task['template']
+            # We do not care about the inputs mentioned in task arguments since we will be free to switch them from parameters to artifacts
+            # TODO: Handle cases where argument value is a string containing placeholders (not just consisting of a single placeholder) or the input name contains placeholder
+            task_placeholders = set()
+            for key, value in task.items():
+                if key != 'arguments':
+                    _add_all_placeholders(key, task_placeholders)
+                    _add_all_placeholders(value, task_placeholders)
+
             parameter_arguments = task.get('arguments', {}).get('parameters', {})
             for parameter_argument in parameter_arguments:
                 task_input_name = parameter_argument['name']
@@ -54,7 +97,8 @@ def fix_big_data_passing(workflow: dict) -> dict:
 
                 argument_placeholder_parts = deconstruct_single_placeholder(argument_value)
                 if not argument_placeholder_parts: # Argument is considered to be constant string
-                    template_input_to_parent_constant_arguments.setdefault((task_template_name, task_input_name), set()).add(argument_value)
+                    self.template_input_to_parent_constant_arguments.setdefault((task_template_name, task_input_name), set()).add(argument_value)
+                    continue
 
                 placeholder_type = argument_placeholder_parts[0]
                 if placeholder_type not in ('inputs', 'outputs', 'tasks', 'steps', 'workflow', 'pod', 'item'):
@@ -63,26 +107,26 @@ def fix_big_data_passing(workflow: dict) -> dict:
                 if placeholder_type == 'inputs':
                     assert argument_placeholder_parts[1] == 'parameters'
                     dag_input_name = argument_placeholder_parts[2]
-                    template_input_to_parent_dag_inputs.setdefault((task_template_name, task_input_name), set()).add((dag_template_name, dag_input_name))
+                    self.template_input_to_parent_dag_inputs.setdefault((task_template_name, task_input_name), set()).add((dag_template_name, dag_input_name))
                 elif placeholder_type == 'tasks':
                     upstream_task_name = argument_placeholder_parts[1]
                     assert argument_placeholder_parts[2] == 'outputs'
                     assert argument_placeholder_parts[3] == 'parameters'
                     upstream_output_name = argument_placeholder_parts[4]
                     upstream_template_name = task_name_to_template_name[upstream_task_name]
-                    template_input_to_parent_task_outputs.setdefault((task_template_name, task_input_name), set()).add((upstream_template_name, upstream_output_name))
+                    self.template_input_to_parent_task_outputs.setdefault((task_template_name, task_input_name), set()).add((upstream_template_name, upstream_output_name))
                 elif placeholder_type == 'item' or placeholder_type == 'workflow' or placeholder_type == 'pod':
                     # Treat loop variables as constant values
                     # workflow.parameters.* placeholders are not supported, but the DSL compiler does not produce those.
-                    template_input_to_parent_constant_arguments.setdefault((task_template_name, task_input_name), set()).add(argument_value)
+                    self.template_input_to_parent_constant_arguments.setdefault((task_template_name, task_input_name), set()).add(argument_value)
                 else:
                     raise AssertionError
 
                 dag_input_name = extract_input_parameter_name(argument_value)
                 if dag_input_name:
-                    template_input_to_parent_dag_inputs.setdefault((task_template_name, task_input_name), set()).add((dag_template_name, dag_input_name))
+                    self.template_input_to_parent_dag_inputs.setdefault((task_template_name, task_input_name), set()).add((dag_template_name, dag_input_name))
                 else:
-                    template_input_to_parent_constant_arguments.setdefault((task_template_name, task_input_name), set()).add(argument_value)
+                    self.template_input_to_parent_constant_arguments.setdefault((task_template_name, task_input_name), set()).add(argument_value)
 
             # Indexing DAG outputs (Does DSL compiler produce them?)
             for dag_output in task.get('outputs', {}).get('parameters', {}):
@@ -100,42 +144,14 @@ def fix_big_data_passing(workflow: dict) -> dict:
                     assert argument_placeholder_parts[3] == 'parameters'
                     upstream_output_name = argument_placeholder_parts[4]
                     upstream_template_name = task_name_to_template_name[upstream_task_name]
-                    dag_output_to_parent_template_outputs.setdefault((dag_template_name, dag_output_name), set()).add((upstream_template_name, upstream_output_name))
+                    self.dag_output_to_parent_template_outputs.setdefault((dag_template_name, dag_output_name), set()).add((upstream_template_name, upstream_output_name))
                 elif placeholder_type == 'item' or placeholder_type == 'workflow' or placeholder_type == 'pod':
                     raise RuntimeError('DAG output value "{}" is not supported.'.format(output_value))
                 else:
                     raise AssertionError('Unexpected placeholder type "{}".'.format(placeholder_type))
-    # Finshed indexing the DAGs
-
-    # 2. Search for direct data consumers in container/resource templates and some DAG task attributes (e.g. conditions and loops) to find out which inputs are directly consumed as parameters/artifacts.
-    inputs_directly_consumed_as_parameters = set()
-    inputs_directly_consumed_as_artifacts = set()
-    outputs_directly_consumed_as_parameters = set()
 
-    # Searching for artifact input consumers in container template inputs
-    for template in container_templates:
-        template_name = template['name']
-        for input_artifact in template.get('inputs', {}).get('artifacts', {}):
-            raw_data = input_artifact['raw']['data'] # The structure must exist
-            # The raw data must be a single input parameter reference. Otherwise (e.g. it's a string or a string with multiple inputs) we should not do the conversion to artifact passing.
-            input_name = extract_input_parameter_name(raw_data)
-            if input_name:
-                inputs_directly_consumed_as_artifacts.add((template_name, input_name))
-                del input_artifact['raw'] # Deleting the "default value based" data passing hack so that it's replaced by the "argument based" way of data passing.
-                input_artifact['name'] = input_name # The input artifact name should be the same as the original input parameter name
-    
-    # Searching for parameter input consumers in DAG templates (.when, .withParam, etc)
-    for template in dag_templates:
-        template_name = template['name']
-        dag_tasks = template['dag']['tasks']
-        task_name_to_template_name = {task['name']: task['template'] for task in dag_tasks}
-        for task in template['dag']['tasks']:
-            # We do not care about the inputs mentioned in task arguments since we will be free to switch them from parameters to artifacts
-            # TODO: Handle cases where argument value is a string containing placeholders (not just consisting of a single placeholder) or the input name contains placeholder
-            task_without_arguments = task.copy() # Shallow copy
-            task_without_arguments.pop('arguments', None)
-            placeholders = extract_all_placeholders(task_without_arguments)
-            for placeholder in placeholders:
+            # 2. Search for parameter input consumers in DAG task attributes (.when, .withParam, etc)
+            for placeholder in task_placeholders:
                 parts = placeholder.split('.')
                 placeholder_type = parts[0]
                 if placeholder_type not in ('inputs', 'outputs', 'tasks', 'steps', 'workflow', 'pod', 'item'):
@@ -144,7 +160,7 @@ def fix_big_data_passing(workflow: dict) -> dict:
                 if placeholder_type == 'inputs':
                     if parts[1] == 'parameters':
                         input_name = parts[2]
-                        inputs_directly_consumed_as_parameters.add((template_name, input_name))
+                        self.inputs_directly_consumed_as_parameters.add((dag_template_name, input_name))
                     else:
                         raise AssertionError
                 elif placeholder_type == 'tasks':
@@ -153,7 +169,7 @@ def fix_big_data_passing(workflow: dict) -> dict:
                     assert parts[3] == 'parameters'
                     upstream_output_name = parts[4]
                     upstream_template_name = task_name_to_template_name[upstream_task_name]
-                    outputs_directly_consumed_as_parameters.add((upstream_template_name, upstream_output_name))
+                    self.outputs_directly_consumed_as_parameters.add((upstream_template_name, upstream_output_name))
                 elif placeholder_type == 'workflow' or placeholder_type == 'pod':
                     pass
                 elif placeholder_type == 'item':
@@ -161,10 +177,30 @@ def fix_big_data_passing(workflow: dict) -> dict:
                 else:
                     raise AssertionError('Unexpected placeholder type "{}".'.format(placeholder_type))
 
-    # Searching for parameter input consumers in container and resource templates
-    for template in container_templates + resource_templates:
+    def _add_container_or_resource_template(self, template: dict):
+        # 2. Search for direct data consumers in container/resource templates
         template_name = template['name']
-        placeholders = extract_all_placeholders(template)
+
+        # Searching for artifact input consumers in container template inputs
+        converted_input_artifacts = []
+        if 'container' in template:
+            for input_artifact in template.get('inputs', {}).get('artifacts', {}):
+                raw_data = input_artifact['raw']['data'] # The structure must exist
+                # The raw data must be a single input parameter reference. Otherwise (e.g. it's a string or a string with multiple inputs) we should not do the conversion to artifact passing.
+                input_name = extract_input_parameter_name(raw_data)
+                if input_name:
+                    self.inputs_directly_consumed_as_artifacts.add((template_name, input_name))
+                    converted_input_artifacts.append(input_artifact)
+
+        # Searching for parameter input consumers in container and resource templates
+        # The raw data of the converted input artifacts is removed by rewrite_template, so it's not searched.
+        removed_raw_data = [input_artifact.pop('raw') for input_artifact in converted_input_artifacts]
+        try:
+            placeholders = extract_all_placeholders(template)
+        finally:
+            for input_artifact, raw in zip(converted_input_artifacts, removed_raw_data):
+                input_artifact['raw'] = raw
+
         for placeholder in placeholders:
             parts = placeholder.split('.')
             placeholder_type = parts[0]
@@ -177,7 +213,7 @@ def fix_big_data_passing(workflow: dict) -> dict:
             elif placeholder_type == 'inputs':
                 if parts[1] == 'parameters':
                     input_name = parts[2]
-                    inputs_directly_consumed_as_parameters.add((template_name, input_name))
+                    self.inputs_directly_consumed_as_parameters.add((template_name, input_name))
                 elif parts[1] == 'artifacts':
                     raise AssertionError('Found unexpected Argo input artifact placeholder in container template: {}'.format(placeholder))
                 else:
@@ -185,190 +221,216 @@ def fix_big_data_passing(workflow: dict) -> dict:
             else:
                 raise AssertionError('Found unexpected Argo placeholder in container template: {}'.format(placeholder))
 
-    # Finished indexing data consumers
-
-    # 3. Propagate the consumption information upstream to all inputs/outputs all the way up to the data producers.
-    inputs_consumed_as_parameters = set()
-    inputs_consumed_as_artifacts = set()
-
-    outputs_consumed_as_parameters = set()
-    outputs_consumed_as_artifacts = set()
-
-    def mark_upstream_ios_of_input(template_input, marked_inputs, marked_outputs):
-        # Stopping if the input has already been visited to save time and handle recursive calls
-        if template_input in marked_inputs:
-            return
-        marked_inputs.add(template_input)
-
-        upstream_inputs = template_input_to_parent_dag_inputs.get(template_input, [])
-        for upstream_input in upstream_inputs:
-            mark_upstream_ios_of_input(upstream_input, marked_inputs, marked_outputs)
-
-        upstream_outputs = template_input_to_parent_task_outputs.get(template_input, [])
-        for upstream_output in upstream_outputs:
-            mark_upstream_ios_of_output(upstream_output, marked_inputs, marked_outputs)
-
-    def mark_upstream_ios_of_output(template_output, marked_inputs, marked_outputs):
-        # Stopping if the output has already been visited to save time and handle recursive calls
-        if template_output in marked_outputs:
-            return
-        marked_outputs.add(template_output)
-
-        upstream_outputs = dag_output_to_parent_template_outputs.get(template_output, [])
-        for upstream_output in upstream_outputs:
-            mark_upstream_ios_of_output(upstream_output, marked_inputs, marked_outputs)
-
-    for input in inputs_directly_consumed_as_parameters:
-        mark_upstream_ios_of_input(input, inputs_consumed_as_parameters, outputs_consumed_as_parameters)
-    for input in inputs_directly_consumed_as_artifacts:
-        mark_upstream_ios_of_input(input, inputs_consumed_as_artifacts, outputs_consumed_as_artifacts)
-    for output in outputs_directly_consumed_as_parameters:
-        mark_upstream_ios_of_output(output, inputs_consumed_as_parameters, outputs_consumed_as_parameters)
-
-
-    # 4. Convert the inputs, outputs and arguments based on how they're consumed downstream.
-
-    # Container templates already output all data as artifacts, so we do not need to convert their outputs to artifacts. (But they also output data as parameters and we need to fix that.)
-
-    # Convert DAG argument passing from parameter to artifacts as needed
-    for template in dag_templates:
-        # Converting DAG inputs
-        inputs = template.get('inputs', {})
-        input_parameters = inputs.get('parameters', [])
-        input_artifacts = inputs.setdefault('artifacts', []) # Should be empty
-        for input_parameter in input_parameters:
-            input_name = input_parameter['name']
-            if (template['name'], input_name) in inputs_consumed_as_artifacts:
-                input_artifacts.append({
-                    'name': input_name,
-                })
-
-        # Converting DAG outputs
-        outputs = template.get('outputs', {})
-        output_parameters = outputs.get('parameters', [])
-        output_artifacts = outputs.setdefault('artifacts', []) # Should be empty
-        for output_parameter in output_parameters:
-            output_name = output_parameter['name']
-            if (template['name'], output_name) in outputs_consumed_as_artifacts:
-                parameter_reference_placeholder = output_parameter['valueFrom']['parameter']
-                output_artifacts.append({
-                    'name': output_name,
-                    'from': parameter_reference_placeholder.replace('.parameters.', '.artifacts.'),
-                })
+    def propagate(self):
+        '''Propagates the consumption information upstream to all inputs/outputs all the way up to the data producers (step 3).'''
+        def mark_upstream_ios_of_input(template_input, marked_inputs, marked_outputs):
+            # Stopping if the input has already been visited to save time and handle recursive calls
+            if template_input in marked_inputs:
+                return
+            marked_inputs.add(template_input)
+
+            upstream_inputs = self.template_input_to_parent_dag_inputs.get(template_input, [])
+            for upstream_input in upstream_inputs:
+                mark_upstream_ios_of_input(upstream_input, marked_inputs, marked_outputs)
+
+            upstream_outputs = self.template_input_to_parent_task_outputs.get(template_input, [])
+            for upstream_output in upstream_outputs:
+                mark_upstream_ios_of_output(upstream_output, marked_inputs, marked_outputs)
+
+        def mark_upstream_ios_of_output(template_output, marked_inputs, marked_outputs):
+            # Stopping if the output has already been visited to save time and handle recursive calls
+            if template_output in marked_outputs:
+                return
+            marked_outputs.add(template_output)
+
+            upstream_outputs = self.dag_output_to_parent_template_outputs.get(template_output, [])
+            for upstream_output in upstream_outputs:
+                mark_upstream_ios_of_output(upstream_output, marked_inputs, marked_outputs)
+
+        for input in self.inputs_directly_consumed_as_parameters:
+            mark_upstream_ios_of_input(input, self.inputs_consumed_as_parameters, self.outputs_consumed_as_parameters)
+        for input in self.inputs_directly_consumed_as_artifacts:
+            mark_upstream_ios_of_input(input, self.inputs_consumed_as_artifacts, self.outputs_consumed_as_artifacts)
+        for output in self.outputs_directly_consumed_as_parameters:
+            mark_upstream_ios_of_output(output, self.inputs_consumed_as_parameters, self.outputs_consumed_as_parameters)
+
+    def rewrite_template(self, template: dict):
+        '''Converts the inputs, outputs and arguments of the template based on how they're consumed downstream (step 4). The template is modified in place.'''
+        inputs_consumed_as_parameters = self.inputs_consumed_as_parameters
+        inputs_consumed_as_artifacts = self.inputs_consumed_as_artifacts
+        outputs_consumed_as_parameters = self.outputs_consumed_as_parameters
+        outputs_consumed_as_artifacts = self.outputs_consumed_as_artifacts
+        is_container_template = 'container' in template
+        is_dag_template = 'dag' in template
+
+        # Container templates already output all data as artifacts, so we do not need to convert their outputs to artifacts. (But they also output data as parameters and we need to fix that.)
+        if is_container_template:
+            for input_artifact in template.get('inputs', {}).get('artifacts', {}):
+                input_name = extract_input_parameter_name(input_artifact['raw']['data'])
+                if input_name:
+                    del input_artifact['raw'] # Deleting the "default value based" data passing hack so that it's replaced by the "argument based" way of data passing.
+                    input_artifact['name'] = input_name # The input artifact name should be the same as the original input parameter name
+
+        # Convert DAG argument passing from parameter to artifacts as needed
+        if is_dag_template:
+            # Converting DAG inputs
+            inputs = template.get('inputs', {})
+            input_parameters = inputs.get('parameters', [])
+            input_artifacts = inputs.setdefault('artifacts', []) # Should be empty
+            for input_parameter in input_parameters:
+                input_name = input_parameter['name']
+                if (template['name'], input_name) in inputs_consumed_as_artifacts:
+                    input_artifacts.append({
+                        'name': input_name,
+                    })
+
+            # Converting DAG outputs
+            outputs = template.get('outputs', {})
+            output_parameters = outputs.get('parameters', [])
+            output_artifacts = outputs.setdefault('artifacts', []) # Should be empty
+            for output_parameter in output_parameters:
+                output_name = output_parameter['name']
+                if (template['name'], output_name) in outputs_consumed_as_artifacts:
+                    parameter_reference_placeholder = output_parameter['valueFrom']['parameter']
+                    output_artifacts.append({
+                        'name': output_name,
+                        'from': parameter_reference_placeholder.replace('.parameters.', '.artifacts.'),
+                    })
+
+            # Converting DAG task arguments
+            tasks = template.get('dag', {}).get('tasks', [])
+            for task in tasks:
+                task_arguments = task.get('arguments', {})
+                parameter_arguments = task_arguments.get('parameters', [])
+                artifact_arguments = task_arguments.setdefault('artifacts', [])
+                for parameter_argument in parameter_arguments:
+                    input_name = parameter_argument['name']
+                    if (task['template'], input_name) in inputs_consumed_as_artifacts:
+                        argument_value = parameter_argument['value'] # argument parameters always use "value"; output parameters always use "valueFrom" (container/DAG/etc)
+                        argument_placeholder_parts = deconstruct_single_placeholder(argument_value)
+                        # If the argument is consumed as artifact downstream:
+                        # Pass DAG inputs and DAG/container task outputs as usual;
+                        # Everything else (constant strings, loop variables, resource task outputs) is passed as raw artifact data. Argo properly replaces placeholders in it.
+                        if argument_placeholder_parts and argument_placeholder_parts[0] in ['inputs', 'tasks'] and not (argument_placeholder_parts[0] == 'tasks' and argument_placeholder_parts[1] in self.resource_template_names):
+                            artifact_arguments.append({
+                                'name': input_name,
+                                'from': argument_value.replace('.parameters.', '.artifacts.'),
+                            })
+                        else:
+                            artifact_arguments.append({
+                                'name': input_name,
+                                'raw': {
+                                    'data': argument_value,
+                                },
+                            })
+
+        if is_container_template or is_dag_template:
+            # Remove input parameters unless they're used downstream. This also removes unused container template inputs if any.
+            inputs = template.get('inputs', {})
+            inputs['parameters'] = [
+                input_parameter
+                for input_parameter in inputs.get('parameters', [])
+                if (template['name'], input_parameter['name']) in inputs_consumed_as_parameters
+            ]
 
-        # Converting DAG task arguments
-        tasks = template.get('dag', {}).get('tasks', [])
-        for task in tasks:
-            task_arguments = task.get('arguments', {})
-            parameter_arguments = task_arguments.get('parameters', [])
-            artifact_arguments = task_arguments.setdefault('artifacts', [])
-            for parameter_argument in parameter_arguments:
-                input_name = parameter_argument['name']
-                if (task['template'], input_name) in inputs_consumed_as_artifacts:
-                    argument_value = parameter_argument['value'] # argument parameters always use "value"; output parameters always use "valueFrom" (container/DAG/etc)
-                    argument_placeholder_parts = deconstruct_single_placeholder(argument_value)
-                    # If the argument is consumed as artifact downstream:
-                    # Pass DAG inputs and DAG/container task outputs as usual;
-                    # Everything else (constant strings, loop variables, resource task outputs) is passed as raw artifact data. Argo properly replaces placeholders in it.
-                    if argument_placeholder_parts and argument_placeholder_parts[0] in ['inputs', 'tasks'] and not (argument_placeholder_parts[0] == 'tasks' and argument_placeholder_parts[1] in resource_template_names):
-                        artifact_arguments.append({
-                            'name': input_name,
-                            'from': argument_value.replace('.parameters.', '.artifacts.'),
-                        })
-                    else:
-                        artifact_arguments.append({
-                            'name': input_name,
-                            'raw': {
-                                'data': argument_value,
-                            },
-                        })
-
-    # Remove input parameters unless they're used downstream. This also removes unused container template inputs if any.
-    for template in container_templates + dag_templates:
-        inputs = template.get('inputs', {})
-        inputs['parameters'] = [
-            input_parameter
-            for input_parameter in inputs.get('parameters', [])
-            if (template['name'], input_parameter['name']) in inputs_consumed_as_parameters
-        ]
-
-    # Remove output parameters unless they're used downstream
-    for template in container_templates + dag_templates:
-        outputs = template.get('outputs', {})
-        outputs['parameters'] = [
-            output_parameter
-            for output_parameter in outputs.get('parameters', [])
-            if (template['name'], output_parameter['name']) in outputs_consumed_as_parameters
-        ]
-
-    # Remove DAG parameter arguments unless they're used downstream
-    for template in dag_templates:
-        tasks = template.get('dag', {}).get('tasks', [])
-        for task in tasks:
-            task_arguments = task.get('arguments', {})
-            task_arguments['parameters'] = [
-                parameter_argument
-                for parameter_argument in task_arguments.get('parameters', [])
-                if (task['template'], parameter_argument['name']) in inputs_consumed_as_parameters
+            # Remove output parameters unless they're used downstream
+            outputs = template.get('outputs', {})
+            outputs['parameters'] = [
+                output_parameter
+                for output_parameter in outputs.get('parameters', [])
+                if (template['name'], output_parameter['name']) in outputs_consumed_as_parameters
             ]
-    
-    # Fix Workflow parameter arguments that are consumed as artifacts downstream
-    # 
-    workflow_spec = workflow['spec']
-    entrypoint_template_name = workflow_spec['entrypoint']
-    workflow_arguments = workflow_spec['arguments']
-    parameter_arguments = workflow_arguments.get('parameters', [])
-    artifact_arguments = workflow_arguments.get('artifacts', []) # Should be empty
-    for parameter_argument in parameter_arguments:
-        input_name = parameter_argument['name']
-        if (entrypoint_template_name, input_name) in inputs_consumed_as_artifacts:
-            artifact_arguments.append({
-                'name': input_name,
-                'raw': {
-                    'data': '{{workflow.parameters.' + input_name + '}}',
-                },
-            })
-    if artifact_arguments:
-        workflow_arguments['artifacts'] = artifact_arguments
-
-    clean_up_empty_workflow_structures(workflow)
-    return workflow
+
+        # Remove DAG parameter arguments unless they're used downstream
+        if is_dag_template:
+            tasks = template.get('dag', {}).get('tasks', [])
+            for task in tasks:
+                task_arguments = task.get('arguments', {})
+                task_arguments['parameters'] = [
+                    parameter_argument
+                    for parameter_argument in task_arguments.get('parameters', [])
+                    if (task['template'], parameter_argument['name']) in inputs_consumed_as_parameters
+                ]
+
+        _clean_up_empty_template_structures(template)
+
+    def rewrite_workflow_arguments(self, workflow_spec: dict):
+        '''Fixes the Workflow parameter arguments that are consumed as artifacts downstream.'''
+        entrypoint_template_name = workflow_spec['entrypoint']
+        workflow_arguments = workflow_spec['arguments']
+        parameter_arguments = workflow_arguments.get('parameters', [])
+        artifact_arguments = workflow_arguments.get('artifacts', []) # Should be empty
+        for parameter_argument in parameter_arguments:
+            input_name = parameter_argument['name']
+            if (entrypoint_template_name, input_name) in self.inputs_consumed_as_artifacts:
+                artifact_arguments.append({
+                    'name': input_name,
+                    'raw': {
+                        'data': '{{workflow.parameters.' + input_name + '}}',
+                    },
+                })
+        if artifact_arguments:
+            workflow_arguments['artifacts'] = artifact_arguments
 
 
 def clean_up_empty_workflow_structures(workflow: dict):
     templates = workflow['spec']['templates']
     for template in templates:
-        inputs = template.setdefault('inputs', {})
-        if not inputs.setdefault('parameters', []):
-            del inputs['parameters']
-        if not inputs.setdefault('artifacts', []):
-            del inputs['artifacts']
-        if not inputs:
-            del template['inputs']
-        outputs = template.setdefault('outputs', {})
-        if not outputs.setdefault('parameters', []):
-            del outputs['parameters']
-        if not outputs.setdefault('artifacts', []):
-            del outputs['artifacts']
-        if not outputs:
-            del template['outputs']
-        if 'dag' in template:
-            for task in template['dag'].get('tasks', []):
-                arguments = task.setdefault('arguments', {})
-                if not arguments.setdefault('parameters', []):
-                    del arguments['parameters']
-                if not arguments.setdefault('artifacts', []):
-                    del arguments['artifacts']
-                if not arguments:
-                    del task['arguments']
+        _clean_up_empty_template_structures(template)
+
+
+def _clean_up_empty_template_structures(template: dict):
+    inputs = template.setdefault('inputs', {})
+    if not inputs.setdefault('parameters', []):
+        del inputs['parameters']
+    if not inputs.setdefault('artifacts', []):
+        del inputs['artifacts']
+    if not inputs:
+        del template['inputs']
+    outputs = template.setdefault('outputs', {})
+    if not outputs.setdefault('parameters', []):
+        del outputs['parameters']
+    if not outputs.setdefault('artifacts', []):
+        del outputs['artifacts']
+    if not outputs:
+        del template['outputs']
+    if 'dag' in template:
+        for task in template['dag'].get('tasks', []):
+            arguments = task.setdefault('arguments', {})
+            if not arguments.setdefault('parameters', []):
+                del arguments['parameters']
+            if not arguments.setdefault('artifacts', []):
+                del arguments['artifacts']
+            if not arguments:
+                del task['arguments']
+
+
+_PLACEHOLDER_REGEX = re.compile('{{([-._a-zA-Z0-9]+)}}')
 
 
 def extract_all_placeholders(template: dict) -> Set[str]:
-    template_str = json.dumps(template)
-    placeholders = set(re.findall('{{([-._a-zA-Z0-9]+)}}', template_str))
+    placeholders = set()
+    _add_all_placeholders(template, placeholders)
     return placeholders
 
 
+def _add_all_placeholders(obj, placeholders: Set[str]):
+    '''Adds the placeholders found in all strings (including the dict keys) of a JSON-like structure.
+    Walks the structure instead of serializing it to JSON and scanning the whole text, so only the strings that can contain placeholders are searched.
+    '''
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, str):
+            if '{{' in obj:
+                placeholders.update(_PLACEHOLDER_REGEX.findall(obj))
+        elif isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+
+
 def extract_input_parameter_name(s: str) -> Optional[str]:
     match = re.fullmatch('{{inputs.parameters.([-_a-zA-Z0-9]+)}}', s) 
     if not match:
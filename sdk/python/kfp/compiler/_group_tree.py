@@ -0,0 +1,169 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import itertools
+from collections import defaultdict
+from typing import List, Text, Tuple
+
+from ..dsl._ops_group import OpsGroup, ParallelFor
+from ..dsl._pipeline_param import PipelineParam
+
+
+class GroupTreeIndex(object):
+  """Index over the ops group tree of a pipeline.
+
+  The index is built with a single iterative walk over the tree which produces
+  all the maps that the compiler needs to generate the DAG templates:
+    groups: opsgroup name -> opsgroup, including the root group and excluding
+            the recursive opsgroups (same as Compiler._get_groups).
+    op_groups: op/recursive opsgroup name -> list of ancestor group names
+               including the op itself (same as Compiler._get_groups_for_ops).
+    opsgroup_groups: opsgroup name -> list of ancestor group names including the
+               opsgroup itself (same as Compiler._get_groups_for_opsgroups).
+    condition_params: op/recursive opsgroup name -> set of PipelineParams
+               referenced in the conditions of its ancestor groups
+               (same as Compiler._get_condition_params_for_ops).
+    for_loop_ops: opsgroup name -> ParallelFor for all the loops in the tree
+               (same as Compiler._get_for_loop_ops).
+
+  The lowest common ancestor of two nodes is answered in constant time using a
+  range-minimum sparse table over the depths of an Euler tour of the tree, so
+  finding the uncommon ancestors of an edge does not compare ancestor lists.
+  Ops and recursive opsgroups are leaves of the tree.
+  """
+
+  def __init__(self, root_group: OpsGroup):
+    self.groups = {root_group.name: root_group}
+    self.op_groups = {}
+    self.opsgroup_groups = {}
+    self.condition_params = defaultdict(set)
+    self.for_loop_ops = {}
+    # Position of the first visit of each node in the Euler tour.
+    self._op_positions = {}
+    self._opsgroup_positions = {}
+
+    root_condition_params = self._add_condition_params(root_group, [])
+    euler_depths = [0]
+    stack = [(root_group, [root_group.name], root_condition_params, self._children(root_group))]
+    while stack:
+      _, path, current_condition_params, children = stack[-1]
+      child, is_group = next(children, (None, False))
+      if child is None:
+        stack.pop()
+        if stack:
+          # Back to the parent group.
+          euler_depths.append(len(stack) - 1)
+        continue
+
+      depth = len(path)
+      child_path = path + [child.name]
+      if is_group and not child.recursive_ref:
+        self.groups[child.name] = child
+        self.opsgroup_groups[child.name] = child_path
+        if isinstance(child, ParallelFor):
+          self.for_loop_ops[child.name] = child
+        self._opsgroup_positions[child.name] = len(euler_depths)
+        euler_depths.append(depth)
+        stack.append((
+            child,
+            child_path,
+            self._add_condition_params(child, current_condition_params),
+            self._children(child),
+        ))
+      else:
+        # Recursive opsgroups are added to op_groups such that the i/o dependency
+        # and the pipelineparams in the condition expressions can be propagated
+        # to the ancestor opsgroups, similar to the ops.
+        self.op_groups[child.name] = child_path
+        self.condition_params[child.name].update(current_condition_params)
+        self._op_positions[child.name] = len(euler_depths)
+        euler_depths.append(depth)
+        euler_depths.append(depth - 1)
+
+    self._sparse_table = self._build_sparse_table(euler_depths)
+
+  @staticmethod
+  def _add_condition_params(group: OpsGroup, current_condition_params: List[PipelineParam]):
+    """Returns the condition params in effect inside the group."""
+    if group.type != 'condition':
+      return current_condition_params
+    new_condition_params = list(current_condition_params)
+    if isinstance(group.condition.operand1, PipelineParam):
+      new_condition_params.append(group.condition.operand1)
+    if isinstance(group.condition.operand2, PipelineParam):
+      new_condition_params.append(group.condition.operand2)
+    return new_condition_params
+
+  @staticmethod
+  def _children(group: OpsGroup):
+    return itertools.chain(
+        ((g, True) for g in group.groups),
+        ((op, False) for op in group.ops),
+    )
+
+  @staticmethod
+  def _build_sparse_table(values: List[int]) -> List[List[int]]:
+    """Builds a sparse table where table[k][i] = min(values[i:i + 2**k])."""
+    table = [values]
+    k = 1
+    while (1 << k) <= len(values):
+      previous = table[-1]
+      half = 1 << (k - 1)
+      table.append([
+          min(previous[i], previous[i + half])
+          for i in range(len(values) - (1 << k) + 1)
+      ])
+      k += 1
+    return table
+
+  def _lookup(self, name: Text) -> Tuple[List[Text], int]:
+    if name in self.op_groups:
+      return self.op_groups[name], self._op_positions[name]
+    if name in self.opsgroup_groups:
+      return self.opsgroup_groups[name], self._opsgroup_positions[name]
+    raise ValueError(name + ' does not exist.')
+
+  def ancestors(self, name: Text) -> List[Text]:
+    """Returns the ancestor group names of an op or opsgroup including itself."""
+    return self._lookup(name)[0]
+
+  def _common_ancestors_count(self, position1: int, position2: int) -> int:
+    if position1 > position2:
+      position1, position2 = position2, position1
+    k = (position2 - position1 + 1).bit_length() - 1
+    row = self._sparse_table[k]
+    lca_depth = min(row[position1], row[position2 - (1 << k) + 1])
+    return lca_depth + 1
+
+  def uncommon_ancestors(self, name1: Text, name2: Text) -> Tuple[List[Text], List[Text]]:
+    """Gets the unique ancestors between two ops or opsgroups.
+
+    For example, op1's ancestor groups are [root, G1, G2, G3, op1], op2's ancestor groups are
+    [root, G1, G4, op2], then it returns a tuple ([G2, G3, op1], [G4, op2]).
+    """
+    groups1, position1 = self._lookup(name1)
+    groups2, position2 = self._lookup(name2)
+    common_groups_len = self._common_ancestors_count(position1, position2)
+    return groups1[common_groups_len:], groups2[common_groups_len:]
+
+  def first_uncommon_ancestors(self, name1: Text, name2: Text) -> Tuple[Text, Text]:
+    """Gets the first unique ancestor of each of two ops or opsgroups.
+
+    These are the sibling groups/ops between which the dependency exists.
+    For the example in uncommon_ancestors, it returns (G2, G4).
+    """
+    groups1, position1 = self._lookup(name1)
+    groups2, position2 = self._lookup(name2)
+    common_groups_len = self._common_ancestors_count(position1, position2)
+    return groups1[common_groups_len], groups2[common_groups_len]
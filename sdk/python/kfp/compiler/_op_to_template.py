@@ -16,9 +16,11 @@ import re
 import warnings
 import yaml
 from collections import OrderedDict
-from typing import Union, List, Any, Callable, TypeVar, Dict
+from functools import lru_cache
+from typing import Union, List, Any, Callable, TypeVar, Dict, Tuple
 
 from ._k8s_helper import convert_k8s_obj_to_json
+from ._step_cache import make_memoize
 from .. import dsl
 from ..dsl._container_op import BaseOp
 from ..dsl._artifact_location import ArtifactLocation
@@ -26,6 +28,24 @@ from ..dsl._artifact_location import ArtifactLocation
 # generics
 T = TypeVar('T')
 
+# Same placeholder as in `dsl.match_serialized_pipelineparam`, captured as a whole
+# so that splitting a string on it keeps the placeholders at the odd indices.
+_SERIALIZED_PIPELINEPARAM_REGEX = re.compile(r'({{pipelineparam:op=[\w\s_-]*;name=[\w\s_-]+}})')
+
+
+@lru_cache(maxsize=4096)
+def _split_serialized_pipelineparams(payload: str) -> Tuple[str, ...]:
+    """Splits the string into literal parts and serialized PipelineParam placeholders.
+
+    The literal parts are at the even indices and the placeholders are at the odd
+    indices. A string without placeholders is returned as a single literal part.
+    The result is cached, so strings that are seen many times during the
+    compilation (e.g. the program sources of the python components) are only
+    scanned once. The compiler clears the cache after converting the ops of a
+    pipeline, so the strings are not kept alive between the compilations.
+    """
+    return tuple(_SERIALIZED_PIPELINEPARAM_REGEX.split(payload))
+
 
 def _process_obj(obj: Any, map_to_tmpl_var: dict):
     """Recursively sanitize and replace any PipelineParam (instances and serialized strings)
@@ -39,13 +59,14 @@ def _process_obj(obj: Any, map_to_tmpl_var: dict):
     """
     # serialized str might be unsanitized
     if isinstance(obj, str):
-        # get signature
-        param_tuples = dsl.match_serialized_pipelineparam(obj)
-        if not param_tuples:
+        parts = _split_serialized_pipelineparams(obj)
+        if len(parts) == 1:
             return obj
         # replace all unsanitized signature with template var
-        for param_tuple in param_tuples:
-            obj = re.sub(param_tuple.pattern, map_to_tmpl_var[param_tuple.pattern], obj)
+        return ''.join(
+            map_to_tmpl_var[part] if i % 2 else part
+            for i, part in enumerate(parts)
+        )
 
     # list
     if isinstance(obj, list):
@@ -105,15 +126,20 @@ def _process_base_ops(op: BaseOp):
     """
 
     # map param's (unsanitized pattern or serialized str pattern) -> input param var str
+    inputs = op.inputs
     map_to_tmpl_var = {
         (param.pattern or str(param)): '{{inputs.parameters.%s}}' % param.full_name
-        for param in op.inputs
+        for param in inputs
     }
 
     # process all attr with pipelineParams except inputs and outputs parameters
     for key in op.attrs_with_pipelineparams:
         setattr(op, key, _process_obj(getattr(op, key), map_to_tmpl_var))
 
+    # The processed attributes no longer contain any PipelineParam, but the
+    # template inputs are still generated from the original ones.
+    op.inputs = inputs
+
     return op
 
 
@@ -254,6 +280,12 @@ def _op_to_template(op: BaseOp):
     if processed_op.affinity:
         template['affinity'] = convert_k8s_obj_to_json(processed_op.affinity)
 
+    # scheduling
+    if processed_op.priority_class_name:
+        template['priorityClassName'] = processed_op.priority_class_name
+    if processed_op.scheduler_name:
+        template['schedulerName'] = processed_op.scheduler_name
+
     # metadata
     if processed_op.pod_annotations or processed_op.pod_labels:
         template['metadata'] = {}
@@ -269,6 +301,10 @@ def _op_to_template(op: BaseOp):
     if processed_op.timeout:
         template['activeDeadlineSeconds'] = processed_op.timeout
 
+    # caching, the key is set when the workflow is complete
+    if isinstance(op, dsl.ContainerOp) and processed_op.caching_enabled and not processed_op.is_exit_handler:
+        template['memoize'] = make_memoize(processed_op.cache_max_age)
+
     # initContainers
     if processed_op.init_containers:
         template['initContainers'] = processed_op.init_containers
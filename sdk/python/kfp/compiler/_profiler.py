@@ -0,0 +1,139 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__all__ = [
+    'CompileProfiler',
+]
+
+import json
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Text
+
+
+class CompileProfiler(object):
+  """Collects the per-phase compilation statistics.
+
+  Example usage:
+  ```python
+  with compiler.CompileProfiler() as profiler:
+    compiler.Compiler(profiler=profiler).compile(my_pipeline, 'pipeline.yaml')
+  print(profiler.to_json())
+  ```
+
+  The compiler reports the following phases: dsl_function, sanitize_and_inject_artifact,
+  create_dag_templates, op_to_template, deduplicate_templates (when enabled in the
+  PipelineConf), fix_big_data_passing, extract_workflow_templates (when the compiler
+  writes WorkflowTemplates) and write_workflow.
+  Phases can be nested (op_to_template runs inside create_dag_templates), so the
+  statistics of a phase include the statistics of its nested phases. A phase that runs
+  several times (op_to_template runs once per op) is reported once with the sums.
+
+  For each phase the profiler reports the number of calls, the wall time, the net
+  allocated memory and the peak traced memory (tracemalloc), and the counts reported by
+  the compiler (e.g. ops, groups, templates, params).
+  """
+
+  def __init__(self, trace_allocations: bool = True, on_phase_end: Callable[[Text, Dict[Text, Any]], None] = None):
+    """Creates a new profiler.
+
+    Args:
+      trace_allocations: Whether to trace the memory allocations with tracemalloc
+        while the profiler is active. Tracing slows down the compilation.
+      on_phase_end: Optional callback that is called with the phase name and the
+        statistics of a single phase call every time a phase ends.
+    """
+    self.trace_allocations = trace_allocations
+    self.on_phase_end = on_phase_end
+    self.phases = OrderedDict()  # type: Dict[Text, Dict[Text, Any]]
+    self._started_tracing = False
+    # The peak memory of the phases which are running. Used to restore the peak of the
+    # outer phase when tracemalloc.reset_peak is called for a nested phase.
+    self._peak_stack = []
+
+  def __enter__(self):
+    if self.trace_allocations and not tracemalloc.is_tracing():
+      tracemalloc.start()
+      self._started_tracing = True
+    return self
+
+  def __exit__(self, *args):
+    if self._started_tracing:
+      tracemalloc.stop()
+      self._started_tracing = False
+
+  @contextmanager
+  def phase(self, name: Text):
+    """Measures a compilation phase.
+
+    Yields:
+      A dict where the phase counts can be stored.
+    """
+    counts = OrderedDict()
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+      start_memory = tracemalloc.get_traced_memory()[0]
+      if hasattr(tracemalloc, 'reset_peak'):  # Python 3.9+
+        if self._peak_stack:
+          self._peak_stack[-1] = max(self._peak_stack[-1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+      self._peak_stack.append(0)
+    start_time = time.perf_counter()
+    try:
+      yield counts
+    finally:
+      wall_time = time.perf_counter() - start_time
+      call_stats = OrderedDict([
+          ('wall_time_seconds', wall_time),
+          ('counts', counts),
+      ])
+      if tracing:
+        current_memory, peak_memory = tracemalloc.get_traced_memory()
+        peak_memory = max(peak_memory, self._peak_stack.pop())
+        if self._peak_stack:
+          self._peak_stack[-1] = max(self._peak_stack[-1], peak_memory)
+        call_stats['allocated_bytes'] = current_memory - start_memory
+        call_stats['peak_traced_bytes'] = peak_memory
+      self._add_phase_stats(name, call_stats)
+      if self.on_phase_end:
+        self.on_phase_end(name, call_stats)
+
+  def _add_phase_stats(self, name: Text, call_stats: Dict[Text, Any]):
+    stats = self.phases.get(name)
+    if stats is None:
+      stats = self.phases[name] = OrderedDict([
+          ('calls', 0),
+          ('wall_time_seconds', 0.0),
+          ('counts', OrderedDict()),
+      ])
+    stats['calls'] += 1
+    stats['wall_time_seconds'] += call_stats['wall_time_seconds']
+    for count_name, value in call_stats['counts'].items():
+      stats['counts'][count_name] = stats['counts'].get(count_name, 0) + value
+    if 'allocated_bytes' in call_stats:
+      stats['allocated_bytes'] = stats.get('allocated_bytes', 0) + call_stats['allocated_bytes']
+      stats['peak_traced_bytes'] = max(stats.get('peak_traced_bytes', 0), call_stats['peak_traced_bytes'])
+
+  def to_dict(self) -> Dict[Text, Any]:
+    return {'phases': [dict(stats, name=name) for name, stats in self.phases.items()]}
+
+  def to_json(self) -> Text:
+    return json.dumps(self.to_dict(), indent=2, sort_keys=True)
+
+
+@contextmanager
+def _no_profile_phase():
+  yield {}
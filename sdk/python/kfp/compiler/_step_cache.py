@@ -0,0 +1,72 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import warnings
+from typing import List, Optional
+
+
+# The ConfigMap where Argo stores the outputs of the cached steps.
+CACHE_CONFIG_MAP_NAME = 'kfp-step-cache'
+
+# Template sections which do not change the outputs of the step.
+_NON_KEY_SECTIONS = (
+    'name', 'memoize', 'metadata', 'retryStrategy', 'activeDeadlineSeconds',
+    'nodeSelector', 'tolerations', 'affinity', 'priorityClassName', 'schedulerName',
+)
+
+
+def make_memoize(max_age: Optional[str] = None) -> dict:
+    '''Returns the Argo memoize section of a cached container template. The key is set by add_cache_key.'''
+    memoize = {
+        'key': '',
+        'cache': {'configMap': {'name': CACHE_CONFIG_MAP_NAME}},
+    }
+    if max_age:
+        memoize['maxAge'] = max_age
+    return memoize
+
+
+def add_cache_keys(templates: List[dict]):
+    '''add_cache_keys sets the cache keys of all memoized templates. The templates are modified in place.'''
+    for template in templates:
+        add_cache_key(template)
+
+
+def add_cache_key(template: dict):
+    '''add_cache_key sets the cache key of a memoized template. The template is modified in place.
+
+    The key is the digest of the template (the image, the command and arguments with their input placeholders,
+    the input and output specs, the volumes and the additional containers) followed by the input parameter values.
+    The key must be computed after all passes which change the template or rename its inputs.
+
+    Argo 2.x only supports the plain {{inputs.parameters.<name>}} substitutions in the key, so the parameter values are
+    not hashed. The values are joined with ".", and Argo can only store the key in the cache ConfigMap when the values
+    only contain alphanumeric characters, "-", "_" and "." and the key is at most 253 characters long.
+    The templates which get input artifacts from other steps are not cached, since the artifact contents are not part of the key.
+    '''
+    memoize = template.get('memoize')
+    if memoize is None:
+        return
+    inputs = template.get('inputs', {})
+    if any('raw' not in artifact for artifact in inputs.get('artifacts', [])):
+        warnings.warn('The outputs of the step "{}" will not be cached since it gets input artifacts from other steps.'.format(template['name']))
+        del template['memoize']
+        return
+
+    key_template = {key: value for key, value in template.items() if key not in _NON_KEY_SECTIONS}
+    digest = hashlib.sha256(json.dumps(key_template, sort_keys=True).encode('utf-8')).hexdigest()
+    parameter_names = sorted(parameter['name'] for parameter in inputs.get('parameters', []))
+    memoize['key'] = '.'.join([digest] + ['{{inputs.parameters.' + name + '}}' for name in parameter_names])
@@ -0,0 +1,233 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+import json
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Template sections with container specs.
+_CONTAINER_SECTIONS = ('container', 'initContainers', 'sidecars')
+
+# Container spec fields that Argo substitutes as free strings, so their differing values can be replaced with input parameter placeholders.
+# The other fields (e.g. the resource quantities) are parsed by Kubernetes, so the templates which differ there are not merged.
+_HOISTABLE_CONTAINER_FIELDS = ('command', 'args', 'image')
+
+_INPUT_PARAMETER_PLACEHOLDER_REGEX = re.compile(r'{{inputs\.parameters\.([-_a-zA-Z0-9]+)}}')
+_TASK_OUTPUT_PARAMETER_PLACEHOLDER_REGEX = re.compile(r'{{tasks\.([-_a-zA-Z0-9]+)\.outputs\.parameters\.([-_a-zA-Z0-9]+)}}')
+
+_HOISTED_VALUE_MARKER = '\0hoisted'
+
+
+def deduplicate_container_templates(workflow: dict) -> dict:
+    '''deduplicate_container_templates replaces structurally identical container templates with a single shared template.
+    Args:
+        workflow: The workflow to deduplicate. It's modified in place.
+    Returns:
+        The deduplicated workflow
+
+    Motivation:
+    The compiler generates a template for every op, even when many ops (e.g. created in a python loop) only differ by their names and argument values.
+    Big pipelines can produce a workflow that is too big to be submitted.
+
+    Implementation:
+    1. Canonicalize every container template: rename its input and output parameters to positional names and replace the free string values in the container specs (command, args, image and env values) with markers.
+    The templates which differ in any other value (e.g. the resource requests) are never merged.
+    2. Group the templates by their canonical form. Only the first template of each group is kept.
+    3. The container spec values which differ inside a group are hoisted to the new input parameters of the shared template. The tasks pass the original values as arguments.
+    4. The tasks of the removed templates are pointed to the shared template and their argument names and output references are renamed to the names used by the shared template.
+    '''
+    spec = workflow['spec']
+    templates = spec['templates']
+    excluded_template_names = {spec.get('entrypoint'), spec.get('onExit')}
+
+    template_name_to_tasks = {} # template_name -> List[(dag_template, task)]
+    for template in templates:
+        for task in template.get('dag', {}).get('tasks', []):
+            template_name_to_tasks.setdefault(task['template'], []).append((template, task))
+
+    # 1. Canonicalize the container templates
+    key_to_canonical_templates = OrderedDict()
+    for template in templates:
+        if 'container' not in template or template['name'] in excluded_template_names:
+            continue
+        if len(template_name_to_tasks.get(template['name'], [])) != 1:
+            continue
+        canonical_template = _canonicalize_template(template)
+        if canonical_template:
+            key_to_canonical_templates.setdefault(canonical_template.key, []).append(canonical_template)
+
+    # 2. Merge the groups of identical templates
+    removed_template_names = set()
+    for canonical_templates in key_to_canonical_templates.values():
+        if len(canonical_templates) < 2:
+            continue
+        shared = canonical_templates[0]
+        shared_template = shared.template
+        shared_input_names = [input_parameter['name'] for input_parameter in shared_template.get('inputs', {}).get('parameters', [])]
+
+        # 3. Hoist the differing values
+        hoisted_input_names = []
+        for leaf_index, (path, _) in enumerate(shared.leaves):
+            values = [canonical_template.leaves[leaf_index][1] for canonical_template in canonical_templates]
+            if all(value == values[0] for value in values):
+                continue
+            input_name = _make_unique_input_name(shared_template['name'] + '-value', shared_input_names + hoisted_input_names)
+            hoisted_input_names.append(input_name)
+            _set_value_at_path(shared_template, path, '{{inputs.parameters.' + input_name + '}}')
+            for canonical_template in canonical_templates:
+                _, task = template_name_to_tasks[canonical_template.template['name']][0]
+                task.setdefault('arguments', {}).setdefault('parameters', []).append({
+                    'name': input_name,
+                    'value': canonical_template.leaves[leaf_index][1],
+                })
+        if hoisted_input_names:
+            input_parameters = shared_template.setdefault('inputs', {}).setdefault('parameters', [])
+            input_parameters.extend({'name': input_name} for input_name in hoisted_input_names)
+            input_parameters.sort(key=lambda x: x['name'])
+
+        # 4. Point the tasks to the shared template
+        for canonical_template in canonical_templates[1:]:
+            dag_template, task = template_name_to_tasks[canonical_template.template['name']][0]
+            removed_template_names.add(task['template'])
+            task['template'] = shared_template['name']
+            input_name_map = dict(zip(canonical_template.input_names, shared.input_names))
+            for argument in task.get('arguments', {}).get('parameters', []):
+                argument['name'] = input_name_map.get(argument['name'], argument['name'])
+            output_name_map = {
+                (task['name'], output_name): shared_output_name
+                for output_name, shared_output_name in zip(canonical_template.output_names, shared.output_names)
+                if output_name != shared_output_name
+            }
+            if output_name_map:
+                _rename_task_output_references(dag_template, output_name_map)
+
+        for canonical_template in canonical_templates:
+            _, task = template_name_to_tasks[canonical_template.template['name']][0]
+            task.get('arguments', {}).get('parameters', []).sort(key=lambda x: x['name'])
+
+    spec['templates'] = [template for template in templates if template['name'] not in removed_template_names]
+    return workflow
+
+
+class _CanonicalTemplate:
+    def __init__(self, template: dict, key: str, input_names: List[str], output_names: List[str], leaves: List[Tuple[tuple, str]]):
+        self.template = template
+        self.key = key
+        self.input_names = input_names
+        self.output_names = output_names
+        self.leaves = leaves # List[(path, value)] of the hoistable values in the canonical order
+
+
+def _canonicalize_template(template: dict) -> Optional[_CanonicalTemplate]:
+    input_names = [input_parameter['name'] for input_parameter in template.get('inputs', {}).get('parameters', [])]
+    output_names = [output_parameter['name'] for output_parameter in template.get('outputs', {}).get('parameters', [])]
+    if len(set(input_names + output_names)) != len(input_names) + len(output_names):
+        return None
+
+    input_name_map = {name: '\0input-%d' % i for i, name in enumerate(input_names)}
+    output_name_map = {name: '\0output-%d' % i for i, name in enumerate(output_names)}
+
+    canonical = copy.deepcopy(template)
+    del canonical['name']
+    inputs = canonical.get('inputs', {})
+    for input_spec in inputs.get('parameters', []) + inputs.get('artifacts', []):
+        input_spec['name'] = input_name_map.get(input_spec['name'], input_spec['name'])
+    outputs = canonical.get('outputs', {})
+    for output_spec in outputs.get('parameters', []) + outputs.get('artifacts', []):
+        output_name = output_spec['name']
+        if output_name in output_name_map:
+            output_spec['name'] = output_name_map[output_name]
+            # The output artifact keys contain the output name
+            s3 = output_spec.get('s3')
+            if s3 and s3.get('key', '').endswith('/' + output_name + '.tgz'):
+                s3['key'] = s3['key'][:-len(output_name + '.tgz')] + output_name_map[output_name] + '.tgz'
+
+    leaves = []
+    def canonicalize_strings(obj, path: tuple):
+        if isinstance(obj, str):
+            if '{{' in obj:
+                return _INPUT_PARAMETER_PLACEHOLDER_REGEX.sub(
+                    lambda match: '{{inputs.parameters.' + input_name_map.get(match.group(1), match.group(1)) + '}}',
+                    obj,
+                )
+            if _is_hoistable_path(path):
+                leaves.append((path, obj))
+                return _HOISTED_VALUE_MARKER
+            return obj
+        if isinstance(obj, dict):
+            return {key: canonicalize_strings(value, path + (key,)) for key, value in sorted(obj.items())}
+        if isinstance(obj, list):
+            return [canonicalize_strings(value, path + (index,)) for index, value in enumerate(obj)]
+        return obj
+
+    canonical = canonicalize_strings(canonical, ())
+    key = json.dumps(canonical, sort_keys=True)
+    return _CanonicalTemplate(template, key, input_names, output_names, leaves)
+
+
+def _is_hoistable_path(path: tuple) -> bool:
+    '''Checks whether the string value at the template path is a free string container field: command, args, image or env[].value.'''
+    if not path or path[0] not in _CONTAINER_SECTIONS:
+        return False
+    container_path = path[1:] if path[0] == 'container' else path[2:] # Skipping the initContainers and sidecars list index
+    if not container_path:
+        return False
+    if container_path[0] in _HOISTABLE_CONTAINER_FIELDS:
+        return True
+    return len(container_path) == 3 and container_path[0] == 'env' and container_path[2] == 'value'
+
+
+def _set_value_at_path(obj: Any, path: tuple, value: Any):
+    for key in path[:-1]:
+        obj = obj[key]
+    obj[path[-1]] = value
+
+
+def _make_unique_input_name(base_name: str, used_names: List[str]) -> str:
+    name = base_name
+    index = 1
+    while name in used_names:
+        index += 1
+        name = base_name + '-' + str(index)
+    return name
+
+
+def _rename_task_output_references(dag_template: dict, output_name_map: Dict[Tuple[str, str], str]):
+    '''Renames the {{tasks.<task>.outputs.parameters.<output>}} references in all strings of the DAG template.'''
+    def replace(match):
+        task_name, output_name = match.groups()
+        new_output_name = output_name_map.get((task_name, output_name))
+        if new_output_name is None:
+            return match.group(0)
+        return '{{tasks.' + task_name + '.outputs.parameters.' + new_output_name + '}}'
+
+    def rename(obj):
+        if isinstance(obj, str):
+            if '{{tasks.' in obj:
+                return _TASK_OUTPUT_PARAMETER_PLACEHOLDER_REGEX.sub(replace, obj)
+            return obj
+        if isinstance(obj, dict):
+            for key, value in obj.items():
+                obj[key] = rename(value)
+            return obj
+        if isinstance(obj, list):
+            for index, value in enumerate(obj):
+                obj[index] = rename(value)
+            return obj
+        return obj
+
+    rename(dag_template)
@@ -0,0 +1,263 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__all__ = [
+    'WorkflowAnalysis',
+    'analyze_workflow',
+]
+
+import json
+from collections import OrderedDict
+from typing import Any, Dict, List, Text
+
+from ..dsl._container_op import _parse_quantity
+
+# The indices of the values of a step in a profile.
+_PODS, _CPU, _MEMORY = range(3)
+
+
+class WorkflowAnalysis(object):
+  """Static estimates of the duration and the cluster pressure of a workflow.
+
+  Every pod is assumed to take one time step and to start as soon as all of its
+  dependencies are done. Conditional tasks are assumed to run. The loops over the
+  outputs of other tasks (withParam) are assumed to have a single item. The loop
+  iterations limited by the template parallelism run in waves. The workflow
+  parallelism caps the concurrent pods (scaling their requests proportionally), but
+  does not make the critical path longer.
+
+  Attributes:
+    critical_path_length: The number of pods in the longest dependency chain.
+    critical_path: The tasks in the longest dependency chain. The tasks in the
+      nested DAGs are named <task>/<nested task>.
+    level_widths: The number of pods running at each time step.
+    peak_pods: The maximum number of concurrent pods.
+    peak_cpu: The maximum sum of the CPU requests of the concurrent pods, in cores.
+    peak_memory_bytes: The maximum sum of the memory requests of the concurrent pods.
+    total_pods: The number of pods of the whole run.
+    unknown_loop_sizes: The number of the loop tasks whose item count is not static.
+    unknown_resource_requests: The number of the templates whose CPU or memory
+      requests could not be parsed, e.g. because they are pipeline parameters.
+    recursive_tasks: The number of the tasks which call a template recursively.
+      The pods of the recursive calls are not counted.
+  """
+
+  def __init__(self):
+    self.critical_path_length = 0
+    self.critical_path = []  # type: List[Text]
+    self.level_widths = []  # type: List[int]
+    self.peak_pods = 0
+    self.peak_cpu = 0.0
+    self.peak_memory_bytes = 0
+    self.total_pods = 0
+    self.unknown_loop_sizes = 0
+    self.unknown_resource_requests = 0
+    self.recursive_tasks = 0
+
+  def to_dict(self) -> Dict[Text, Any]:
+    return OrderedDict([
+        ('critical_path_length', self.critical_path_length),
+        ('critical_path', self.critical_path),
+        ('level_widths', self.level_widths),
+        ('peak_pods', self.peak_pods),
+        ('peak_cpu', self.peak_cpu),
+        ('peak_memory_bytes', self.peak_memory_bytes),
+        ('total_pods', self.total_pods),
+        ('unknown_loop_sizes', self.unknown_loop_sizes),
+        ('unknown_resource_requests', self.unknown_resource_requests),
+        ('recursive_tasks', self.recursive_tasks),
+    ])
+
+  def to_json(self) -> Text:
+    return json.dumps(self.to_dict(), indent=2)
+
+
+class _TemplateStats(object):
+  def __init__(self, profile, critical_path, total_pods):
+    self.profile = profile  # List[[pods, cpu, memory]] for every time step
+    self.critical_path = critical_path
+    self.total_pods = total_pods
+
+
+def analyze_workflow(workflow: Dict[Text, Any], workflow_templates: List[Dict[Text, Any]] = None) -> WorkflowAnalysis:
+  """Estimates the critical path and the peak concurrency of the workflow.
+
+  The analysis works on the DAG templates of the compiled workflow, which contain the
+  dependencies and the loop items that the compiler computed for the pipeline groups.
+
+  Args:
+    workflow: Workflow spec of the pipeline, dict.
+    workflow_templates: Optional list of the WorkflowTemplates referenced by the tasks
+      with templateRef. The tasks which reference missing WorkflowTemplates are counted
+      as single pods without resource requests.
+
+  Returns:
+    The WorkflowAnalysis.
+  """
+  spec = workflow['spec']
+  analysis = WorkflowAnalysis()
+  templates = {template['name']: template for template in spec['templates']}
+  referenced_templates = {}
+  for workflow_template in workflow_templates or []:
+    for template in workflow_template['spec']['templates']:
+      referenced_templates[(workflow_template['metadata']['name'], template['name'])] = template
+
+  template_stats = {}
+  analyzing = set()
+
+  def get_stats(template) -> _TemplateStats:
+    name = template['name']
+    stats = template_stats.get(name)
+    if stats is not None:
+      return stats
+    analyzing.add(name)
+    if 'dag' in template:
+      stats = analyze_dag(template)
+    else:
+      stats = _TemplateStats([_get_pod_step(template, analysis)], [], 1)
+    analyzing.discard(name)
+    template_stats[name] = stats
+    return stats
+
+  def analyze_dag(template) -> _TemplateStats:
+    tasks = template['dag'].get('tasks', [])
+    parallelism = template.get('parallelism')
+    task_finish = {}
+    task_paths = {}
+    profile = []
+    total_pods = 0
+    for task in _sort_tasks(tasks):
+      task_name = task['name']
+      if 'templateRef' in task:
+        template_ref = task['templateRef']
+        child = referenced_templates.get((template_ref['name'], template_ref['template']), {'name': None})
+        child_stats = _TemplateStats([[1, 0.0, 0]], [], 1) if child['name'] is None else get_stats(child)
+      elif task['template'] in analyzing:
+        analysis.recursive_tasks += 1
+        child_stats = _TemplateStats([], [], 0)
+      else:
+        child_stats = get_stats(templates[task['template']])
+
+      item_count = 1
+      if 'withItems' in task:
+        item_count = len(task['withItems'])
+      elif 'withParam' in task:
+        analysis.unknown_loop_sizes += 1
+
+      # The iterations limited by the parallelism run in waves.
+      wave_sizes = [item_count]
+      if parallelism and item_count > parallelism:
+        wave_sizes = [parallelism] * (item_count // parallelism)
+        if item_count % parallelism:
+          wave_sizes.append(item_count % parallelism)
+
+      start = 0
+      path = []
+      for dependency in task.get('dependencies', []):
+        if task_finish.get(dependency, 0) > start or (task_finish.get(dependency, 0) == start and not path):
+          start = task_finish.get(dependency, 0)
+          path = task_paths.get(dependency, [])
+      task_finish[task_name] = start + len(child_stats.profile) * len(wave_sizes)
+      if child_stats.critical_path:
+        task_paths[task_name] = path + [task_name + '/' + child_path for child_path in child_stats.critical_path]
+      else:
+        task_paths[task_name] = path + [task_name]
+
+      if len(profile) < task_finish[task_name]:
+        profile.extend([0, 0.0, 0] for _ in range(task_finish[task_name] - len(profile)))
+      for wave_index, wave_size in enumerate(wave_sizes):
+        wave_start = start + wave_index * len(child_stats.profile)
+        for offset, step in enumerate(child_stats.profile):
+          target_step = profile[wave_start + offset]
+          for index in (_PODS, _CPU, _MEMORY):
+            target_step[index] += step[index] * wave_size
+      total_pods += child_stats.total_pods * item_count
+
+    critical_path = []
+    if task_finish:
+      critical_path = task_paths[max(task_finish, key=lambda task_name: task_finish[task_name])]
+    return _TemplateStats(profile, critical_path, total_pods)
+
+  entrypoint_stats = get_stats(templates[spec['entrypoint']])
+  profile = list(entrypoint_stats.profile)
+  critical_path = list(entrypoint_stats.critical_path)
+  total_pods = entrypoint_stats.total_pods
+  if spec.get('onExit'):
+    exit_stats = get_stats(templates[spec['onExit']])
+    profile.extend(exit_stats.profile)
+    critical_path.extend(exit_stats.critical_path or [spec['onExit']])
+    total_pods += exit_stats.total_pods
+
+  max_pods = spec.get('parallelism')
+  if max_pods:
+    profile = [
+        [max_pods, step[_CPU] * max_pods / step[_PODS], step[_MEMORY] * max_pods / step[_PODS]] if step[_PODS] > max_pods else step
+        for step in profile
+    ]
+
+  analysis.critical_path_length = len(profile)
+  analysis.critical_path = critical_path
+  analysis.level_widths = [step[_PODS] for step in profile]
+  analysis.peak_pods = max((step[_PODS] for step in profile), default=0)
+  analysis.peak_cpu = max((step[_CPU] for step in profile), default=0.0)
+  analysis.peak_memory_bytes = int(max((step[_MEMORY] for step in profile), default=0))
+  analysis.total_pods = total_pods
+  return analysis
+
+
+def _sort_tasks(tasks: List[Dict[Text, Any]]) -> List[Dict[Text, Any]]:
+  """Sorts the DAG tasks so that every task comes after its dependencies."""
+  tasks_by_name = {task['name']: task for task in tasks}
+  sorted_tasks = []
+  visited = set()
+  for task in tasks:
+    stack = [(task, False)]
+    while stack:
+      current, expanded = stack.pop()
+      if expanded:
+        sorted_tasks.append(current)
+        continue
+      if current['name'] in visited:
+        continue
+      visited.add(current['name'])
+      stack.append((current, True))
+      for dependency in reversed(current.get('dependencies', [])):
+        if dependency in tasks_by_name and dependency not in visited:
+          stack.append((tasks_by_name[dependency], False))
+  return sorted_tasks
+
+
+def _get_pod_step(template: Dict[Text, Any], analysis: WorkflowAnalysis) -> List:
+  """Returns the [pods, cpu, memory] step of a template which runs a single pod."""
+  resources = template.get('container', {}).get('resources', {})
+  cpu = 0.0
+  memory = 0
+  unknown_resource_request = False
+  for resource_name in ('cpu', 'memory'):
+    # Kubernetes uses the limit as the request when only the limit is set
+    quantity = resources.get('requests', {}).get(resource_name, resources.get('limits', {}).get(resource_name))
+    if quantity is None:
+      continue
+    try:
+      value = _parse_quantity(quantity)
+    except ValueError:
+      unknown_resource_request = True
+      continue
+    if resource_name == 'cpu':
+      cpu = value
+    else:
+      memory = value
+  if unknown_resource_request:
+    analysis.unknown_resource_requests += 1
+  return [1, cpu, memory]
@@ -0,0 +1,182 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from typing import Any, Dict, Iterable, Text
+
+import yaml
+
+# The libyaml based dumper is much faster than the pure python one. Fall back
+# to the latter when PyYAML was built without libyaml.
+_BaseDumper = getattr(yaml, 'CDumper', yaml.Dumper)
+
+_UNRESOLVED_PIPELINEPARAM_MARKER = '{{pipelineparam'
+
+# The preferred line width of the YAML emitter. It folds the long quoted strings at this column.
+_YAML_WIDTH = 80
+
+
+def _raise_unresolved_pipelineparam_error():
+  raise RuntimeError(
+      'Internal compiler error: Found unresolved PipelineParam. '
+      'Please create a new issue at https://github.com/kubeflow/pipelines/issues '
+      'attaching the pipeline code and the pipeline package.')
+
+
+class _WorkflowDumper(_BaseDumper):
+  """Dumper which never emits aliases and checks for the unresolved PipelineParams.
+
+  The strings are checked while they are being represented, so the emitted
+  text does not need to be scanned again.
+  """
+
+  def ignore_aliases(self, data):
+    return True
+
+  def represent_str(self, data):
+    if _UNRESOLVED_PIPELINEPARAM_MARKER in data:
+      _raise_unresolved_pipelineparam_error()
+    return super().represent_str(data)
+
+
+_WorkflowDumper.add_representer(str, _WorkflowDumper.represent_str)
+
+
+def dump_workflow_yaml(workflow: Dict[Text, Any], stream=None):
+  """Dumps the workflow as YAML.
+
+  Args:
+    workflow: Workflow spec of the pipeline, dict.
+    stream: Optional text or binary stream to write to. If not specified, the
+      YAML text is returned.
+  """
+  return _dump_yaml(workflow, stream, _YAML_WIDTH)
+
+
+def _dump_yaml(data, stream, width: int):
+  encoding = 'utf-8' if stream is not None and not hasattr(stream, 'encoding') else None
+  return yaml.dump(
+      data,
+      stream,
+      Dumper=_WorkflowDumper,
+      default_flow_style=False,
+      default_style='|',
+      encoding=encoding,
+      width=width,
+  )
+
+
+def dump_workflow_json(workflow: Dict[Text, Any], stream):
+  """Dumps the workflow as JSON into a text stream.
+
+  Argo accepts JSON workflows and the JSON encoder is much faster than any YAML emitter.
+  """
+  for chunk in json.JSONEncoder(indent=2, sort_keys=True).iterencode(workflow):
+    # Strings are always encoded as whole chunks.
+    if _UNRESOLVED_PIPELINEPARAM_MARKER in chunk:
+      _raise_unresolved_pipelineparam_error()
+    stream.write(chunk)
+
+
+# The skeleton workflow has an empty templates list which is replaced with the streamed templates.
+_YAML_EMPTY_TEMPLATES = '\n  "templates": []\n'
+_JSON_EMPTY_TEMPLATES = '\n    "templates": []'
+# The indentation of the streamed templates list items.
+_TEMPLATES_INDENT = '  '
+
+
+def _get_text_writer(stream):
+  if hasattr(stream, 'encoding'):
+    return stream.write
+  return lambda text: stream.write(text.encode('utf-8'))
+
+
+def _indent_lines(text: Text, prefix: Text) -> Text:
+  return ''.join(line if line == '\n' else prefix + line for line in text.splitlines(True))
+
+
+def dump_workflow_yaml_streaming(workflow: Dict[Text, Any], templates: Iterable[Dict[Text, Any]], stream):
+  """Dumps the workflow as YAML taking the templates one at a time.
+
+  The output is byte-identical to the output of dump_workflow_yaml for the workflow
+  with the templates, but only one template is held in memory at a time.
+  The templates are dumped separately and indented, so they are dumped with the
+  line width reduced by the indentation to fold the long strings at the same columns.
+
+  Args:
+    workflow: Workflow spec of the pipeline without the templates, dict.
+    templates: Iterable of the templates in the order they should be written.
+    stream: Text or binary stream to write to.
+  """
+  write = _get_text_writer(stream)
+  skeleton = dict(workflow, spec=dict(workflow['spec'], templates=[]))
+  head, tail = dump_workflow_yaml(skeleton).split(_YAML_EMPTY_TEMPLATES)
+  write(head)
+  has_templates = False
+  for template in templates:
+    if not has_templates:
+      write('\n  "templates":\n')
+      has_templates = True
+    write(_indent_lines(_dump_yaml([template], None, _YAML_WIDTH - len(_TEMPLATES_INDENT)), _TEMPLATES_INDENT))
+  if not has_templates:
+    write(_YAML_EMPTY_TEMPLATES)
+  write(tail)
+
+
+def dump_workflow_json_streaming(workflow: Dict[Text, Any], templates: Iterable[Dict[Text, Any]], stream):
+  """Dumps the workflow as JSON into a text stream taking the templates one at a time.
+
+  The output is the same as the output of dump_workflow_json for the workflow with the templates.
+  """
+  skeleton = dict(workflow, spec=dict(workflow['spec'], templates=[]))
+  skeleton_json = json.dumps(skeleton, indent=2, sort_keys=True)
+  if _UNRESOLVED_PIPELINEPARAM_MARKER in skeleton_json:
+    _raise_unresolved_pipelineparam_error()
+  head, tail = skeleton_json.split(_JSON_EMPTY_TEMPLATES)
+  stream.write(head)
+  separator = '\n    "templates": [\n'
+  for template in templates:
+    stream.write(separator + '      ')
+    separator = ',\n'
+    for chunk in json.JSONEncoder(indent=2, sort_keys=True).iterencode(template):
+      if _UNRESOLVED_PIPELINEPARAM_MARKER in chunk:
+        _raise_unresolved_pipelineparam_error()
+      stream.write(chunk.replace('\n', '\n      ') if '\n' in chunk else chunk)
+  if separator == ',\n':
+    stream.write('\n    ]')
+  else:
+    stream.write(_JSON_EMPTY_TEMPLATES)
+  stream.write(tail)
+
+
+class _TemplateSpool(object):
+  """Temporary on-disk storage of the templates which keeps only their names and file offsets in memory."""
+
+  def __init__(self, spool_file):
+    """
+    Args:
+      spool_file: Binary file opened for reading and writing, e.g. tempfile.TemporaryFile().
+    """
+    self._file = spool_file
+    self.entries = []  # List[(template_name, offset)] in the order the templates were added
+
+  def add(self, template: Dict[Text, Any]):
+    self._file.seek(0, 2)
+    self.entries.append((template['name'], self._file.tell()))
+    self._file.write(json.dumps(template).encode('utf-8'))
+    self._file.write(b'\n')
+
+  def read(self, offset: int) -> Dict[Text, Any]:
+    self._file.seek(offset)
+    return json.loads(self._file.readline().decode('utf-8'))
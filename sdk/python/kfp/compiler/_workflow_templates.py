@@ -0,0 +1,229 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from ._k8s_helper import sanitize_k8s_name
+from ._step_cache import add_cache_key
+
+
+_IO_PLACEHOLDER_REGEX = re.compile(r'{{(inputs|outputs)\.(parameters|artifacts)\.([-_a-zA-Z0-9]+)(?=[.}])')
+_TASK_OUTPUT_PLACEHOLDER_REGEX = re.compile(r'{{tasks\.([-_a-zA-Z0-9]+)\.outputs\.(parameters|artifacts)\.([-_a-zA-Z0-9]+)(?=[.}])')
+
+_COMPONENT_SPEC_ANNOTATION = 'pipelines.kubeflow.org/component_spec'
+
+_MAX_NAME_PREFIX_LENGTH = 40
+_DIGEST_LENGTH = 16
+
+
+def extract_workflow_templates(workflow: dict) -> List[dict]:
+    '''extract_workflow_templates moves the container templates of the workflow to Argo WorkflowTemplate objects.
+    Args:
+        workflow: The workflow to modify. It's modified in place.
+    Returns:
+        The list of the WorkflowTemplate objects sorted by name. Every WorkflowTemplate has a single template with the same name.
+
+    Motivation:
+    Every compiled package contains the full container template of every component, so the pipelines which use the same components upload the same specs again and again.
+    The WorkflowTemplates can be created in the cluster once and the workflows only reference them.
+
+    Implementation:
+    1. Canonicalize every container template: the input parameters and artifacts get positional names in the order of their first use and the output names lose the template name prefix.
+    2. The WorkflowTemplate name is made from the component name and the digest of the canonical template, so the same component compiled in different pipelines gets the same WorkflowTemplate.
+    3. The tasks which used the container templates reference the WorkflowTemplates with templateRef. Their argument names and the references to their outputs are renamed to the canonical names.
+    '''
+    spec = workflow['spec']
+    templates = spec['templates']
+    excluded_template_names = {spec.get('entrypoint'), spec.get('onExit')}
+
+    template_name_to_tasks = {} # template_name -> List[(dag_template, task)]
+    for template in templates:
+        for task in template.get('dag', {}).get('tasks', []):
+            template_name_to_tasks.setdefault(task['template'], []).append((template, task))
+
+    workflow_templates = OrderedDict() # workflow_template_name -> WorkflowTemplate
+    dag_template_renames = OrderedDict() # id(dag_template) -> (dag_template, {(task_name, kind, output_name): new_output_name})
+    extracted_template_names = set()
+    for template in templates:
+        if 'container' not in template or template['name'] in excluded_template_names:
+            continue
+        tasks = template_name_to_tasks.get(template['name'])
+        if not tasks:
+            continue
+
+        canonical_template, input_name_map, output_name_map = _canonicalize_template(template)
+        workflow_template_name = _make_workflow_template_name(canonical_template)
+        if workflow_template_name not in workflow_templates:
+            canonical_template['name'] = workflow_template_name
+            add_cache_key(canonical_template)
+            workflow_templates[workflow_template_name] = {
+                'apiVersion': 'argoproj.io/v1alpha1',
+                'kind': 'WorkflowTemplate',
+                'metadata': {'name': workflow_template_name},
+                'spec': {'templates': [canonical_template]},
+            }
+        extracted_template_names.add(template['name'])
+
+        for dag_template, task in tasks:
+            del task['template']
+            task['templateRef'] = {'name': workflow_template_name, 'template': workflow_template_name}
+            arguments = task.get('arguments', {})
+            for kind in ('parameters', 'artifacts'):
+                for argument in arguments.get(kind, []):
+                    argument['name'] = input_name_map[kind].get(argument['name'], argument['name'])
+                arguments.get(kind, []).sort(key=lambda x: x['name'])
+            renames = dag_template_renames.setdefault(id(dag_template), (dag_template, {}))[1]
+            for kind in ('parameters', 'artifacts'):
+                for output_name, new_output_name in output_name_map.items():
+                    if output_name != new_output_name:
+                        renames[(task['name'], kind, output_name)] = new_output_name
+
+    for dag_template, renames in dag_template_renames.values():
+        if renames:
+            _rename_task_output_references(dag_template, renames)
+
+    spec['templates'] = [template for template in templates if template['name'] not in extracted_template_names]
+    return [workflow_templates[name] for name in sorted(workflow_templates)]
+
+
+def _canonicalize_template(template: dict) -> Tuple[dict, Dict[str, Dict[str, str]], Dict[str, str]]:
+    '''Returns the canonical copy of the template without the name, the input name maps by kind and the output name map.'''
+    template = json.loads(json.dumps(template))
+    template_name = template.pop('name')
+    # The cache key refers to the input names. It's computed again for the canonical template.
+    if 'memoize' in template:
+        template['memoize']['key'] = ''
+
+    # Input names are numbered in the order of their first use in the template
+    used_input_names = {'parameters': [], 'artifacts': []}
+    def collect_input_names(obj):
+        if isinstance(obj, str):
+            if '{{inputs.' in obj:
+                for _, kind, name in _IO_PLACEHOLDER_REGEX.findall(obj):
+                    if name not in used_input_names[kind]:
+                        used_input_names[kind].append(name)
+        elif isinstance(obj, dict):
+            for key, value in sorted(obj.items()):
+                if key != 'inputs':
+                    collect_input_names(value)
+        elif isinstance(obj, list):
+            for value in obj:
+                collect_input_names(value)
+    collect_input_names(template)
+
+    inputs = template.get('inputs', {})
+    input_name_map = {}
+    for kind, prefix in (('parameters', 'input-'), ('artifacts', 'input-artifact-')):
+        input_specs = inputs.get(kind, [])
+        names = used_input_names[kind] + sorted(
+            (input_spec['name'] for input_spec in input_specs if input_spec['name'] not in used_input_names[kind]),
+            key=lambda name: json.dumps(_get_input_spec(input_specs, name), sort_keys=True),
+        )
+        input_name_map[kind] = {name: prefix + str(index) for index, name in enumerate(names)}
+        for input_spec in input_specs:
+            input_spec['name'] = input_name_map[kind][input_spec['name']]
+        input_specs.sort(key=lambda x: x['name'])
+
+    # Output names lose the template name prefix (the op outputs are named <op name>-<output name>)
+    outputs = template.get('outputs', {})
+    output_names = set(output_spec['name'] for kind in ('parameters', 'artifacts') for output_spec in outputs.get(kind, []))
+    prefix = template_name + '-'
+    output_name_map = {
+        name: name[len(prefix):] if name.startswith(prefix) and len(name) > len(prefix) else name
+        for name in output_names
+    }
+    if len(set(output_name_map.values())) != len(output_name_map):
+        output_name_map = {name: name for name in output_names}
+    for kind in ('parameters', 'artifacts'):
+        for output_spec in outputs.get(kind, []):
+            output_name = output_spec['name']
+            new_output_name = output_name_map[output_name]
+            output_spec['name'] = new_output_name
+            # The output artifact keys contain the output name
+            s3 = output_spec.get('s3')
+            if s3 and s3.get('key', '').endswith('/' + output_name + '.tgz'):
+                s3['key'] = s3['key'][:-len(output_name + '.tgz')] + new_output_name + '.tgz'
+        outputs.get(kind, []).sort(key=lambda x: x['name'])
+
+    def replace(match):
+        section, kind, name = match.groups()
+        name_map = input_name_map[kind] if section == 'inputs' else output_name_map
+        return '{{' + section + '.' + kind + '.' + name_map.get(name, name)
+
+    def rename(obj):
+        if isinstance(obj, str):
+            if '{{inputs.' in obj or '{{outputs.' in obj:
+                return _IO_PLACEHOLDER_REGEX.sub(replace, obj)
+            return obj
+        if isinstance(obj, dict):
+            return {key: rename(value) for key, value in obj.items()}
+        if isinstance(obj, list):
+            return [rename(value) for value in obj]
+        return obj
+
+    return rename(template), input_name_map, output_name_map
+
+
+def _get_input_spec(input_specs: List[dict], name: str) -> Optional[dict]:
+    for input_spec in input_specs:
+        if input_spec['name'] == name:
+            return dict(input_spec, name=None)
+    return None
+
+
+def _make_workflow_template_name(canonical_template: dict) -> str:
+    '''Makes the WorkflowTemplate name from the component name (or the image name) and the template digest.'''
+    digest = hashlib.sha256(json.dumps(canonical_template, sort_keys=True).encode('utf-8')).hexdigest()
+
+    name_prefix = None
+    component_spec_json = canonical_template.get('metadata', {}).get('annotations', {}).get(_COMPONENT_SPEC_ANNOTATION)
+    if component_spec_json:
+        name_prefix = json.loads(component_spec_json).get('name')
+    if not name_prefix:
+        # gcr.io/project/trainer:latest -> trainer
+        image = canonical_template['container'].get('image') or ''
+        name_prefix = image.rsplit('/', 1)[-1].split('@', 1)[0].split(':', 1)[0]
+    name_prefix = sanitize_k8s_name(name_prefix or 'template')[:_MAX_NAME_PREFIX_LENGTH].strip('-') or 'template'
+    return name_prefix + '-' + digest[:_DIGEST_LENGTH]
+
+
+def _rename_task_output_references(dag_template: dict, output_name_map: Dict[Tuple[str, str, str], str]):
+    '''Renames the {{tasks.<task>.outputs.<kind>.<output>}} references in all strings of the DAG template.'''
+    def replace(match):
+        task_name, kind, output_name = match.groups()
+        new_output_name = output_name_map.get((task_name, kind, output_name))
+        if new_output_name is None:
+            return match.group(0)
+        return '{{tasks.' + task_name + '.outputs.' + kind + '.' + new_output_name
+
+    def rename(obj):
+        if isinstance(obj, str):
+            if '{{tasks.' in obj:
+                return _TASK_OUTPUT_PLACEHOLDER_REGEX.sub(replace, obj)
+            return obj
+        if isinstance(obj, dict):
+            for key, value in obj.items():
+                obj[key] = rename(value)
+            return obj
+        if isinstance(obj, list):
+            for index, value in enumerate(obj):
+                obj[index] = rename(value)
+            return obj
+        return obj
+
+    rename(dag_template)
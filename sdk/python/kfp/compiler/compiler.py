@@ -12,27 +12,46 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import json
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+from contextlib import closing
 from deprecated import deprecated
+from io import BytesIO
 import inspect
+import os
+import re
+import sys
 import tarfile
+import tempfile
 import uuid
 import zipfile
-from typing import Callable, Set, List, Text, Dict, Tuple, Any, Union, Optional
+from typing import BinaryIO, Callable, Set, List, Text, Dict, Tuple, Any, Union, Optional
 
-import yaml
 from kfp.dsl import _for_loop
 
 from .. import dsl
 from ._k8s_helper import convert_k8s_obj_to_json, sanitize_k8s_name
-from ._op_to_template import _op_to_template
+from ._op_to_template import _op_to_template, _split_serialized_pipelineparams
 from ._default_transformers import add_pod_env
-
+from ._compile_cache import CompileCache
+from ._profiler import CompileProfiler, _no_profile_phase
+from ._workflow_serializer import (
+    dump_workflow_json, dump_workflow_json_streaming, dump_workflow_yaml, dump_workflow_yaml_streaming, _TemplateSpool,
+)
+from ._group_tree import GroupTreeIndex
+from ._step_cache import add_cache_key, add_cache_keys
+from ._workflow_templates import extract_workflow_templates
+
+from ..components._naming import _make_name_unique_by_adding_index
 from ..components._structures import InputSpec
 from ..dsl._metadata import _extract_pipeline_metadata
 from ..dsl._ops_group import OpsGroup
 
 
+# The references to the parameters of the enclosing DAG, i.e. its inputs and the outputs of its tasks.
+_OUTER_DAG_PLACEHOLDER_REGEX = re.compile(
+    r'{{inputs\.parameters\.([-_a-zA-Z0-9]+)}}|{{tasks\.[-_a-zA-Z0-9]+\.outputs\.parameters\.([-_a-zA-Z0-9]+)}}')
+
+
 class Compiler(object):
   """DSL Compiler.
 
@@ -49,6 +68,39 @@ class Compiler(object):
   ```
   """
 
+  def __init__(self, cache: CompileCache = None, profiler: CompileProfiler = None, streaming: bool = False,
+               workflow_templates_dir: Text = None):
+    """Create a new instance of Compiler.
+
+    Args:
+      cache: Optional CompileCache. When set, the compiled workflows are cached on disk
+        and recompiling an unchanged pipeline skips running the pipeline function.
+      profiler: Optional CompileProfiler which collects the time, memory and counts
+        of the compilation phases.
+      streaming: Whether compile should stream the templates into the package instead of
+        building the whole workflow in memory. The templates are spooled to a temporary
+        file as soon as they're created and the big data passing rewrite works on an index
+        of the template inputs and outputs, so only one template is held in memory at a time.
+        The package is the same as the one produced without streaming. Streaming does
+        not support template deduplication and does not use the cache.
+      workflow_templates_dir: Optional directory where compile writes the container templates
+        as Argo WorkflowTemplate objects, one <name>.yaml file per WorkflowTemplate. The tasks
+        of the compiled workflow reference them with templateRef, so the WorkflowTemplates must
+        be created in the cluster before the pipeline runs. The WorkflowTemplate names contain
+        the digest of the template, so pipelines sharing the components share the files.
+        Requires Argo 2.4 or newer. Not supported in the streaming mode.
+    """
+    self._cache = cache
+    self._profiler = profiler
+    self._streaming = streaming
+    self._workflow_templates_dir = workflow_templates_dir
+
+  def _profile_phase(self, name):
+    """Returns a context manager that measures a compilation phase if profiling is enabled."""
+    if self._profiler is None:
+      return _no_profile_phase()
+    return self._profiler.phase(name)
+
   def _pipelineparam_full_name(self, param):
     """_pipelineparam_full_name converts the names of pipeline parameters
       to unique names in the argo yaml
@@ -71,26 +123,8 @@ class Compiler(object):
               op itself. The list of a given operator is sorted in a way that the farthest
               group is the first and operator itself is the last.
     """
-    def _get_op_groups_helper(current_groups, ops_to_groups):
-      root_group = current_groups[-1]
-      for g in root_group.groups:
-        # Add recursive opsgroup in the ops_to_groups
-        # such that the i/o dependency can be propagated to the ancester opsgroups
-        if g.recursive_ref:
-          ops_to_groups[g.name] = [x.name for x in current_groups] + [g.name]
-          continue
-        current_groups.append(g)
-        _get_op_groups_helper(current_groups, ops_to_groups)
-        del current_groups[-1]
-      for op in root_group.ops:
-        ops_to_groups[op.name] = [x.name for x in current_groups] + [op.name]
-
-    ops_to_groups = {}
-    current_groups = [root_group]
-    _get_op_groups_helper(current_groups, ops_to_groups)
-    return ops_to_groups
-
-  #TODO: combine with the _get_groups_for_ops
+    return GroupTreeIndex(root_group).op_groups
+
   def _get_groups_for_opsgroups(self, root_group):
     """Helper function to get belonging groups for each opsgroup.
 
@@ -102,135 +136,43 @@ class Compiler(object):
               opsgroup itself. The list of a given opsgroup is sorted in a way that the farthest
               group is the first and opsgroup itself is the last.
     """
-    def _get_opsgroup_groups_helper(current_groups, opsgroups_to_groups):
-      root_group = current_groups[-1]
-      for g in root_group.groups:
-        # Add recursive opsgroup in the ops_to_groups
-        # such that the i/o dependency can be propagated to the ancester opsgroups
-        if g.recursive_ref:
-          continue
-        opsgroups_to_groups[g.name] = [x.name for x in current_groups] + [g.name]
-        current_groups.append(g)
-        _get_opsgroup_groups_helper(current_groups, opsgroups_to_groups)
-        del current_groups[-1]
-
-    opsgroups_to_groups = {}
-    current_groups = [root_group]
-    _get_opsgroup_groups_helper(current_groups, opsgroups_to_groups)
-    return opsgroups_to_groups
+    return GroupTreeIndex(root_group).opsgroup_groups
 
   def _get_groups(self, root_group):
     """Helper function to get all groups (not including ops) in a pipeline."""
+    return GroupTreeIndex(root_group).groups
 
-    def _get_groups_helper(group):
-      groups = {group.name: group}
-      for g in group.groups:
-        # Skip the recursive opsgroup because no templates
-        # need to be generated for the recursive opsgroups.
-        if not g.recursive_ref:
-          groups.update(_get_groups_helper(g))
-      return groups
-
-    return _get_groups_helper(root_group)
-
-  def _get_uncommon_ancestors(self, op_groups, opsgroup_groups, op1, op2):
+  def _get_uncommon_ancestors(self, group_index, op1, op2):
     """Helper function to get unique ancestors between two ops.
 
     For example, op1's ancestor groups are [root, G1, G2, G3, op1], op2's ancestor groups are
     [root, G1, G4, op2], then it returns a tuple ([G2, G3, op1], [G4, op2]).
-    """
-    #TODO: extract a function for the following two code module
-    if op1.name in op_groups:
-      op1_groups = op_groups[op1.name]
-    elif op1.name in opsgroup_groups:
-      op1_groups = opsgroup_groups[op1.name]
-    else:
-      raise ValueError(op1.name + ' does not exist.')
-
-    if op2.name in op_groups:
-      op2_groups = op_groups[op2.name]
-    elif op2.name in opsgroup_groups:
-      op2_groups = opsgroup_groups[op2.name]
-    else:
-      raise ValueError(op1.name + ' does not exist.')
 
-    both_groups = [op1_groups, op2_groups]
-    common_groups_len = sum(1 for x in zip(*both_groups) if x==(x[0],)*len(x))
-    group1 = op1_groups[common_groups_len:]
-    group2 = op2_groups[common_groups_len:]
-    return (group1, group2)
+    Args:
+      group_index(GroupTreeIndex): index of the pipeline group tree.
+    """
+    return group_index.uncommon_ancestors(op1.name, op2.name)
 
   def _get_condition_params_for_ops(self, root_group):
     """Get parameters referenced in conditions of ops."""
-    conditions = defaultdict(set)
-
-    def _get_condition_params_for_ops_helper(group, current_conditions_params):
-      new_current_conditions_params = current_conditions_params
-      if group.type == 'condition':
-        new_current_conditions_params = list(current_conditions_params)
-        if isinstance(group.condition.operand1, dsl.PipelineParam):
-          new_current_conditions_params.append(group.condition.operand1)
-        if isinstance(group.condition.operand2, dsl.PipelineParam):
-          new_current_conditions_params.append(group.condition.operand2)
-      for op in group.ops:
-        for param in new_current_conditions_params:
-          conditions[op.name].add(param)
-      for g in group.groups:
-        # If the subgroup is a recursive opsgroup, propagate the pipelineparams
-        # in the condition expression, similar to the ops.
-        if g.recursive_ref:
-          for param in new_current_conditions_params:
-            conditions[g.name].add(param)
-        else:
-          _get_condition_params_for_ops_helper(g, new_current_conditions_params)
-    _get_condition_params_for_ops_helper(root_group, [])
-    return conditions
-
-  def _get_next_group_or_op(cls, to_visit: List, already_visited: Set):
-    """Get next group or op to visit."""
-    if len(to_visit) == 0:
-      return None
-    next = to_visit.pop(0)
-    while next in already_visited:
-      next = to_visit.pop(0)
-    already_visited.add(next)
-    return next
+    return GroupTreeIndex(root_group).condition_params
 
   def _get_for_loop_ops(self, new_root) -> Dict[Text, dsl.ParallelFor]:
-    to_visit = self._get_all_subgroups_and_ops(new_root)
-    op_name_to_op = {}
-    already_visited = set()
-
-    while len(to_visit):
-      next_op = self._get_next_group_or_op(to_visit, already_visited)
-      if next_op is None:
-        break
-      to_visit.extend(self._get_all_subgroups_and_ops(next_op))
-      if isinstance(next_op, dsl.ParallelFor):
-        op_name_to_op[next_op.name] = next_op
-
-    return op_name_to_op
-
-  def _get_all_subgroups_and_ops(self, op):
-    """Get all ops and groups contained within this group."""
-    subgroups = []
-    if hasattr(op, 'ops'):
-      subgroups.extend(op.ops)
-    if hasattr(op, 'groups'):
-      subgroups.extend(op.groups)
-    return subgroups
+    return GroupTreeIndex(new_root).for_loop_ops
 
   def _get_inputs_outputs(
           self,
           pipeline,
           root_group,
-          op_groups,
-          opsgroup_groups,
+          group_index: GroupTreeIndex,
           condition_params,
           op_name_to_for_loop_op: Dict[Text, dsl.ParallelFor],
   ):
     """Get inputs and outputs of each group and op.
 
+    Args:
+      group_index: index of the pipeline group tree.
+
     Returns:
       A tuple (inputs, outputs).
       inputs and outputs are dicts with key being the group/op names and values being list of
@@ -249,9 +191,8 @@ class Compiler(object):
         if param.value:
           continue
         if param.op_name:
-          upstream_op = pipeline.ops[param.op_name]
           upstream_groups, downstream_groups = \
-            self._get_uncommon_ancestors(op_groups, opsgroup_groups, upstream_op, op)
+            group_index.uncommon_ancestors(param.op_name, op.name)
           for i, group_name in enumerate(downstream_groups):
             if i == 0:
               # If it is the first uncommon downstream group, then the input comes from
@@ -270,7 +211,7 @@ class Compiler(object):
               outputs[group_name].add((param.full_name, upstream_groups[i+1]))
         else:
           if not op.is_exit_handler:
-            for group_name in op_groups[op.name][::-1]:
+            for group_name in reversed(group_index.op_groups[op.name]):
               # if group is for loop group and param is that loop's param, then the param
               # is created by that for loop ops_group and it shouldn't be an input to
               # any of its parent groups.
@@ -296,9 +237,8 @@ class Compiler(object):
             continue
           full_name = self._pipelineparam_full_name(param)
           if param.op_name:
-            upstream_op = pipeline.ops[param.op_name]
             upstream_groups, downstream_groups = \
-              self._get_uncommon_ancestors(op_groups, opsgroup_groups, upstream_op, group)
+              group_index.uncommon_ancestors(param.op_name, group.name)
             for i, g in enumerate(downstream_groups):
               if i == 0:
                 inputs[g].add((full_name, upstream_groups[0]))
@@ -314,7 +254,7 @@ class Compiler(object):
               else:
                 outputs[g].add((full_name, upstream_groups[i+1]))
           elif not is_condition_param:
-            for g in op_groups[group.name]:
+            for g in group_index.op_groups[group.name]:
               inputs[g].add((full_name, None))
       for subgroup in group.groups:
         _get_inputs_outputs_recursive_opsgroup(subgroup)
@@ -323,9 +263,12 @@ class Compiler(object):
 
     return inputs, outputs
 
-  def _get_dependencies(self, pipeline, root_group, op_groups, opsgroups_groups, opsgroups, condition_params):
+  def _get_dependencies(self, pipeline, root_group, group_index, opsgroups, condition_params):
     """Get dependent groups and ops for all ops and groups.
 
+    Args:
+      group_index(GroupTreeIndex): index of the pipeline group tree.
+
     Returns:
       A dict. Key is group/op name, value is a list of dependent groups/ops.
       The dependencies are calculated in the following way: if op2 depends on op1,
@@ -343,15 +286,11 @@ class Compiler(object):
 
       for upstream_op_name in upstream_op_names:
         # the dependent op could be either a BaseOp or an opsgroup
-        if upstream_op_name in pipeline.ops:
-          upstream_op = pipeline.ops[upstream_op_name]
-        elif upstream_op_name in opsgroups:
-          upstream_op = opsgroups[upstream_op_name]
-        else:
+        if upstream_op_name not in pipeline.ops and upstream_op_name not in opsgroups:
           raise ValueError('compiler cannot find the ' + upstream_op_name)
 
-        upstream_groups, downstream_groups = self._get_uncommon_ancestors(op_groups, opsgroups_groups, upstream_op, op)
-        dependencies[downstream_groups[0]].add(upstream_groups[0])
+        upstream_group, downstream_group = group_index.first_uncommon_ancestors(upstream_op_name, op.name)
+        dependencies[downstream_group].add(upstream_group)
 
     # Generate dependencies based on the recursive opsgroups
     #TODO: refactor the following codes with the above
@@ -363,15 +302,11 @@ class Compiler(object):
             upstream_op_names.add(param.op_name)
 
       for op_name in upstream_op_names:
-        if op_name in pipeline.ops:
-          upstream_op = pipeline.ops[op_name]
-        elif op_name in opsgroups_groups:
-          upstream_op = opsgroups_groups[op_name]
-        else:
+        if op_name not in pipeline.ops and op_name not in group_index.opsgroup_groups:
           raise ValueError('compiler cannot find the ' + op_name)
-        upstream_groups, downstream_groups = \
-          self._get_uncommon_ancestors(op_groups, opsgroups_groups, upstream_op, group)
-        dependencies[downstream_groups[0]].add(upstream_groups[0])
+        upstream_group, downstream_group = \
+          group_index.first_uncommon_ancestors(op_name, group.name)
+        dependencies[downstream_group].add(upstream_group)
 
       for subgroup in group.groups:
         _get_dependency_opsgroup(subgroup, dependencies)
@@ -506,6 +441,80 @@ class Compiler(object):
     template['dag'] = {'tasks': tasks}
     return template
 
+  def _limit_loop_parallelism(self, group, template, outputs):
+    """Moves the loop tasks with limited parallelism into wrapper DAG templates.
+
+    Argo limits the parallelism of the nodes inside a template invocation. The loop
+    iterations are the children of the DAG which contains the loop task, so every loop
+    with the parallelism is moved to its own DAG template with the parallelism set. The
+    wrapper passes the loop arguments and the loop outputs through.
+
+    Args:
+      group: The OpsGroup of the DAG template.
+      template: The DAG template of the group. Its loop tasks are modified in place.
+      outputs: The group outputs, see _get_inputs_outputs.
+
+    Returns:
+      The list of the wrapper templates.
+    """
+    loops = {
+        sub_group.name: sub_group for sub_group in group.groups
+        if isinstance(sub_group, dsl.ParallelFor) and sub_group.parallelism is not None and not sub_group.recursive_ref
+    }
+    if not loops:
+      return []
+
+    wrapper_templates = []
+    tasks = template['dag']['tasks']
+    for index, task in enumerate(tasks):
+      loop = loops.get(task['name'])
+      if loop is None:
+        continue
+
+      # The references to the outer DAG are replaced with the wrapper inputs.
+      placeholder_to_input_name = OrderedDict()
+      def replace_placeholder(match):
+        placeholder = match.group(0)
+        if placeholder not in placeholder_to_input_name:
+          input_name = match.group(1) or match.group(2)
+          input_name = _make_name_unique_by_adding_index(input_name, placeholder_to_input_name.values(), '-')
+          placeholder_to_input_name[placeholder] = input_name
+        return '{{inputs.parameters.%s}}' % placeholder_to_input_name[placeholder]
+
+      inner_task = {key: value for key, value in task.items() if key not in ('dependencies', 'when')}
+      if 'withParam' in inner_task:
+        inner_task['withParam'] = _OUTER_DAG_PLACEHOLDER_REGEX.sub(replace_placeholder, inner_task['withParam'])
+      if 'arguments' in inner_task:
+        inner_task['arguments'] = {'parameters': [
+            dict(argument, value=_OUTER_DAG_PLACEHOLDER_REGEX.sub(replace_placeholder, argument['value']))
+            for argument in inner_task['arguments']['parameters']
+        ]}
+
+      wrapper_name = loop.name + '-parallelism'
+      wrapper_template = {'name': wrapper_name, 'parallelism': loop.parallelism}
+      if placeholder_to_input_name:
+        wrapper_template['inputs'] = {'parameters': sorted(
+            ({'name': input_name} for input_name in placeholder_to_input_name.values()), key=lambda x: x['name'])}
+      if outputs.get(loop.name):
+        wrapper_template['outputs'] = {'parameters': sorted(
+            ({
+                'name': param_name,
+                'valueFrom': {'parameter': '{{tasks.%s.outputs.parameters.%s}}' % (task['name'], param_name)},
+            } for param_name, _ in outputs[loop.name]), key=lambda x: x['name'])}
+      wrapper_template['dag'] = {'tasks': [inner_task]}
+      wrapper_templates.append(wrapper_template)
+
+      outer_task = {'name': task['name'], 'template': wrapper_name}
+      for key in ('dependencies', 'when'):
+        if key in task:
+          outer_task[key] = task[key]
+      if placeholder_to_input_name:
+        outer_task['arguments'] = {'parameters': sorted(
+            ({'name': input_name, 'value': placeholder} for placeholder, input_name in placeholder_to_input_name.items()),
+            key=lambda x: x['name'])}
+      tasks[index] = outer_task
+    return wrapper_templates
+
   def get_arguments_for_sub_group(
           self,
           sub_group: Union[OpsGroup, dsl._container_op.BaseOp],
@@ -546,15 +555,30 @@ class Compiler(object):
 
     return arguments
 
-  def _create_dag_templates(self, pipeline, op_transformers=None, op_to_templates_handler=None):
+  def _create_dag_templates(self, pipeline, op_transformers=None, op_to_templates_handler=None, template_handler=None):
     """Create all groups and ops templates in the pipeline.
 
     Args:
       pipeline: Pipeline context object to get all the pipeline data from.
       op_transformers: A list of functions that are applied to all ContainerOp instances that are being processed.
       op_to_templates_handler: Handler which converts a base op into a list of argo templates.
+      template_handler: Optional function which is called with every template as soon as it's
+        created. When set, the templates are not collected and None is returned.
     """
     op_to_templates_handler = op_to_templates_handler or (lambda op : [_op_to_template(op)])
+    templates = None
+    if template_handler is None:
+      templates = []
+      template_handler = templates.append
+    try:
+      with self._profile_phase('create_dag_templates') as counts:
+        self._create_dag_templates_impl(pipeline, op_transformers, op_to_templates_handler, template_handler, counts)
+    finally:
+      # The cached strings are only reused within the pipeline.
+      _split_serialized_pipelineparams.cache_clear()
+    return templates
+
+  def _create_dag_templates_impl(self, pipeline, op_transformers, op_to_templates_handler, template_handler, counts):
     root_group = pipeline.groups[0]
 
     # Call the transformation functions before determining the inputs/outputs, otherwise
@@ -565,50 +589,90 @@ class Compiler(object):
         transformer(op)
 
     # Generate core data structures to prepare for argo yaml generation
-    #   op_name_to_parent_groups: op name -> list of ancestor groups including the current op
+    #   group_index: op/opsgroup name -> list of ancestor groups including the current op/opsgroup,
+    #                and the lowest common ancestor lookups between them
     #   opsgroups: a dictionary of ospgroup.name -> opsgroup
     #   inputs, outputs: group/op names -> list of tuples (full_param_name, producing_op_name)
     #   condition_params: recursive_group/op names -> list of pipelineparam
     #   dependencies: group/op name -> list of dependent groups/ops.
     # Special Handling for the recursive opsgroup
-    #   op_name_to_parent_groups also contains the recursive opsgroups
-    #   condition_params from _get_condition_params_for_ops also contains the recursive opsgroups
+    #   group_index.op_groups also contains the recursive opsgroups
+    #   condition_params also contains the recursive opsgroups
     #   groups does not include the recursive opsgroups
-    opsgroups = self._get_groups(root_group)
-    op_name_to_parent_groups = self._get_groups_for_ops(root_group)
-    opgroup_name_to_parent_groups = self._get_groups_for_opsgroups(root_group)
-    condition_params = self._get_condition_params_for_ops(root_group)
-    op_name_to_for_loop_op = self._get_for_loop_ops(root_group)
+    group_index = GroupTreeIndex(root_group)
+    opsgroups = group_index.groups
+    condition_params = group_index.condition_params
+    op_name_to_for_loop_op = group_index.for_loop_ops
     inputs, outputs = self._get_inputs_outputs(
       pipeline,
       root_group,
-      op_name_to_parent_groups,
-      opgroup_name_to_parent_groups,
+      group_index,
       condition_params,
       op_name_to_for_loop_op,
     )
     dependencies = self._get_dependencies(
       pipeline,
       root_group,
-      op_name_to_parent_groups,
-      opgroup_name_to_parent_groups,
+      group_index,
       opsgroups,
       condition_params,
     )
 
-    templates = []
+    counts['ops'] = len(pipeline.ops)
+    counts['groups'] = len(opsgroups)
+    counts['params'] = sum(len(op.inputs) for op in pipeline.ops.values())
+
+    template_count = 0
     for opsgroup in opsgroups.keys():
       template = self._group_to_dag_template(opsgroups[opsgroup], inputs, outputs, dependencies)
-      templates.append(template)
+      for loop_template in self._limit_loop_parallelism(opsgroups[opsgroup], template, outputs):
+        template_handler(loop_template)
+        template_count += 1
+      template_handler(template)
+      template_count += 1
 
     for op in pipeline.ops.values():
-      templates.extend(op_to_templates_handler(op))
-
-    return templates
+      with self._profile_phase('op_to_template') as op_counts:
+        op_templates = op_to_templates_handler(op)
+        op_counts['ops'] = 1
+        op_counts['templates'] = len(op_templates)
+      for template in op_templates:
+        template_handler(template)
+      template_count += len(op_templates)
+    counts['templates'] = template_count
 
   def _create_pipeline_workflow(self, args, pipeline, op_transformers=None, pipeline_conf=None):
     """Create workflow for the pipeline."""
 
+    # Making the pipeline group name unique to prevent name clashes with templates
+    pipeline_group = pipeline.groups[0]
+    temp_pipeline_group_name = uuid.uuid4().hex
+    pipeline_group.name = temp_pipeline_group_name
+
+    # Templates
+    templates = self._create_dag_templates(pipeline, op_transformers)
+
+    template_map = {template['name'].lower(): template  for template in templates}
+    workflow = self._create_workflow_skeleton(args, pipeline, pipeline_conf, template_map)
+
+    # Restoring the name of the pipeline template
+    pipeline_template = template_map[temp_pipeline_group_name]
+    pipeline_template['name'] = workflow['spec']['entrypoint']
+
+    templates.sort(key=lambda x: x['name'])
+    workflow['spec']['templates'] = templates
+    return workflow
+
+  def _create_workflow_skeleton(self, args, pipeline, pipeline_conf, template_names):
+    """Create the workflow for the pipeline without the templates.
+
+    Args:
+      args: The pipeline arguments with their default values.
+      pipeline: Pipeline context object.
+      pipeline_conf: PipelineConf instance.
+      template_names: Collection of the lowercased names of all templates.
+    """
+
     # Input Parameters
     input_params = []
     for arg in args:
@@ -620,14 +684,6 @@ class Compiler(object):
           param['value'] = str(arg.value)
       input_params.append(param)
 
-    # Making the pipeline group name unique to prevent name clashes with templates
-    pipeline_group = pipeline.groups[0]
-    temp_pipeline_group_name = uuid.uuid4().hex
-    pipeline_group.name = temp_pipeline_group_name
-
-    # Templates
-    templates = self._create_dag_templates(pipeline, op_transformers)
-
     # Exit Handler
     exit_handler = None
     if pipeline.groups[0].groups:
@@ -640,22 +696,15 @@ class Compiler(object):
 
     # Workaround for pipeline name clashing with container template names
     # TODO: Make sure template names cannot clash at all (container, DAG, workflow)
-    template_map = {template['name'].lower(): template  for template in templates}
-    from ..components._naming import _make_name_unique_by_adding_index
-    pipeline_template_name = _make_name_unique_by_adding_index(pipeline_name, template_map, '-')
-
-    # Restoring the name of the pipeline template
-    pipeline_template = template_map[temp_pipeline_group_name]
-    pipeline_template['name'] = pipeline_template_name
+    pipeline_template_name = _make_name_unique_by_adding_index(pipeline_name, template_names, '-')
 
-    templates.sort(key=lambda x: x['name'])
     workflow = {
       'apiVersion': 'argoproj.io/v1alpha1',
       'kind': 'Workflow',
       'metadata': {'generateName': pipeline_template_name + '-'},
       'spec': {
         'entrypoint': pipeline_template_name,
-        'templates': templates,
+        'templates': [],
         'arguments': {'parameters': input_params},
         'serviceAccountName': 'pipeline-runner'
       }
@@ -673,6 +722,9 @@ class Compiler(object):
     if pipeline_conf.timeout:
       workflow['spec']['activeDeadlineSeconds'] = pipeline_conf.timeout
 
+    if pipeline_conf.parallelism is not None:
+      workflow['spec']['parallelism'] = pipeline_conf.parallelism
+
     if exit_handler:
       workflow['spec']['onExit'] = exit_handler.name
     return workflow
@@ -743,8 +795,73 @@ class Compiler(object):
       pipeline_description: Text=None,
       params_list: List[dsl.PipelineParam]=None,
       pipeline_conf: dsl.PipelineConf = None,
+      cache_key: Text = None,
       ) -> Dict[Text, Any]:
-    """ Internal implementation of create_workflow."""
+    """ Internal implementation of create_workflow.
+
+    Args:
+      cache_key: The compile cache key if it's already calculated by the caller.
+    """
+    if self._cache:
+      if cache_key is None:
+        cache_key = self._cache.make_key(pipeline_func, pipeline_name, pipeline_description, params_list, pipeline_conf)
+      if cache_key:
+        workflow = self._cache.get_workflow(cache_key)
+        if workflow is not None:
+          return workflow
+
+    dsl_pipeline, pipeline_meta, args_list_with_defaults, op_transformers, pipeline_conf = self._run_pipeline_function(
+        pipeline_func,
+        pipeline_name,
+        pipeline_description,
+        params_list,
+        pipeline_conf,
+    )
+
+    workflow = self._create_pipeline_workflow(
+        args_list_with_defaults,
+        dsl_pipeline,
+        op_transformers,
+        pipeline_conf,
+    )
+
+    if pipeline_conf.deduplicate_templates:
+      from ._template_deduplicator import deduplicate_container_templates
+      with self._profile_phase('deduplicate_templates') as counts:
+        template_count = len(workflow['spec']['templates'])
+        workflow = deduplicate_container_templates(workflow)
+        counts['templates'] = len(workflow['spec']['templates'])
+        counts['removed_templates'] = template_count - counts['templates']
+
+    from ._data_passing_rewriter import fix_big_data_passing
+    # The workflow has just been created, so it's safe to modify it in place.
+    with self._profile_phase('fix_big_data_passing') as counts:
+      workflow = fix_big_data_passing(workflow, in_place=True)
+      counts['templates'] = len(workflow['spec']['templates'])
+
+    # The cache keys depend on the final template specs and input names.
+    add_cache_keys(workflow['spec']['templates'])
+
+    import json
+    workflow.setdefault('metadata', {}).setdefault('annotations', {})['pipelines.kubeflow.org/pipeline_spec'] = json.dumps(pipeline_meta.to_dict(), sort_keys=True)
+
+    if cache_key:
+      self._cache.put_workflow(cache_key, workflow)
+
+    return workflow
+
+  def _run_pipeline_function(self,
+      pipeline_func: Callable,
+      pipeline_name: Text=None,
+      pipeline_description: Text=None,
+      params_list: List[dsl.PipelineParam]=None,
+      pipeline_conf: dsl.PipelineConf = None,
+      ):
+    """Runs the pipeline function and prepares the pipeline for creating the templates.
+
+    Returns:
+      A tuple (dsl_pipeline, pipeline_meta, args_list_with_defaults, op_transformers, pipeline_conf).
+    """
     params_list = params_list or []
     argspec = inspect.getfullargspec(pipeline_func)
 
@@ -776,13 +893,18 @@ class Compiler(object):
           break
       args_list.append(dsl.PipelineParam(sanitize_k8s_name(arg_name, True), param_type=arg_type))
 
-    with dsl.Pipeline(pipeline_name) as dsl_pipeline:
-      pipeline_func(*args_list)
+    with self._profile_phase('dsl_function') as counts:
+      with dsl.Pipeline(pipeline_name) as dsl_pipeline:
+        pipeline_func(*args_list)
+      counts['ops'] = len(dsl_pipeline.ops)
+      counts['params'] = len(args_list)
 
     pipeline_conf = pipeline_conf or dsl_pipeline.conf # Configuration passed to the compiler is overriding. Unfortunately, it's not trivial to detect whether the dsl_pipeline.conf was ever modified.
 
     self._validate_exit_handler(dsl_pipeline)
-    self._sanitize_and_inject_artifact(dsl_pipeline, pipeline_conf)
+    with self._profile_phase('sanitize_and_inject_artifact') as counts:
+      self._sanitize_and_inject_artifact(dsl_pipeline, pipeline_conf)
+      counts['ops'] = len(dsl_pipeline.ops)
 
     # Fill in the default values.
     args_list_with_defaults = []
@@ -804,23 +926,16 @@ class Compiler(object):
             type=param.param_type,
             default=param.value) for param in params_list]
 
+    # The ops without their own caching options use the pipeline caching options.
+    for op in dsl_pipeline.ops.values():
+      if op.caching_enabled is None:
+        op.caching_enabled = pipeline_conf.caching_enabled
+        op.cache_max_age = pipeline_conf.cache_max_age
+
     op_transformers = [add_pod_env]
     op_transformers.extend(pipeline_conf.op_transformers)
 
-    workflow = self._create_pipeline_workflow(
-        args_list_with_defaults,
-        dsl_pipeline,
-        op_transformers,
-        pipeline_conf,
-    )
-
-    from ._data_passing_rewriter import fix_big_data_passing
-    workflow = fix_big_data_passing(workflow)
-
-    import json
-    workflow.setdefault('metadata', {}).setdefault('annotations', {})['pipelines.kubeflow.org/pipeline_spec'] = json.dumps(pipeline_meta.to_dict(), sort_keys=True)
-
-    return workflow
+    return dsl_pipeline, pipeline_meta, args_list_with_defaults, op_transformers, pipeline_conf
 
   # For now (0.1.31) this function is only used by TFX's KubeflowDagRunner.
   # See https://github.com/tensorflow/tfx/blob/811e4c1cc0f7903d73d151b9d4f21f79f6013d4a/tfx/orchestration/kubeflow/kubeflow_dag_runner.py#L238
@@ -879,44 +994,86 @@ class Compiler(object):
   def _write_workflow(workflow: Dict[Text, Any], package_path: Text = None):
     """Dump pipeline workflow into yaml spec and write out in the format specified by the user.
 
+    The workflow is streamed straight into the package file without building the whole
+    yaml text in memory. Package paths ending with .json are written as JSON which Argo
+    also accepts and which is much faster to produce.
+
     Args:
       workflow: Workflow spec of the pipline, dict.
       package_path: file path to be written. If not specified, a yaml_text string
         will be returned.
     """
-    yaml.Dumper.ignore_aliases = lambda *args : True
-    yaml_text = yaml.dump(workflow, default_flow_style=False, default_style='|')
+    if package_path is None:
+      return dump_workflow_yaml(workflow)
 
-    if '{{pipelineparam' in yaml_text:
-      raise RuntimeError(
-          'Internal compiler error: Found unresolved PipelineParam. '
-          'Please create a new issue at https://github.com/kubeflow/pipelines/issues '
-          'attaching the pipeline code and the pipeline package.' )
+    try:
+      if package_path.endswith('.json'):
+        with open(package_path, 'w') as json_file:
+          dump_workflow_json(workflow, json_file)
+      else:
+        Compiler._write_package(package_path, lambda yaml_file: dump_workflow_yaml(workflow, yaml_file))
+    except RuntimeError:
+      # Not leaving a partially written package behind.
+      if os.path.exists(package_path):
+        os.remove(package_path)
+      raise
 
-    if package_path is None:
-      return yaml_text
+  @staticmethod
+  def _write_workflow_templates(workflow_templates: List[Dict[Text, Any]], directory: Text):
+    """Writes every WorkflowTemplate to the <name>.yaml file in the directory.
+
+    The files are replaced atomically, so the concurrent compilations of the pipelines
+    sharing the WorkflowTemplates can write to the same directory.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for workflow_template in workflow_templates:
+      path = os.path.join(directory, workflow_template['metadata']['name'] + '.yaml')
+      tmp_path = path + '.' + str(os.getpid()) + '.tmp'
+      try:
+        with open(tmp_path, 'wb') as yaml_file:
+          dump_workflow_yaml(workflow_template, yaml_file)
+        os.replace(tmp_path, path)
+      finally:
+        if os.path.exists(tmp_path):
+          os.remove(tmp_path)
+
+  @staticmethod
+  def _write_package(package_path: Text, write_yaml: Callable[[BinaryIO], Any]):
+    """Write the workflow yaml out in the format specified by the package path extension.
 
+    Args:
+      package_path: file path to be written.
+      write_yaml: function that writes the workflow yaml into the binary stream it's given.
+    """
     if package_path.endswith('.tar.gz') or package_path.endswith('.tgz'):
-      from contextlib import closing
-      from io import BytesIO
-      with tarfile.open(package_path, "w:gz") as tar:
-          with closing(BytesIO(yaml_text.encode())) as yaml_file:
-            tarinfo = tarfile.TarInfo('pipeline.yaml')
-            tarinfo.size = len(yaml_file.getvalue())
-            tar.addfile(tarinfo, fileobj=yaml_file)
+      # The tar member size must be known in advance, so the yaml is spooled to a temporary file.
+      with tempfile.TemporaryFile() as yaml_file:
+        write_yaml(yaml_file)
+        tarinfo = tarfile.TarInfo('pipeline.yaml')
+        tarinfo.size = yaml_file.tell()
+        yaml_file.seek(0)
+        with tarfile.open(package_path, "w:gz") as tar:
+          tar.addfile(tarinfo, fileobj=yaml_file)
     elif package_path.endswith('.zip'):
       with zipfile.ZipFile(package_path, "w") as zip:
         zipinfo = zipfile.ZipInfo('pipeline.yaml')
         zipinfo.compress_type = zipfile.ZIP_DEFLATED
-        zip.writestr(zipinfo, yaml_text)
+        if sys.version_info >= (3, 6):
+          with zip.open(zipinfo, 'w') as yaml_file:
+            write_yaml(yaml_file)
+        else:
+          # ZipFile.open does not support writing before Python 3.6
+          with closing(BytesIO()) as yaml_file:
+            write_yaml(yaml_file)
+            zip.writestr(zipinfo, yaml_file.getvalue())
     elif package_path.endswith('.yaml') or package_path.endswith('.yml'):
-      with open(package_path, 'w') as yaml_file:
-        yaml_file.write(yaml_text)
+      with open(package_path, 'wb') as yaml_file:
+        write_yaml(yaml_file)
     else:
       raise ValueError(
           'The output path '+ package_path +
           ' should ends with one of the following formats: '
-          '[.tar.gz, .tgz, .zip, .yaml, .yml]')
+          '[.tar.gz, .tgz, .zip, .yaml, .yml, .json]')
 
   def _create_and_write_workflow(
       self,
@@ -928,11 +1085,140 @@ class Compiler(object):
       package_path: Text=None
   ) -> None:
     """Compile the given pipeline function and dump it to specified file format."""
+    if self._workflow_templates_dir is not None and package_path:
+      if self._streaming:
+        raise ValueError('WorkflowTemplates are not supported when compiling in the streaming mode.')
+      workflow = self._create_workflow(
+          pipeline_func,
+          pipeline_name,
+          pipeline_description,
+          params_list,
+          pipeline_conf)
+      with self._profile_phase('extract_workflow_templates') as counts:
+        workflow_templates = extract_workflow_templates(workflow)
+        counts['workflow_templates'] = len(workflow_templates)
+      with self._profile_phase('write_workflow') as counts:
+        self._write_workflow_templates(workflow_templates, self._workflow_templates_dir)
+        self._write_workflow(workflow, package_path)
+        counts['templates'] = len(workflow['spec']['templates'])
+      return
+
+    if self._streaming and package_path:
+      self._create_and_write_workflow_streaming(
+          pipeline_func,
+          pipeline_name,
+          pipeline_description,
+          params_list,
+          pipeline_conf,
+          package_path)
+      return
+
+    cache_key = None
+    # The cache only keeps the yaml text. JSON packages are written from the cached workflow.
+    if self._cache and package_path and not package_path.endswith('.json'):
+      cache_key = self._cache.make_key(pipeline_func, pipeline_name, pipeline_description, params_list, pipeline_conf)
+      yaml_text = self._cache.get_yaml(cache_key) if cache_key else None
+      if yaml_text is not None:
+        self._write_package(package_path, lambda yaml_file: yaml_file.write(yaml_text.encode('utf-8')))
+        return
+
     workflow = self._create_workflow(
         pipeline_func,
         pipeline_name,
         pipeline_description,
         params_list,
-        pipeline_conf)
-    self._write_workflow(workflow, package_path)
+        pipeline_conf,
+        cache_key=cache_key)
+    if not cache_key:
+      with self._profile_phase('write_workflow') as counts:
+        self._write_workflow(workflow, package_path)
+        counts['templates'] = len(workflow['spec']['templates'])
+      return
+
+    with self._profile_phase('write_workflow') as counts:
+      yaml_text = self._write_workflow(workflow)
+      counts['templates'] = len(workflow['spec']['templates'])
+    self._cache.put_yaml(cache_key, yaml_text)
+    self._write_package(package_path, lambda yaml_file: yaml_file.write(yaml_text.encode('utf-8')))
+
+  def _create_and_write_workflow_streaming(
+      self,
+      pipeline_func: Callable,
+      pipeline_name: Text=None,
+      pipeline_description: Text=None,
+      params_list: List[dsl.PipelineParam]=None,
+      pipeline_conf: dsl.PipelineConf=None,
+      package_path: Text=None
+  ) -> None:
+    """Compile the given pipeline function streaming the templates into the package one at a time."""
+    from ._data_passing_rewriter import DataPassingIndex
+
+    dsl_pipeline, pipeline_meta, args_list_with_defaults, op_transformers, pipeline_conf = self._run_pipeline_function(
+        pipeline_func,
+        pipeline_name,
+        pipeline_description,
+        params_list,
+        pipeline_conf,
+    )
+    if pipeline_conf.deduplicate_templates:
+      raise ValueError('Template deduplication is not supported when compiling in the streaming mode.')
 
+    # Making the pipeline group name unique to prevent name clashes with templates
+    pipeline_group = dsl_pipeline.groups[0]
+    temp_pipeline_group_name = uuid.uuid4().hex
+    pipeline_group.name = temp_pipeline_group_name
+
+    with tempfile.TemporaryFile() as spool_file:
+      spool = _TemplateSpool(spool_file)
+      self._create_dag_templates(dsl_pipeline, op_transformers, template_handler=spool.add)
+
+      workflow = self._create_workflow_skeleton(
+          args_list_with_defaults,
+          dsl_pipeline,
+          pipeline_conf,
+          set(name.lower() for name, _ in spool.entries),
+      )
+      pipeline_template_name = workflow['spec']['entrypoint']
+      # Restoring the name of the pipeline template
+      sorted_entries = sorted(
+          ((pipeline_template_name if name == temp_pipeline_group_name else name, offset) for name, offset in spool.entries),
+          key=lambda x: x[0],
+      )
+
+      def read_templates():
+        for name, offset in sorted_entries:
+          template = spool.read(offset)
+          template['name'] = name
+          yield template
+
+      with self._profile_phase('fix_big_data_passing') as counts:
+        data_passing_index = DataPassingIndex()
+        for template in read_templates():
+          data_passing_index.add_template(template)
+        data_passing_index.propagate()
+        data_passing_index.rewrite_workflow_arguments(workflow['spec'])
+        counts['templates'] = len(sorted_entries)
+
+      workflow.setdefault('metadata', {}).setdefault('annotations', {})['pipelines.kubeflow.org/pipeline_spec'] = json.dumps(pipeline_meta.to_dict(), sort_keys=True)
+
+      def read_rewritten_templates():
+        for template in read_templates():
+          data_passing_index.rewrite_template(template)
+          add_cache_key(template)
+          yield template
+
+      with self._profile_phase('write_workflow') as counts:
+        try:
+          if package_path.endswith('.json'):
+            with open(package_path, 'w') as json_file:
+              dump_workflow_json_streaming(workflow, read_rewritten_templates(), json_file)
+          else:
+            self._write_package(
+                package_path,
+                lambda yaml_file: dump_workflow_yaml_streaming(workflow, read_rewritten_templates(), yaml_file))
+        except RuntimeError:
+          # Not leaving a partially written package behind.
+          if os.path.exists(package_path):
+            os.remove(package_path)
+          raise
+        counts['templates'] = len(sorted_entries)
@@ -14,13 +14,24 @@
 
 
 import argparse
+import concurrent.futures
+import contextlib
+import glob
+import importlib.util
+import json
 import kfp.dsl as dsl
 import kfp.compiler
 import os
 import shutil
 import subprocess
 import sys
+import tarfile
 import tempfile
+import time
+import traceback
+import yaml
+import zipfile
+from collections import namedtuple
 from deprecated.sphinx import deprecated
 
 
@@ -40,19 +51,71 @@ def parse_arguments():
   parser.add_argument('--namespace',
                       type=str,
                       help='The namespace for the pipeline function')
+  parser.add_argument('--profile',
+                      type=str,
+                      nargs='?',
+                      const='-',
+                      metavar='FILE',
+                      help='write the per-phase compilation time, memory and counts as JSON '
+                           'to the file, or to stdout if the file is not specified.')
+  parser.add_argument('--analyze',
+                      type=str,
+                      nargs='?',
+                      const='-',
+                      metavar='FILE',
+                      help='write the critical path, the per-level widths and the peak '
+                           'concurrent pods and resource requests of the compiled workflow as '
+                           'JSON to the file, or to stdout if the file is not specified.')
+  parser.add_argument('--batch',
+                      type=str,
+                      nargs='+',
+                      help='py files to compile in parallel. Each value is a path or glob '
+                           'pattern optionally followed by ":<function name>". All pipelines '
+                           'in the matched files are compiled if the function is not specified.')
+  parser.add_argument('--workers',
+                      type=int,
+                      help='The number of worker processes for --batch. '
+                           'Defaults to the number of CPUs.')
+  parser.add_argument('--output-suffix',
+                      type=str,
+                      default='.yaml',
+                      help='The package file extension for --batch, default is .yaml.')
   parser.add_argument('--output',
                       type=str,
                       required=True,
-                      help='local path to the output workflow yaml file.')
+                      help='local path to the output workflow yaml file. '
+                           'The output directory when using --batch.')
   parser.add_argument('--disable-type-check',
                       action='store_true',
                       help='disable the type check, default is enabled.')
+  parser.add_argument('--no-cache',
+                      action='store_true',
+                      help='disable the compile cache. The cache is only used when the '
+                           'KFP_COMPILE_CACHE_DIR environment variable is set.')
+  parser.add_argument('--streaming',
+                      action='store_true',
+                      help='stream the templates into the package one at a time instead of '
+                           'building the whole workflow in memory. Reduces the peak memory '
+                           'when compiling very big pipelines.')
+  parser.add_argument('--workflow-templates-dir',
+                      type=str,
+                      help='write the container templates as Argo WorkflowTemplates to this '
+                           'directory and reference them from the compiled workflow. Pipelines '
+                           'compiled to the same directory share the WorkflowTemplates of their '
+                           'common components.')
 
   args = parser.parse_args()
   return args
 
 
-def _compile_pipeline_function(pipeline_funcs, function_name, output_path, type_check):
+def _get_compile_cache(use_cache):
+  if use_cache and os.environ.get(kfp.compiler._compile_cache.CACHE_DIR_ENV_VAR):
+    return kfp.compiler.CompileCache()
+  return None
+
+
+def _compile_pipeline_function(pipeline_funcs, function_name, output_path, type_check, use_cache=True, profiler=None, streaming=False,
+                               workflow_templates_dir=None):
   if len(pipeline_funcs) == 0:
     raise ValueError('A function with @dsl.pipeline decorator is required in the py file.')
 
@@ -68,7 +131,9 @@ def _compile_pipeline_function(pipeline_funcs, function_name, output_path, type_
   else:
     pipeline_func = pipeline_funcs[0]
 
-  kfp.compiler.Compiler().compile(pipeline_func, output_path, type_check)
+  compiler = kfp.compiler.Compiler(cache=_get_compile_cache(use_cache), profiler=profiler, streaming=streaming,
+                                   workflow_templates_dir=workflow_templates_dir)
+  compiler.compile(pipeline_func, output_path, type_check)
 
 
 class PipelineCollectorContext():
@@ -90,39 +155,284 @@ class PipelineCollectorContext():
     Please switch to compiling pipeline files or functions.
     If you use this feature please create an issue in https://github.com/kubeflow/pipelines/issues .'''
 )
-def compile_package(package_path, namespace, function_name, output_path, type_check):
+def compile_package(package_path, namespace, function_name, output_path, type_check, use_cache=True, profiler=None, streaming=False,
+                    workflow_templates_dir=None):
   tmpdir = tempfile.mkdtemp()
   sys.path.insert(0, tmpdir)
   try:
     subprocess.check_call(['python3', '-m', 'pip', 'install', package_path, '-t', tmpdir])
     with PipelineCollectorContext() as pipeline_funcs:
       __import__(namespace)
-    _compile_pipeline_function(pipeline_funcs, function_name, output_path, type_check)
+    _compile_pipeline_function(pipeline_funcs, function_name, output_path, type_check, use_cache, profiler, streaming,
+                               workflow_templates_dir)
   finally:
     del sys.path[0]
     shutil.rmtree(tmpdir)
 
 
-def compile_pyfile(pyfile, function_name, output_path, type_check):
+def compile_pyfile(pyfile, function_name, output_path, type_check, use_cache=True, profiler=None, streaming=False,
+                   workflow_templates_dir=None):
   sys.path.insert(0, os.path.dirname(pyfile))
   try:
     filename = os.path.basename(pyfile)
     with PipelineCollectorContext() as pipeline_funcs:
       __import__(os.path.splitext(filename)[0])
-    _compile_pipeline_function(pipeline_funcs, function_name, output_path, type_check)
+    _compile_pipeline_function(pipeline_funcs, function_name, output_path, type_check, use_cache, profiler, streaming,
+                               workflow_templates_dir)
   finally:
     del sys.path[0]
 
 
+BatchResult = namedtuple('BatchResult', ['pyfile', 'function_name', 'output_path', 'seconds', 'error'])
+
+# The pipeline functions of the py files imported by the current (worker) process.
+_imported_pipeline_funcs = {}
+
+
+def _import_pipeline_funcs(pyfile):
+  """Imports the py file once per process and returns its pipeline functions."""
+  pyfile = os.path.abspath(pyfile)
+  if pyfile in _imported_pipeline_funcs:
+    return _imported_pipeline_funcs[pyfile]
+
+  module_name = os.path.splitext(os.path.basename(pyfile))[0]
+  if module_name in sys.modules:
+    # Different files with the same name must not shadow each other.
+    module_name = '_kfp_batch_{}_{}'.format(module_name, len(_imported_pipeline_funcs))
+  spec = importlib.util.spec_from_file_location(module_name, pyfile)
+  module = importlib.util.module_from_spec(spec)
+  sys.modules[module_name] = module
+  sys.path.insert(0, os.path.dirname(pyfile))
+  try:
+    with PipelineCollectorContext() as pipeline_funcs:
+      spec.loader.exec_module(module)
+  except BaseException:
+    del sys.modules[module_name]
+    raise
+  finally:
+    del sys.path[0]
+  _imported_pipeline_funcs[pyfile] = pipeline_funcs
+  return pipeline_funcs
+
+
+def _get_batch_output_names(pyfiles):
+  """Returns the package name prefixes of the py files, the module names.
+
+  The files with the same name in different directories are prefixed with their
+  directories relative to the common directory of these files, so that their
+  packages do not overwrite each other.
+  """
+  pyfiles_by_module_name = {}
+  for pyfile in pyfiles:
+    module_name = os.path.splitext(os.path.basename(pyfile))[0]
+    module_pyfiles = pyfiles_by_module_name.setdefault(module_name, [])
+    if pyfile not in module_pyfiles:
+      module_pyfiles.append(pyfile)
+  output_names = {}
+  for module_name, module_pyfiles in pyfiles_by_module_name.items():
+    if len(module_pyfiles) == 1:
+      output_names[module_pyfiles[0]] = module_name
+      continue
+    common_dir = os.path.commonpath([os.path.dirname(pyfile) for pyfile in module_pyfiles])
+    for pyfile in module_pyfiles:
+      relative_dir = os.path.relpath(os.path.dirname(pyfile), common_dir)
+      output_names[pyfile] = module_name if relative_dir == os.curdir else relative_dir.replace(os.sep, '_') + '_' + module_name
+  return output_names
+
+
+def _get_batch_output_path(output_dir, output_name, function_name, output_suffix):
+  return os.path.join(output_dir, output_name + '_' + function_name + output_suffix)
+
+
+def _compile_batch_item(pyfile, function_name, output_dir, output_name, output_suffix, type_check, use_cache, streaming=False,
+                        workflow_templates_dir=None):
+  """Compiles one pipeline function or, if function_name is None, all pipelines in the py file.
+
+  Runs in a worker process. The errors are returned instead of raised so that
+  one broken pipeline does not stop the batch.
+  """
+  start_time = time.time()
+  try:
+    pipeline_funcs = _import_pipeline_funcs(pyfile)
+    if function_name is None:
+      function_names = [func.__name__ for func in pipeline_funcs]
+      if not function_names:
+        raise ValueError('A function with @dsl.pipeline decorator is required in the py file.')
+    else:
+      function_names = [function_name]
+  except Exception:
+    return [BatchResult(pyfile, function_name, None, time.time() - start_time, traceback.format_exc())]
+
+  results = []
+  for name in function_names:
+    start_time = time.time()
+    output_path = _get_batch_output_path(output_dir, output_name, name, output_suffix)
+    error = None
+    try:
+      _compile_pipeline_function(pipeline_funcs, name, output_path, type_check, use_cache, streaming=streaming,
+                                 workflow_templates_dir=workflow_templates_dir)
+    except Exception:
+      error = traceback.format_exc()
+    results.append(BatchResult(pyfile, name, output_path, time.time() - start_time, error))
+  return results
+
+
+def _expand_batch_specs(batch_specs):
+  """Expands "<path or glob>[:<function name>]" values into (pyfile, function_name) pairs."""
+  items = []
+  for batch_spec in batch_specs:
+    pattern, _, function_name = batch_spec.partition(':')
+    pyfiles = sorted(glob.glob(pattern, recursive=True))
+    if not pyfiles:
+      raise ValueError('No py files match "{}".'.format(pattern))
+    for pyfile in pyfiles:
+      item = (os.path.abspath(pyfile), function_name or None)
+      if item not in items:
+        items.append(item)
+  return items
+
+
+def compile_batch(batch_specs, output_dir, type_check, use_cache=True, workers=None, output_suffix='.yaml', streaming=False,
+                  workflow_templates_dir=None):
+  """Compiles many pipelines in a process pool.
+
+  Threads cannot be used since the DSL keeps the pipeline being built in global
+  state (e.g. Pipeline._default_pipeline). The py files are imported once per
+  worker process and reused for all of their pipelines.
+
+  Args:
+    batch_specs: List of "<path or glob>[:<function name>]" strings.
+    output_dir: The directory for the packages. The packages are named
+      <module name>_<function name><output_suffix>. The module names of the
+      files with the same name in different directories are prefixed with
+      their relative directories, e.g. team_a_pipeline_main.yaml.
+    type_check: Whether to enable the type check.
+    use_cache: Whether to use the compile cache if it's configured.
+    workers: The number of worker processes. Defaults to the number of CPUs.
+    output_suffix: The package file extension, e.g. .yaml, .zip or .tar.gz.
+    streaming: Whether to stream the templates into the packages. See kfp.compiler.Compiler.
+    workflow_templates_dir: Optional directory for the WorkflowTemplates shared by all
+      packages. See kfp.compiler.Compiler.
+
+  Returns:
+    List of BatchResult in the order of batch_specs.
+  """
+  items = _expand_batch_specs(batch_specs)
+  output_names = _get_batch_output_names([pyfile for pyfile, _ in items])
+  os.makedirs(output_dir, exist_ok=True)
+  with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+    futures = [
+        executor.submit(_compile_batch_item, pyfile, function_name, output_dir, output_names[pyfile], output_suffix, type_check,
+                        use_cache, streaming, workflow_templates_dir)
+        for pyfile, function_name in items
+    ]
+    results = [result for future in futures for result in future.result()]
+
+  # The package names can still clash when the module and function names contain underscores, e.g. a_b.py:c and a.py:b_c.
+  pyfiles_by_output_path = {}
+  for result in results:
+    pyfiles_by_output_path.setdefault(result.output_path, set()).add(result.pyfile)
+  return [
+      result._replace(error='The package {} is produced by several files: {}'.format(
+          result.output_path, sorted(pyfiles_by_output_path[result.output_path])))
+      if result.output_path and len(pyfiles_by_output_path[result.output_path]) > 1 else result
+      for result in results
+  ]
+
+
+def _print_batch_summary(results, total_seconds):
+  for result in results:
+    if result.error:
+      print('Failed to compile {}:{}\n{}'.format(result.pyfile, result.function_name or '', result.error), file=sys.stderr)
+  print('{:>10}  {:<6}  {}'.format('seconds', 'status', 'pipeline'))
+  for result in sorted(results, key=lambda result: result.seconds, reverse=True):
+    print('{:>10.3f}  {:<6}  {}:{}'.format(
+        result.seconds, 'FAILED' if result.error else 'OK', result.pyfile, result.function_name or ''))
+  failed_count = sum(1 for result in results if result.error)
+  print('Compiled {} of {} pipelines in {:.3f} seconds.'.format(len(results) - failed_count, len(results), total_seconds))
+
+
 def main():
   args = parse_arguments()
+  if args.batch:
+    if args.py is not None or args.package is not None:
+      raise ValueError('--batch cannot be used with --py or --package.')
+    if args.profile:
+      raise ValueError('--profile cannot be used with --batch.')
+    if args.analyze:
+      raise ValueError('--analyze cannot be used with --batch.')
+    start_time = time.time()
+    results = compile_batch(args.batch, args.output, not args.disable_type_check, not args.no_cache,
+                            args.workers, args.output_suffix, args.streaming, args.workflow_templates_dir)
+    _print_batch_summary(results, time.time() - start_time)
+    if any(result.error for result in results):
+      sys.exit(1)
+    return
   if ((args.py is None and args.package is None) or
       (args.py is not None and args.package is not None)):
     raise ValueError('Either --py or --package is needed but not both.')
-  if args.py:
-    compile_pyfile(args.py, args.function, args.output, not args.disable_type_check)
+  if args.package is not None and args.namespace is None:
+    raise ValueError('--namespace is required for compiling packages.')
+
+  profiler = kfp.compiler.CompileProfiler() if args.profile else None
+  with profiler or contextlib.suppress():
+    if args.py:
+      compile_pyfile(args.py, args.function, args.output, not args.disable_type_check, not args.no_cache, profiler,
+                     args.streaming, args.workflow_templates_dir)
+    else:
+      compile_package(args.package, args.namespace, args.function, args.output, not args.disable_type_check, not args.no_cache, profiler,
+                      args.streaming, args.workflow_templates_dir)
+  if profiler:
+    _write_profile(profiler, args.profile)
+  if args.analyze:
+    _write_analysis(args.output, args.workflow_templates_dir, args.analyze)
+
+
+# The libyaml based loader is much faster than the pure python one.
+_YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+def _read_package_workflow(package_path):
+  """Reads the workflow from the compiled package."""
+  if package_path.endswith('.json'):
+    with open(package_path) as f:
+      return json.load(f)
+  if package_path.endswith('.tar.gz') or package_path.endswith('.tgz'):
+    with tarfile.open(package_path, 'r:gz') as tar:
+      with tar.extractfile('pipeline.yaml') as f:
+        return yaml.load(f, Loader=_YamlLoader)
+  if package_path.endswith('.zip'):
+    with zipfile.ZipFile(package_path, 'r') as zip:
+      with zip.open('pipeline.yaml') as f:
+        return yaml.load(f, Loader=_YamlLoader)
+  with open(package_path) as f:
+    return yaml.load(f, Loader=_YamlLoader)
+
+
+def _write_analysis(package_path, workflow_templates_dir, analysis_path):
+  workflow = _read_package_workflow(package_path)
+  workflow_templates = []
+  if workflow_templates_dir:
+    workflow_template_names = set(
+        task['templateRef']['name']
+        for template in workflow['spec']['templates']
+        for task in template.get('dag', {}).get('tasks', [])
+        if 'templateRef' in task)
+    for name in sorted(workflow_template_names):
+      with open(os.path.join(workflow_templates_dir, name + '.yaml')) as f:
+        workflow_templates.append(yaml.load(f, Loader=_YamlLoader))
+  analysis = kfp.compiler.analyze_workflow(workflow, workflow_templates)
+  if analysis_path == '-':
+    print(analysis.to_json())
+  else:
+    with open(analysis_path, 'w') as f:
+      f.write(analysis.to_json())
+
+
+def _write_profile(profiler, profile_path):
+  if profile_path == '-':
+    print(profiler.to_json())
   else:
-    if args.namespace is None:
-      raise ValueError('--namespace is required for compiling packages.')
-    compile_package(args.package, args.namespace, args.function, args.output, not args.disable_type_check)
+    with open(profile_path, 'w') as f:
+      f.write(profiler.to_json())
   
@@ -0,0 +1,103 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+__all__ = [
+    'ComponentCache',
+]
+
+import hashlib
+import os
+import threading
+import time
+import warnings
+from pathlib import Path
+from typing import List, Optional, Text
+
+
+CACHE_DIR_ENV_VAR = 'KFP_COMPONENT_CACHE_DIR'
+
+_ENTRY_FILE_SUFFIX = '.component'
+
+
+class ComponentCache:
+    '''On-disk cache of the component files downloaded by the ComponentStore.
+
+    The entries are keyed by the component URL. The components loaded by digest never change, so
+    their entries never expire. The entries of the components loaded by tag or by name expire after
+    the ComponentStore mutable_ttl_seconds.
+
+    The least recently used entries are evicted when the total cache size exceeds max_size_bytes.
+    '''
+    def __init__(self, cache_dir: Text = None, max_size_bytes: int = 64 * 1024 * 1024):
+        '''Creates a component cache.
+
+        Args:
+            cache_dir: Directory where the cache entries are stored. Defaults to the value of the KFP_COMPONENT_CACHE_DIR environment variable or ~/.cache/kfp/components.
+            max_size_bytes: Maximum total size of the cache entries.
+        '''
+        cache_dir = cache_dir or os.environ.get(CACHE_DIR_ENV_VAR) or os.path.join('~', '.cache', 'kfp', 'components')
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.max_size_bytes = max_size_bytes
+
+    def get(self, url: Text, max_age_seconds: float = None) -> Optional[bytes]:
+        '''Returns the cached component file data or None if it's not in the cache or older than max_age_seconds.'''
+        path = self._get_entry_path(url)
+        try:
+            stat = path.stat()
+            if max_age_seconds is not None and time.time() - stat.st_mtime > max_age_seconds:
+                return None
+            data = path.read_bytes()
+            # The modification time is the download time. The access time is used for eviction.
+            os.utime(str(path), (time.time(), stat.st_mtime))
+        except OSError:
+            return None
+        return data
+
+    def put(self, url: Text, data: bytes):
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # Writing to a temporary file first so that concurrent loads never read partial entries.
+            path = self._get_entry_path(url)
+            # The process and thread ids make the temporary file unique when the same URL is loaded concurrently.
+            tmp_path = path.with_name('{}.{}.{}.tmp'.format(path.name, os.getpid(), threading.get_ident()))
+            tmp_path.write_bytes(data)
+            os.replace(str(tmp_path), str(path))
+            self.evict()
+        except OSError as e:
+            warnings.warn('Failed to write the component cache entry for "{}": {}'.format(url, e))
+
+    def clear(self):
+        for path in self._entry_paths():
+            path.unlink()
+
+    def evict(self):
+        '''Removes the least recently used entries until the cache fits in max_size_bytes.'''
+        entries = []
+        for path in self._entry_paths():
+            stat = path.stat()
+            entries.append((max(stat.st_atime, stat.st_mtime), stat.st_size, path))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total_size <= self.max_size_bytes:
+                break
+            path.unlink()
+            total_size -= size
+
+    def _get_entry_path(self, url: Text) -> Path:
+        return self.cache_dir / (hashlib.sha256(url.encode('utf-8')).hexdigest() + _ENTRY_FILE_SUFFIX)
+
+    def _entry_paths(self) -> List[Path]:
+        if not self.cache_dir.is_dir():
+            return []
+        return [path for path in self.cache_dir.iterdir() if path.name.endswith(_ENTRY_FILE_SUFFIX)]
@@ -2,26 +2,59 @@ __all__ = [
     'ComponentStore',
 ]
 
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import requests
-from typing import Callable
+from typing import Callable, List, Sequence, Union
 from . import _components as comp
-from ._structures import ComponentReference
+from ._component_cache import ComponentCache, CACHE_DIR_ENV_VAR
+from ._structures import ComponentReference, ComponentSpec
 
 class ComponentStore:
-    def __init__(self, local_search_paths=None, url_search_prefixes=None):
+    def __init__(self, local_search_paths=None, url_search_prefixes=None, cache: ComponentCache = None, mutable_ttl_seconds: float = 10 * 60):
+        '''Creates a component store.
+
+        The loaded component specs are kept in memory, so loading the same component again costs no network and no parsing.
+
+        Args:
+            local_search_paths: Local directories where the components are searched for.
+            url_search_prefixes: URL prefixes where the components are searched for.
+            cache: Optional on-disk cache of the downloaded component files which is shared between the processes.
+            mutable_ttl_seconds: How long the components loaded by tag, by name or by URL are reused before they are downloaded again.
+                The components loaded by digest never change, so they are reused forever.
+        '''
         self.local_search_paths = local_search_paths or ['.']
         self.url_search_prefixes = url_search_prefixes or []
+        self.cache = cache
+        self.mutable_ttl_seconds = mutable_ttl_seconds
 
         self._component_file_name = 'component.yaml'
         self._digests_subpath = 'versions/sha256'
         self._tags_subpath = 'versions/tags'
 
+        # url or file path -> (component spec, load time or file stat)
+        self._loaded_specs = {}
+        # The sessions keep the connections alive between the downloads. Sessions are not thread-safe, so every loading thread gets its own session.
+        self._thread_local = threading.local()
+
     def load_component_from_url(self, url):
-        return comp.load_component_from_url(url)
+        if url is None:
+            raise TypeError
+        #Handling Google Cloud Storage URIs
+        if url.startswith('gs://'):
+            #Replacing the gs:// URI with https:// URI (works for public objects)
+            url = 'https://storage.googleapis.com/' + url[len('gs://'):]
+        component_spec = self._load_component_spec_from_url(url, raise_errors=True)
+        return comp._create_task_factory_from_component_spec(component_spec, url, ComponentReference(url=url))
 
     def load_component_from_file(self, path):
-        return comp.load_component_from_file(path)
+        if path is None:
+            raise TypeError
+        component_spec = self._load_component_spec_from_file(path)
+        return comp._create_task_factory_from_component_spec(component_spec, path)
 
     def load_component(self, name, digest=None, tag=None):
         '''
@@ -76,22 +109,119 @@ class ComponentStore:
             tried_locations.append(str(component_path))
             if component_path.is_file():
                 component_ref = ComponentReference(name=name, digest=digest, tag=tag)
-                return comp.load_component_from_file(str(component_path))
+                return self.load_component_from_file(str(component_path))
 
         #Trying URL prefixes
         for url_search_prefix in self.url_search_prefixes:
             url = url_search_prefix + path_suffix
             tried_locations.append(url)
+            component_spec = self._load_component_spec_from_url(url, raise_errors=False)
+            if component_spec is not None:
+                component_ref = ComponentReference(name=name, digest=digest, tag=tag, url=url)
+                return comp._create_task_factory_from_component_spec(component_spec, url, component_ref)
+
+        raise RuntimeError('Component {} was not found. Tried the following locations:\n{}'.format(name, '\n'.join(tried_locations)))
+
+    def load_components(self, components: Sequence[Union[str, ComponentReference]], max_workers: int = 8) -> List[Callable]:
+        '''
+        Loads multiple components concurrently and creates their task factory functions
+
+        Args:
+            components: The component names or the ComponentReference objects which specify the component name and the optional digest or tag, the URL or the spec.
+            max_workers: Maximum number of the components that are loaded at the same time.
+
+        Returns:
+            The list of the task factory functions in the same order as the components.
+
+        Raises:
+            RuntimeError: Some components could not be loaded. The error lists all the failed components.
+        '''
+        component_refs = [ComponentReference(name=component) if isinstance(component, str) else component for component in components]
+        return self._load_concurrently(self._load_component_from_ref, component_refs, max_workers)
+
+    def load_components_from_urls(self, urls: Sequence[str], max_workers: int = 8) -> List[Callable]:
+        '''
+        Loads multiple components from URLs concurrently and creates their task factory functions
+
+        Args:
+            urls: The URLs of the component files.
+            max_workers: Maximum number of the components that are loaded at the same time.
+
+        Returns:
+            The list of the task factory functions in the same order as the URLs.
+
+        Raises:
+            RuntimeError: Some components could not be loaded. The error lists all the failed components.
+        '''
+        return self._load_concurrently(self.load_component_from_url, list(urls), max_workers)
+
+    def _load_concurrently(self, load, components, max_workers):
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(load, component) for component in components]
+        errors = []
+        task_factories = []
+        for component, future in zip(components, futures):
+            error = future.exception()
+            if error is not None:
+                errors.append('{}: {}: {}'.format(_describe_component(component), type(error).__name__, error))
+            else:
+                task_factories.append(future.result())
+        if errors:
+            raise RuntimeError('Failed to load {} of {} components:\n{}'.format(len(errors), len(components), '\n'.join(errors)))
+        return task_factories
+
+    def _get_session(self) -> requests.Session:
+        session = getattr(self._thread_local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            self._thread_local.session = session
+        return session
+
+    def _load_component_spec_from_url(self, url, raise_errors):
+        '''Loads the component spec from the memory, the cache or the network.
+        Returns None when the component cannot be downloaded and raise_errors is False.
+        '''
+        max_age_seconds = None if '/' + self._digests_subpath + '/' in url else self.mutable_ttl_seconds
+        loaded = self._loaded_specs.get(url)
+        if loaded is not None and (max_age_seconds is None or time.time() - loaded[1] <= max_age_seconds):
+            return loaded[0]
+
+        data = self.cache.get(url, max_age_seconds) if self.cache else None
+        if data is None:
             try:
-                response = requests.get(url) #Does not throw exceptions on bad status, but throws on dead domains and malformed URLs. Should we log those cases?
+                response = self._get_session().get(url) #Does not throw exceptions on bad status, but throws on dead domains and malformed URLs. Should we log those cases?
                 response.raise_for_status()
             except:
-                continue
-            if response.content:
-                component_ref = ComponentReference(name=name, digest=digest, tag=tag, url=url)
-                return comp._load_component_from_yaml_or_zip_bytes(response.content, url, component_ref)
+                if raise_errors:
+                    raise
+                return None
+            data = response.content
+            if not data and not raise_errors:
+                return None
+            if self.cache:
+                self.cache.put(url, data)
+        component_spec = comp._load_component_spec_from_yaml_or_zip_bytes(data)
+        self._loaded_specs[url] = (component_spec, time.time())
+        return component_spec
 
-        raise RuntimeError('Component {} was not found. Tried the following locations:\n{}'.format(name, '\n'.join(tried_locations)))
+    def _load_component_spec_from_file(self, path) -> ComponentSpec:
+        # The file is parsed again only when it changes
+        stat = os.stat(path)
+        file_version = (stat.st_mtime_ns, stat.st_size)
+        key = os.path.abspath(path)
+        loaded = self._loaded_specs.get(key)
+        if loaded is not None and loaded[1] == file_version:
+            return loaded[0]
+        with open(path, 'rb') as component_stream:
+            component_spec = comp._load_component_spec_from_yaml_or_zip_stream(component_stream)
+        self._loaded_specs[key] = (component_spec, file_version)
+        return component_spec
+
+    def _is_immutable_component_ref(self, component_ref: ComponentReference) -> bool:
+        '''Returns whether the referenced component can never change: it's inline or referenced by digest.'''
+        if component_ref.spec or component_ref.digest:
+            return True
+        return bool(component_ref.url) and '/' + self._digests_subpath + '/' in component_ref.url
 
     def _load_component_from_ref(self, component_ref: ComponentReference) -> Callable:
         if component_ref.spec:
@@ -105,6 +235,20 @@ class ComponentStore:
         )
 
 
+def _describe_component(component: Union[str, ComponentReference]) -> str:
+    if not isinstance(component, ComponentReference):
+        return str(component)
+    if component.url:
+        return component.url
+    if component.spec:
+        return component.spec.name or 'Component'
+    if component.digest:
+        return component.name + '@sha256=' + component.digest
+    if component.tag:
+        return component.name + ':' + component.tag
+    return component.name
+
+
 ComponentStore.default_store = ComponentStore(
     local_search_paths=[
         '.',
@@ -112,4 +256,6 @@ ComponentStore.default_store = ComponentStore(
     url_search_prefixes=[
         'https://raw.githubusercontent.com/kubeflow/pipelines/master/components/'
     ],
+    # The on-disk cache is enabled by setting the cache directory
+    cache=ComponentCache() if os.environ.get(CACHE_DIR_ENV_VAR) else None,
 )
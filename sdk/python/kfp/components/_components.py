@@ -16,18 +16,21 @@ __all__ = [
     'load_component',
     'load_component_from_text',
     'load_component_from_url',
+    'load_components_from_urls',
     'load_component_from_file',
 ]
 
 import sys
+import time
 from collections import OrderedDict
 from ._naming import _sanitize_file_name, _sanitize_python_function_name, generate_unique_name_conversion_table
 from ._yaml_utils import load_yaml
 from ._structures import ComponentSpec
 from ._structures import *
 from ._data_passing import serialize_value, type_name_to_type
+from .modelbase import _skip_type_verification
 from kfp.dsl import PipelineParam
-from kfp.dsl.types import verify_type_compatibility
+from kfp.dsl.types import verify_type_compatibility, InconsistentTypeException
 
 _default_component_name = 'Component'
 
@@ -89,6 +92,25 @@ def load_component_from_url(url):
     return _load_component_from_yaml_or_zip_bytes(resp.content, url, component_ref)
 
 
+def load_components_from_urls(urls, max_workers=8):
+    '''
+    Loads multiple components from URLs concurrently and creates their task factory functions
+
+    Args:
+        urls: The URLs of the component files.
+        max_workers: Maximum number of the components that are loaded at the same time.
+
+    Returns:
+        The list of the task factory functions in the same order as the URLs.
+        Once called with the required arguments, each factory constructs a pipeline task instance (ContainerOp).
+
+    Raises:
+        RuntimeError: Some components could not be loaded. The error lists all the failed components.
+    '''
+    from ..components import ComponentStore
+    return ComponentStore.default_store.load_components_from_urls(urls, max_workers)
+
+
 def load_component_from_file(filename):
     '''
     Loads component from file and creates a task factory function
@@ -135,16 +157,29 @@ def _load_component_from_yaml_or_zip_stream(stream, component_filename=None, com
     '''Loads component from a stream and creates a task factory function.
     The stream can be YAML or a zip file with a component.yaml file inside.
     '''
+    component_spec = _load_component_spec_from_yaml_or_zip_stream(stream)
+    return _create_task_factory_from_component_spec(component_spec, component_filename, component_ref)
+
+
+def _load_component_spec_from_yaml_or_zip_bytes(bytes) -> ComponentSpec:
+    import io
+    return _load_component_spec_from_yaml_or_zip_stream(io.BytesIO(bytes))
+
+
+def _load_component_spec_from_yaml_or_zip_stream(stream) -> ComponentSpec:
+    '''Loads component spec from a stream.
+    The stream can be YAML or a zip file with a component.yaml file inside.
+    '''
     import zipfile
     stream.seek(0)
     if zipfile.is_zipfile(stream):
         stream.seek(0)
         with zipfile.ZipFile(stream) as zip_obj:
             with zip_obj.open(_COMPONENT_FILE_NAME_IN_ARCHIVE) as component_stream:
-                return _create_task_factory_from_component_text(component_stream, component_filename, component_ref)
+                return ComponentSpec.from_dict(load_yaml(component_stream))
     else:
         stream.seek(0)
-        return _create_task_factory_from_component_text(stream, component_filename, component_ref)
+        return ComponentSpec.from_dict(load_yaml(stream))
 
 
 def _create_task_factory_from_component_text(text_or_file, component_filename=None, component_ref: ComponentReference = None):
@@ -222,6 +257,11 @@ def _create_task_factory_from_component_spec(component_spec:ComponentSpec, compo
                 # argument_value is a reference 
 
                 if isinstance(argument_value, PipelineParam):
+                    if getattr(argument_value, 'batch_size', None) is not None and not _is_list_type(input_type):
+                        raise InconsistentTypeException(
+                            'Incompatible argument passed to the input "{}" of component "{}": The items of a batched ParallelFor loop are JSON lists, but the input type is "{}". '
+                            'Batched loop items can only be passed to the list inputs.'.format(input_name, component_spec.name, input_type)
+                        )
                     reference_type = argument_value.param_type
                     argument_value = str(argument_value)
                 elif isinstance(argument_value, TaskOutputArgument):
@@ -237,11 +277,13 @@ def _create_task_factory_from_component_spec(component_spec:ComponentSpec, compo
                 serialized_argument_value = serialize_value(argument_value, input_type)
                 arguments[input_name] = serialized_argument_value
 
-        task = TaskSpec(
-            component_ref=component_ref,
-            arguments=arguments,
-        )
-        task._init_outputs()
+        # The arguments are either serialized or verified references, so the task and its outputs are not verified again.
+        with _skip_type_verification():
+            task = TaskSpec(
+                component_ref=component_ref,
+                arguments=arguments,
+            )
+            task._init_outputs()
         
         if isinstance(component_spec.implementation, GraphImplementation):
             return _resolve_graph_task(task, component_spec)
@@ -284,10 +326,18 @@ def _create_task_factory_from_component_spec(component_spec:ComponentSpec, compo
     return task_factory
 
 
-def _resolve_graph_task(graph_task: TaskSpec, graph_component_spec: ComponentSpec) -> TaskSpec:
-    from ..components import ComponentStore
-    component_store = ComponentStore.default_store
+_LIST_TYPE_NAMES = ('JsonArray', 'List', 'list')
+
+
+def _is_list_type(type_spec) -> bool:
+    '''Returns whether the inputs of the type accept JSON lists. The inputs without types accept any values.'''
+    if type_spec is None:
+        return True
+    type_name = next(iter(type_spec)) if isinstance(type_spec, dict) and len(type_spec) == 1 else type_spec
+    return type_name in _LIST_TYPE_NAMES
 
+
+def _resolve_graph_task(graph_task: TaskSpec, graph_component_spec: ComponentSpec) -> TaskSpec:
     graph = graph_component_spec.implementation.graph
 
     graph_input_arguments = {input.name: input.default for input in graph_component_spec.inputs if input.default is not None}
@@ -308,14 +358,9 @@ def _resolve_graph_task(graph_task: TaskSpec, graph_component_spec: ComponentSpe
             raise TypeError('Argument for input has unexpected type "{}".'.format(type(argument)))
 
     for task_id, task_spec in graph._toposorted_tasks.items(): # Cannot use graph.tasks here since they might be listed not in dependency order. Especially on python <3.6 where the dicts do not preserve ordering
-        task_factory = component_store._load_component_from_ref(task_spec.component_ref)
+        task_factory, input_name_to_pythonic, pythonic_output_name_to_original = _get_graph_task_factory(graph, task_id)
         # TODO: Handle the case when optional graph component input is passed to optional task component input
         task_arguments = {input_name: resolve_argument(argument) for input_name, argument in task_spec.arguments.items()}
-        task_component_spec = task_factory.component_spec
-
-        input_name_to_pythonic = generate_unique_name_conversion_table([input.name for input in task_component_spec.inputs or []], _sanitize_python_function_name)
-        output_name_to_pythonic = generate_unique_name_conversion_table([output.name for output in task_component_spec.outputs or []], _sanitize_python_function_name)
-        pythonic_output_name_to_original = {pythonic_name: original_name for original_name, pythonic_name in output_name_to_pythonic.items()}
         pythonic_task_arguments = {input_name_to_pythonic[input_name]: argument for input_name, argument in task_arguments.items()}
 
         task_obj = task_factory(**pythonic_task_arguments)
@@ -330,3 +375,29 @@ def _resolve_graph_task(graph_task: TaskSpec, graph_component_spec: ComponentSpe
     graph_task.outputs = resolved_graph_outputs
     
     return graph_task
+
+
+def _get_graph_task_factory(graph: GraphSpec, task_id: str):
+    '''Returns the task factory of the graph task and its input and output name conversion tables.
+    They are loaded once per graph, so instantiating the graph component again only constructs the tasks.
+    The components referenced by name, tag or mutable URL are loaded again after the store mutable_ttl_seconds, the same way as the directly loaded components.
+    '''
+    from ..components import ComponentStore
+    component_store = ComponentStore.default_store
+    component_ref = graph.tasks[task_id].component_ref
+    cached = graph._task_factories.get(task_id)
+    if cached is not None:
+        cached_component_ref, load_time, task_factory_and_tables = cached
+        if cached_component_ref is component_ref and (load_time is None or time.time() - load_time <= component_store.mutable_ttl_seconds):
+            return task_factory_and_tables
+
+    task_factory = component_store._load_component_from_ref(component_ref)
+    task_component_spec = task_factory.component_spec
+
+    input_name_to_pythonic = generate_unique_name_conversion_table([input.name for input in task_component_spec.inputs or []], _sanitize_python_function_name)
+    output_name_to_pythonic = generate_unique_name_conversion_table([output.name for output in task_component_spec.outputs or []], _sanitize_python_function_name)
+    pythonic_output_name_to_original = {pythonic_name: original_name for original_name, pythonic_name in output_name_to_pythonic.items()}
+    task_factory_and_tables = (task_factory, input_name_to_pythonic, pythonic_output_name_to_original)
+    load_time = None if component_store._is_immutable_component_ref(component_ref) else time.time()
+    graph._task_factories[task_id] = (component_ref, load_time, task_factory_and_tables)
+    return task_factory_and_tables
@@ -20,6 +20,7 @@ __all__ = [
     '_convert_to_human_name',
     '_generate_unique_suffix',
     '_make_name_unique_by_adding_index',
+    '_UniqueNameRegistry',
     '_convert_name_and_make_it_unique_by_adding_number',
     'generate_unique_name_conversion_table',
 ]
@@ -77,6 +78,41 @@ def _make_name_unique_by_adding_index(name:str, collection, delimiter:str):
     return unique_name
 
 
+class _UniqueNameRegistry:
+    '''Registry of used names which makes the new names unique by adding indices.
+
+    Produces the same names as _make_name_unique_by_adding_index ("name", "name 2", "name 3", ...) as long as the names are never unregistered,
+    but keeps a set of the used names and the next index to try for each base name, so registering N names takes O(N) instead of O(N^2) time.
+    '''
+    def __init__(self, delimiter: str, used_names=()):
+        self.delimiter = delimiter
+        self._used_names = set(used_names)
+        self._next_indices = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._used_names
+
+    def __len__(self) -> int:
+        return len(self._used_names)
+
+    def add(self, name: str):
+        '''Registers the name as used.'''
+        self._used_names.add(name)
+
+    def make_unique(self, name: str) -> str:
+        '''Returns a unique name based on the name and registers it as used.'''
+        unique_name = name
+        if unique_name in self._used_names:
+            index = self._next_indices.get(name, 2)
+            unique_name = name + self.delimiter + str(index)
+            while unique_name in self._used_names:
+                index += 1
+                unique_name = name + self.delimiter + str(index)
+            self._next_indices[name] = index + 1
+        self._used_names.add(unique_name)
+        return unique_name
+
+
 def _convert_name_and_make_it_unique_by_adding_number(name: str, used_converted_names, conversion_func: Callable[[str], str]):
     converted_name = conversion_func(name)
     if converted_name in used_converted_names:
@@ -31,6 +31,7 @@ from ._components import _create_task_factory_from_component_spec
 from ._data_passing import serialize_value, type_name_to_deserializer, type_name_to_serializer, type_to_type_name
 from ._naming import _make_name_unique_by_adding_index
 from ._structures import *
+from .modelbase import _skip_type_verification
 
 import inspect
 from pathlib import Path
@@ -216,6 +217,7 @@ def _capture_function_code_using_source_copy(func) -> str:
     return '\n'.join(func_code_lines)
 
 
+@_skip_type_verification() # The specs are built from the function signature, so their field types are always correct.
 def _extract_component_interface(func) -> ComponentSpec:
     single_output_name_const = 'Output'
 
@@ -23,7 +23,7 @@ from typing import Callable
 
 from . import _components
 from ._structures import TaskSpec, ComponentSpec, OutputSpec, GraphInputReference, TaskOutputArgument, GraphImplementation, GraphSpec
-from ._naming import _make_name_unique_by_adding_index
+from ._naming import _UniqueNameRegistry
 from ._python_op import _extract_component_interface
 
 
@@ -73,11 +73,12 @@ def create_graph_component_spec_from_pipeline_func(pipeline_func: Callable, embe
             raise TypeError('Graph component function parameter "{}" cannot have file-passing annotation "{}".'.format(input.name, input._passing_style))
 
     task_map = OrderedDict() #Preserving task order
+    task_ids = _UniqueNameRegistry(' ')
 
     def task_construction_handler(task: TaskSpec):
         #Rewriting task ids so that they're same every time
         task_id = task.component_ref.spec.name or "Task"
-        task_id = _make_name_unique_by_adding_index(task_id, task_map.keys(), ' ')
+        task_id = task_ids.make_unique(task_id)
         for output_ref in task.outputs.values():
             output_ref.task_output.task_id = task_id
             output_ref.task_output.task = None
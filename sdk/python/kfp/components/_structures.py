@@ -640,6 +640,8 @@ class GraphSpec(ModelBase):
             raise ValueError('Task "{}" has cyclical dependency.'.format(task_wth_minimal_number_of_unsatisfied_dependencies))
         
         self._toposorted_tasks = sorted_tasks
+        # task_id -> the task factory of the task component and its name conversion tables. Filled when the graph component is instantiated.
+        self._task_factories = {}
 
 
 class GraphImplementation(ModelBase):
@@ -17,12 +17,113 @@ __all__ = [
 ]
 
 import inspect
+import threading
 from collections import abc, OrderedDict
+from contextlib import contextmanager
 from typing import Any, Callable, Dict, List, Mapping, MutableMapping, MutableSequence, Optional, Sequence, Tuple, Type, TypeVar, Union, cast, get_type_hints
 
 
 T = TypeVar('T')
 
+_PRIMITIVE_TYPES = (str, int, float, bool, type(None))
+
+_type_verification_state = threading.local()
+
+
+@contextmanager
+def _skip_type_verification():
+    '''Skips the field type verification of the ModelBase objects constructed in the context.
+    Only use it for the objects that the SDK constructs from already verified data. The objects parsed from the user-supplied structures are always verified.
+    '''
+    previous_value = getattr(_type_verification_state, 'skip', False)
+    _type_verification_state.skip = True
+    try:
+        yield
+    finally:
+        _type_verification_state.skip = previous_value
+
+
+
+class _ClassSchema:
+    '''The constructor information of a class which is needed to convert its objects to and from structures.
+    It's calculated once per class since the type hints and signature inspection is slow.
+    '''
+    def __init__(self, cls: type):
+        signature = inspect.signature(cls.__init__)
+        self.parameter_types = get_type_hints(cls.__init__) #Properlty resolves forward references
+        self.field_names = [name for name in signature.parameters if name != 'self']
+        self.defaults = {
+            name: param.default
+            for name, param in signature.parameters.items()
+            if name != 'self' and param.default is not inspect.Parameter.empty
+        }
+        self.serialized_names = getattr(cls, '_serialized_names', {})
+        self.serialized_names_to_pythonic, self.forbidden_struct_keys = _make_serialized_name_maps(self.serialized_names)
+        #The structure keys which are required and allowed by the class. Used to choose the Union member type
+        self.allowed_struct_keys = frozenset(self.serialized_names.get(name, name) for name in self.field_names)
+        self.required_struct_keys = frozenset(self.serialized_names.get(name, name) for name in self.field_names if name not in self.defaults and not name.startswith('_'))
+
+
+_class_schemas = {}
+
+
+def _get_class_schema(cls: type) -> _ClassSchema:
+    schema = _class_schemas.get(cls)
+    if schema is None:
+        schema = _ClassSchema(cls)
+        _class_schemas[cls] = schema
+    return schema
+
+
+def _make_serialized_name_maps(serialized_names: Mapping[str, str]) -> Tuple[Dict[str, str], set]:
+    serialized_names_to_pythonic = {v: k for k, v in serialized_names.items()}
+    #If a pythonic name has a different original name, we forbid the pythonic name in the structure. Otherwise, this function would accept "python-styled" structures that should be invalid
+    forbidden_struct_keys = set(serialized_names_to_pythonic.values()).difference(serialized_names_to_pythonic.keys())
+    return serialized_names_to_pythonic, forbidden_struct_keys
+
+
+_union_model_types = {}
+
+
+def _get_union_model_types(typ) -> Optional[List[type]]:
+    '''Returns the ModelBase member types of the Union if the other members are primitive types, so that the member type can be chosen by the structure type and keys. Otherwise returns None.'''
+    if typ not in _union_model_types:
+        model_types = []
+        for possible_type in typ.__args__:
+            #The classes with custom from_dict can accept other structures
+            if isinstance(possible_type, type) and issubclass(possible_type, ModelBase) and getattr(possible_type.from_dict, '__func__', None) is ModelBase.from_dict.__func__:
+                model_types.append(possible_type)
+            elif possible_type not in _PRIMITIVE_TYPES:
+                model_types = None
+                break
+        _union_model_types[typ] = model_types
+    return _union_model_types[typ]
+
+
+def _choose_union_member_type(struct: Any, typ) -> Optional[type]:
+    '''Chooses the Union member type to parse the structure without trying all member types. Returns None when the type cannot be chosen this way.'''
+    model_types = _get_union_model_types(typ)
+    if model_types is None:
+        return None
+    struct_type = type(struct)
+    if struct_type in _PRIMITIVE_TYPES:
+        possible_types = typ.__args__
+        #Python <3.7 "simplifies" Union[bool, int, ...] to just Union[int, ...]
+        if struct_type in possible_types or (struct_type is bool and int in possible_types):
+            return struct_type
+        return None
+    if not isinstance(struct, dict):
+        return None
+    struct_keys = struct.keys()
+    matching_types = []
+    for model_type in model_types:
+        schema = _get_class_schema(model_type)
+        if schema.required_struct_keys.issubset(struct_keys) and schema.allowed_struct_keys.issuperset(struct_keys):
+            matching_types.append(model_type)
+    if len(matching_types) == 1:
+        return matching_types[0]
+    return None
+
 
 def verify_object_against_type(x: Any, typ: Type[T]) -> T:
     '''Verifies that the object is compatible to the specified type (types from the typing package can be used).'''
@@ -48,6 +149,10 @@ def verify_object_against_type(x: Any, typ: Type[T]) -> T:
             possible_types = typ.__args__
             if type(None) in possible_types and x is None: #Shortcut for Optional[] tests. Can be removed, but the exceptions will be more noisy.
                 return x
+            #Shortcut for the objects of the member classes which does not produce exceptions
+            for possible_type in possible_types:
+                if isinstance(possible_type, type) and isinstance(x, possible_type):
+                    return x
             for possible_type in possible_types:
                 try:
                     verify_object_against_type(x, possible_type)
@@ -122,6 +227,10 @@ def parse_object_from_struct_based_on_type(struct: Any, typ: Type[T]) -> T:
             raise TypeError('Error: {}.from_dict(struct={}) failed with exception:\n{}'.format(typ.__name__, struct, str(ex)))
     if hasattr(typ, '__origin__'): #Handling generic types
         if typ.__origin__ is Union: #Optional == Union
+            member_type = _choose_union_member_type(struct, typ)
+            if member_type is not None:
+                return parse_object_from_struct_based_on_type(struct, member_type)
+
             results = {}
             exception_map = {}
             possible_types = list(typ.__args__)
@@ -181,9 +290,9 @@ def convert_object_to_struct(obj, serialized_names: Mapping[str, str] = {}):
     If the type of some property is a class that has .to_dict class method, that method is used for conversion.
     Used by the ModelBase class.
     '''
-    signature = inspect.signature(obj.__init__) #Needed for default values
+    schema = _get_class_schema(type(obj))
     result = {}
-    for python_name in signature.parameters: #TODO: Make it possible to specify the field ordering regardless of the presence of default values
+    for python_name in schema.field_names: #TODO: Make it possible to specify the field ordering regardless of the presence of default values
         value = getattr(obj, python_name)
         if python_name.startswith('_'):
             continue
@@ -195,8 +304,7 @@ def convert_object_to_struct(obj, serialized_names: Mapping[str, str] = {}):
         elif isinstance(value, dict):
             result[attr_name] = {k: (v.to_dict() if hasattr(v, 'to_dict') else v) for k, v in value.items()}
         else:
-            param = signature.parameters.get(python_name, None)
-            if param is None or param.default == inspect.Parameter.empty or value != param.default:
+            if python_name not in schema.defaults or value != schema.defaults[python_name]:
                 result[attr_name] = value
 
     return result
@@ -211,11 +319,13 @@ def parse_object_from_struct_based_on_class_init(cls : Type[T], struct: Mapping,
 
     serialized_names: specifies the mapping between __init__ parameter names and the structure key names for cases where these names are different (due to language syntax clashes or style differences).
     '''
-    parameter_types = get_type_hints(cls.__init__) #Properlty resolves forward references
+    schema = _get_class_schema(cls)
+    parameter_types = schema.parameter_types
 
-    serialized_names_to_pythonic = {v: k for k, v in serialized_names.items()}
-    #If a pythonic name has a different original name, we forbid the pythonic name in the structure. Otherwise, this function would accept "python-styled" structures that should be invalid
-    forbidden_struct_keys = set(serialized_names_to_pythonic.values()).difference(serialized_names_to_pythonic.keys())
+    if serialized_names is schema.serialized_names:
+        serialized_names_to_pythonic, forbidden_struct_keys = schema.serialized_names_to_pythonic, schema.forbidden_struct_keys
+    else:
+        serialized_names_to_pythonic, forbidden_struct_keys = _make_serialized_name_maps(serialized_names)
     args = {}
     for original_name, value in struct.items():
         if original_name in forbidden_struct_keys:
@@ -257,8 +367,11 @@ class ModelBase:
     '''
     _serialized_names = {}
     def __init__(self, args):
-        parameter_types = get_type_hints(self.__class__.__init__)
         field_values = {k: v for k, v in args.items() if k != 'self' and not k.startswith('_')}
+        if getattr(_type_verification_state, 'skip', False):
+            self.__dict__.update(field_values)
+            return
+        parameter_types = _get_class_schema(self.__class__).parameter_types
         for k, v in field_values.items():
             parameter_type = parameter_types.get(k, None)
             if parameter_type is not None:
@@ -276,7 +389,7 @@ class ModelBase:
         return convert_object_to_struct(self, serialized_names=self._serialized_names)
     
     def _get_field_names(self):
-        return list(inspect.signature(self.__init__).parameters)
+        return _get_class_schema(self.__class__).field_names
 
     def __repr__(self):
         return self.__class__.__name__ + '(' + ', '.join(param + '=' + repr(getattr(self, param)) for param in self._get_field_names()) + ')'
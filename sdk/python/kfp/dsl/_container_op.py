@@ -17,7 +17,9 @@ import warnings
 from typing import Any, Dict, List, TypeVar, Union, Callable, Optional, Sequence
 
 from argo.models import V1alpha1ArtifactLocation
-from kubernetes.client import V1Toleration, V1Affinity
+from kubernetes.client import (
+    V1Toleration, V1Affinity, V1LabelSelector, V1PodAffinityTerm, V1PodAntiAffinity, V1WeightedPodAffinityTerm
+)
 from kubernetes.client.models import (
     V1Container, V1EnvVar, V1EnvFromSource, V1SecurityContext, V1Probe,
     V1ResourceRequirements, V1VolumeDevice, V1VolumeMount, V1ContainerPort,
@@ -32,6 +34,21 @@ T = TypeVar('T')
 # type alias: either a string or a list of string
 StringOrStringList = Union[str, List[str]]
 
+_QUANTITY_REGEX = re.compile(r'^([+-]?[0-9.]+(?:[eE][+-]?[0-9]+)?)([a-zA-Z]*)$')
+_QUANTITY_SUFFIXES = {
+    '': 1, 'm': 1e-3,
+    'k': 1e3, 'M': 1e6, 'G': 1e9, 'T': 1e12, 'P': 1e15, 'E': 1e18,
+    'Ki': 2 ** 10, 'Mi': 2 ** 20, 'Gi': 2 ** 30, 'Ti': 2 ** 40, 'Pi': 2 ** 50, 'Ei': 2 ** 60,
+}
+
+
+def _parse_quantity(quantity) -> float:
+    """Parses a Kubernetes resource quantity, e.g. "500m" or "2Gi"."""
+    match = _QUANTITY_REGEX.match(str(quantity).strip())
+    if not match or match.group(2) not in _QUANTITY_SUFFIXES:
+        raise ValueError('Invalid resource quantity: "{}".'.format(quantity))
+    return float(match.group(1)) * _QUANTITY_SUFFIXES[match.group(2)]
+
 
 # util functions
 def deprecation_warning(func: Callable, op_name: str,
@@ -164,6 +181,26 @@ class Container(V1Container):
         super(Container, self).__init__(
             image=image, command=command, args=args, **kwargs)
 
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        # A replaced property can add or remove PipelineParams, so the owner ops
+        # have to extract the PipelineParams of this container again.
+        if name[0] != '_':
+            for op, attr_name in self.__dict__.get('_pipelineparams_owners', ()):
+                op._invalidate_pipelineparams(attr_name)
+
+    def _add_pipelineparams_owner(self, op, attr_name):
+        """Registers the op which tracks the PipelineParams of this container in its `attr_name` attribute."""
+        owners = self.__dict__.setdefault('_pipelineparams_owners', [])
+        if not any(owner is op and owner_attr_name == attr_name for owner, owner_attr_name in owners):
+            owners.append((op, attr_name))
+
+    def _set_attached(self, name, value, attached):
+        """Sets the property without invalidating the owner ops and reports the PipelineParams of the `attached` part of the value."""
+        object.__setattr__(self, name, value)
+        for op, attr_name in self.__dict__.get('_pipelineparams_owners', ()):
+            op._attach_pipelineparams(attr_name, attached)
+
     def _validate_memory_string(self, memory_string):
         """Validate a given string is valid for memory request or limit."""
 
@@ -224,9 +261,10 @@ class Container(V1Container):
           value: The string value of the limit.
         """
 
-        self.resources = self.resources or V1ResourceRequirements()
-        self.resources.limits = self.resources.limits or {}
-        self.resources.limits.update({resource_name: value})
+        resources = self.resources or V1ResourceRequirements()
+        resources.limits = resources.limits or {}
+        resources.limits.update({resource_name: value})
+        self._set_attached('resources', resources, value)
         return self
 
     def add_resource_request(self, resource_name, value):
@@ -237,9 +275,10 @@ class Container(V1Container):
           value: The string value of the request.
         """
 
-        self.resources = self.resources or V1ResourceRequirements()
-        self.resources.requests = self.resources.requests or {}
-        self.resources.requests.update({resource_name: value})
+        resources = self.resources or V1ResourceRequirements()
+        resources.requests = resources.requests or {}
+        resources.requests.update({resource_name: value})
+        self._set_attached('resources', resources, value)
         return self
 
     def set_memory_request(self, memory):
@@ -313,8 +352,9 @@ class Container(V1Container):
             raise ValueError(
                 'invalid argument. Must be of instance `V1VolumeMount`.')
 
-        self.volume_mounts = create_and_append(self.volume_mounts,
-                                               volume_mount)
+        self._set_attached('volume_mounts',
+                           create_and_append(self.volume_mounts, volume_mount),
+                           volume_mount)
         return self
 
     def add_volume_devices(self, volume_device):
@@ -331,8 +371,9 @@ class Container(V1Container):
             raise ValueError(
                 'invalid argument. Must be of instance `V1VolumeDevice`.')
 
-        self.volume_devices = create_and_append(self.volume_devices,
-                                                volume_device)
+        self._set_attached('volume_devices',
+                           create_and_append(self.volume_devices, volume_device),
+                           volume_device)
         return self
 
     def add_env_variable(self, env_variable):
@@ -348,7 +389,8 @@ class Container(V1Container):
             raise ValueError(
                 'invalid argument. Must be of instance `V1EnvVar`.')
 
-        self.env = create_and_append(self.env, env_variable)
+        self._set_attached('env', create_and_append(self.env, env_variable),
+                           env_variable)
         return self
 
     def add_env_from(self, env_from):
@@ -364,7 +406,8 @@ class Container(V1Container):
             raise ValueError(
                 'invalid argument. Must be of instance `V1EnvFromSource`.')
 
-        self.env_from = create_and_append(self.env_from, env_from)
+        self._set_attached('env_from', create_and_append(self.env_from, env_from),
+                           env_from)
         return self
 
     def set_image_pull_policy(self, image_pull_policy):
@@ -394,7 +437,8 @@ class Container(V1Container):
             raise ValueError(
                 'invalid argument. Must be of instance `V1ContainerPort`.')
 
-        self.ports = create_and_append(self.ports, container_port)
+        self._set_attached('ports', create_and_append(self.ports, container_port),
+                           container_port)
         return self
 
     def set_security_context(self, security_context):
@@ -668,6 +712,15 @@ def _make_hash_based_id_for_op(op):
     return op.human_name + ' ' + hex(2**63 + hash(op))[2:]
 
 
+def _make_cache_max_age(max_age: Union[int, str, None]) -> Optional[str]:
+    # Argo expects a duration string
+    if max_age is None or isinstance(max_age, str):
+        return max_age
+    if max_age < 0:
+        raise ValueError('Cache max_age must not be negative, got {}.'.format(max_age))
+    return '{}s'.format(max_age)
+
+
 # Pointer to a function that generates a unique ID for the Op instance (Possibly by registering the Op instance in some system).
 _register_op_handler = _make_hash_based_id_for_op
 
@@ -709,6 +762,11 @@ class BaseOp(object):
         if is_exit_handler:
             warnings.warn('is_exit_handler=True is no longer needed.', DeprecationWarning)
 
+        # PipelineParams extracted from the attributes listed in `attrs_with_pipelineparams`.
+        # attribute name -> List[PipelineParam]. See `inputs`.
+        self._attr_pipelineparams = {}
+        self._inputs = None
+
         self.is_exit_handler = is_exit_handler
 
         # human_name must exist to construct operator's name
@@ -729,6 +787,11 @@ class BaseOp(object):
         self.pod_labels = {}
         self.num_retries = 0
         self.timeout = 0
+        # None means that the pipeline caching options are used
+        self.caching_enabled = None
+        self.cache_max_age = None
+        self.priority_class_name = None
+        self.scheduler_name = None
         self.init_containers = init_containers or []
         self.sidecars = sidecars or []
 
@@ -736,31 +799,74 @@ class BaseOp(object):
         self.loop_args = None
 
         # attributes specific to `BaseOp`
-        self._inputs = []
         self.dependent_names = []
 
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in self.attrs_with_pipelineparams:
+            self._track_containers(name, value)
+            self._invalidate_pipelineparams(name)
+        elif name == 'attrs_with_pipelineparams':
+            self._invalidate_pipelineparams()
+
     @property
     def inputs(self):
         """List of PipelineParams that will be converted into input parameters
         (io.argoproj.workflow.v1alpha1.Inputs) for the argo workflow.
         """
-        # Iterate through and extract all the `PipelineParam` in Op when
-        # called the 1st time (because there are in-place updates to `PipelineParam`
-        # during compilation - remove in-place updates for easier debugging?)
-        if not self._inputs:
-            self._inputs = []
-            # TODO replace with proper k8s obj?
+        # Every attribute is scanned for `PipelineParam` only once. Afterwards the
+        # PipelineParams attached with the `add_*` methods (of the op and of its
+        # containers) are added incrementally and the attributes which are
+        # replaced are scanned again on the next access.
+        # NOTE The in-place changes of the attribute values (e.g.
+        # `op.pod_labels[name] = value`) made after the first access are not tracked.
+        if self._inputs is None:
+            pipeline_params = []
             for key in self.attrs_with_pipelineparams:
-                self._inputs += _pipeline_param.extract_pipelineparams_from_any(getattr(self, key))
+                attr_pipeline_params = self._attr_pipelineparams.get(key)
+                if attr_pipeline_params is None:
+                    attr_pipeline_params = []
+                    # TODO replace with proper k8s obj?
+                    _pipeline_param._collect_pipelineparams(getattr(self, key), attr_pipeline_params)
+                    self._attr_pipelineparams[key] = attr_pipeline_params
+                pipeline_params.extend(attr_pipeline_params)
             # keep only unique
-            self._inputs = list(set(self._inputs))
+            self._inputs = _pipeline_param._unique_pipelineparams(pipeline_params)
         return self._inputs
 
     @inputs.setter
     def inputs(self, value):
-        # to support in-place updates
+        # to support in-place updates. The value is kept until the op attributes change.
         self._inputs = value
 
+    def _invalidate_pipelineparams(self, attr_name: str = None):
+        """Forgets the PipelineParams extracted from the attribute (or from all attributes)."""
+        attr_pipelineparams = self.__dict__.get('_attr_pipelineparams')
+        if attr_pipelineparams:
+            if attr_name is None:
+                attr_pipelineparams.clear()
+            else:
+                attr_pipelineparams.pop(attr_name, None)
+        self.__dict__['_inputs'] = None
+
+    def _attach_pipelineparams(self, attr_name: str, attached):
+        """Adds the PipelineParams of an object attached to the attribute without scanning the whole attribute again."""
+        attr_pipeline_params = self._attr_pipelineparams.get(attr_name)
+        if attr_pipeline_params is None:
+            # The attribute has not been scanned yet
+            return
+        _pipeline_param._collect_pipelineparams(attached, attr_pipeline_params)
+        self.__dict__['_inputs'] = None
+
+    def _track_containers(self, attr_name: str, value):
+        """Makes the containers in the attribute report their changes to this op."""
+        if isinstance(value, Container):
+            value._add_pipelineparams_owner(self, attr_name)
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, Container):
+                    item._add_pipelineparams_owner(self, attr_name)
+
     def apply(self, mod_func):
         """Applies a modifier function to self. The function should return the passed object.
         This is needed to chain "extention methods" to this class.
@@ -791,6 +897,7 @@ class BaseOp(object):
           https://github.com/kubernetes-client/python/blob/master/kubernetes/client/models/v1_volume.py
         """
         self.volumes.append(volume)
+        self._attach_pipelineparams('volumes', volume)
         return self
 
     def add_toleration(self, tolerations: V1Toleration):
@@ -802,6 +909,7 @@ class BaseOp(object):
           https://github.com/kubernetes-client/python/blob/master/kubernetes/client/models/v1_toleration.py
         """
         self.tolerations.append(tolerations)
+        self._attach_pipelineparams('tolerations', tolerations)
         return self
 
     def add_affinity(self, affinity: V1Affinity):
@@ -820,6 +928,31 @@ class BaseOp(object):
         self.affinity = affinity
         return self
 
+    def add_pod_anti_affinity_term(self, label_selector: Dict[str, str], topology_key: str = 'kubernetes.io/hostname', weight: int = 100):
+        """Add a preferred pod anti-affinity term, so that the pod is preferably not
+        scheduled next to the pods that match the labels.
+
+        Args:
+          label_selector: The labels of the pods to avoid.
+          topology_key: The node label which defines the placement domain, e.g. the node or the zone.
+          weight: The weight of the preference in the range 1-100.
+        """
+
+        if not self.affinity:
+            self.affinity = V1Affinity()
+        if self.affinity.pod_anti_affinity is None:
+            self.affinity.pod_anti_affinity = V1PodAntiAffinity()
+        pod_anti_affinity = self.affinity.pod_anti_affinity
+        pod_anti_affinity.preferred_during_scheduling_ignored_during_execution = (
+            pod_anti_affinity.preferred_during_scheduling_ignored_during_execution or [])
+        pod_anti_affinity.preferred_during_scheduling_ignored_during_execution.append(
+            V1WeightedPodAffinityTerm(
+                weight=weight,
+                pod_affinity_term=V1PodAffinityTerm(
+                    label_selector=V1LabelSelector(match_labels=dict(label_selector)),
+                    topology_key=topology_key)))
+        return self
+
     def add_node_selector_constraint(self, label_name, value):
         """Add a constraint for nodeSelector. Each constraint is a key-value pair label. For the 
         container to be eligible to run on a node, the node must have each of the constraints appeared
@@ -831,6 +964,7 @@ class BaseOp(object):
         """
 
         self.node_selector[label_name] = value
+        self._attach_pipelineparams('node_selector', value)
         return self
 
     def add_pod_annotation(self, name: str, value: str):
@@ -842,6 +976,7 @@ class BaseOp(object):
         """
 
         self.pod_annotations[name] = value
+        self._attach_pipelineparams('pod_annotations', value)
         return self
 
     def add_pod_label(self, name: str, value: str):
@@ -853,6 +988,7 @@ class BaseOp(object):
         """
 
         self.pod_labels[name] = value
+        self._attach_pipelineparams('pod_labels', value)
         return self
 
     def set_retry(self, num_retries: int):
@@ -875,6 +1011,49 @@ class BaseOp(object):
         self.timeout = seconds
         return self
 
+    def set_caching_options(self, enabled: bool = True, max_age: Union[int, str] = None):
+        """Sets whether the outputs of the task are reused from the previous runs.
+
+        The task is skipped when a previous task with the same container spec and the
+        same input parameter values has succeeded. The caching options of the task
+        override the pipeline caching options (see `PipelineConf.set_caching`).
+        The caching uses the Argo memoization, so it requires Argo 2.10 or later. The
+        input parameter values are part of the cache key, so the outputs are only
+        stored when the values are valid ConfigMap key strings. The tasks which get
+        input artifacts (e.g. the file inputs of the components) from other tasks are
+        not cached, since the artifact contents are not part of the key.
+
+        Args:
+          enabled: Whether the task outputs are cached.
+          max_age: Optional maximum age of the reused outputs, the number of seconds
+            or a duration string, e.g. "12h".
+        """
+
+        self.caching_enabled = enabled
+        self.cache_max_age = _make_cache_max_age(max_age)
+        return self
+
+    def set_priority_class(self, priority_class_name: str):
+        """Sets the priority class of the task pod. The scheduler places the pods with
+        higher priority first and can preempt the pods with lower priority.
+
+        Args:
+          priority_class_name: The name of the Kubernetes PriorityClass.
+        """
+
+        self.priority_class_name = priority_class_name
+        return self
+
+    def set_scheduler_name(self, scheduler_name: str):
+        """Sets the scheduler which places the task pod, e.g. a batch or bin-packing scheduler.
+
+        Args:
+          scheduler_name: The name of the Kubernetes scheduler.
+        """
+
+        self.scheduler_name = scheduler_name
+        return self
+
     def add_init_container(self, init_container: UserContainer):
         """Add a init container to the Op.
 
@@ -883,6 +1062,8 @@ class BaseOp(object):
         """
 
         self.init_containers.append(init_container)
+        self._track_containers('init_containers', [init_container])
+        self._attach_pipelineparams('init_containers', init_container)
         return self
 
     def add_sidecar(self, sidecar: Sidecar):
@@ -893,6 +1074,8 @@ class BaseOp(object):
         """
 
         self.sidecars.append(sidecar)
+        self._track_containers('sidecars', [sidecar])
+        self._attach_pipelineparams('sidecars', sidecar)
         return self
 
     def set_display_name(self, name: str):
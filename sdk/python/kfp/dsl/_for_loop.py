@@ -1,3 +1,4 @@
+import json
 import re
 from typing import List, Union, Dict, Text, Any, Tuple, Optional
 
@@ -19,7 +20,7 @@ class LoopArguments(dsl.PipelineParam):
     def _subvar_name_is_legal(cls, proposed_variable_name: Text):
         return re.match(cls.LEGAL_SUBVAR_NAME_REGEX, proposed_variable_name) is not None
 
-    def __init__(self, items: Union[ItemList, dsl.PipelineParam], code: Text, name_override: Optional[Text]=None, op_name: Optional[Text]=None, *args, **kwargs):
+    def __init__(self, items: Union[ItemList, dsl.PipelineParam], code: Text, name_override: Optional[Text]=None, op_name: Optional[Text]=None, batch_size: Optional[int]=None, *args, **kwargs):
         """LoopArguments represent the set of items to loop over in a ParallelFor loop.  This class shouldn't be
         instantiated by the user but rather is created by _ops_group.ParallelFor.
 
@@ -28,7 +29,10 @@ class LoopArguments(dsl.PipelineParam):
                 key must be a legal Python variable name.
             code: A unique code used to identify these loop arguments.  Should match the code for the ParallelFor
                 ops_group which created these _LoopArguments.  This prevents parameter name collisions.
+            batch_size: If set, the items are looped over in batches of this size. Every loop iteration gets
+                a JSON list of the items of its batch and the items have no subvariables.
         """
+        self.batch_size = batch_size
         if name_override is None:
             super().__init__(name=self._make_name(code), *args, **kwargs)
         else:
@@ -40,7 +44,7 @@ class LoopArguments(dsl.PipelineParam):
         if isinstance(items, tuple):
             items = list(items)
 
-        if isinstance(items, list) and isinstance(items[0], dict):
+        if isinstance(items, list) and isinstance(items[0], dict) and batch_size is None:
             subvar_names = set(items[0].keys())
             for item in items:
                 if not set(item.keys()) == subvar_names:
@@ -58,28 +62,39 @@ class LoopArguments(dsl.PipelineParam):
         self.referenced_subvar_names = []
 
     @classmethod
-    def from_pipeline_param(cls, param: dsl.PipelineParam) -> 'LoopArguments':
+    def from_pipeline_param(cls, param: dsl.PipelineParam, batch_size: Optional[int]=None) -> 'LoopArguments':
         return LoopArguments(
             items=param,
             code=None,
             name_override=param.name,
             op_name=param.op_name,
+            batch_size=batch_size,
             value=param.value,
         )
 
     def __getattr__(self, item):
         # this is being overridden so that we can access subvariables of the LoopArguments (i.e.: item.a) without
         # knowing the subvariable names ahead of time
+        if self.__dict__.get('batch_size') is not None:
+            raise AttributeError("The items of a batched loop have no subvariables. Every loop iteration gets a JSON "
+                                 "list of the items of its batch. Tried to access {}.".format(item))
         self.referenced_subvar_names.append(item)
         return LoopArgumentVariable(self.name, item)
 
     def to_list_for_task_yaml(self):
         if isinstance(self.items_or_pipeline_param, (list, tuple)):
+            if self.batch_size is not None:
+                return self.split_into_batches(self.items_or_pipeline_param, self.batch_size)
             return self.items_or_pipeline_param
         else:
             raise ValueError("You should only call this method on loop args which have list items, "
                              "not pipeline param items.")
 
+    @staticmethod
+    def split_into_batches(items: ItemList, batch_size: int) -> List[Text]:
+        """Splits the items into the JSON lists of at most batch_size items."""
+        return [json.dumps(items[i:i + batch_size], sort_keys=True) for i in range(0, len(items), batch_size)]
+
     @classmethod
     def _make_name(cls, code: Text):
         """Make a name for this parameter.  Code is a """
@@ -98,6 +113,9 @@ class LoopArgumentVariable(dsl.PipelineParam):
     """Represents a subvariable for loop arguments.  This is used for cases where we're looping over maps,
     each of which contains several variables."""
     SUBVAR_NAME_DELIMITER = '-subvar-'
+    # A new variable is created on every attribute access of the LoopArguments, so they are kept compact.
+    # LoopArguments keeps its __dict__ since the subvariables are stored as its attributes.
+    __slots__ = ()
 
     def __init__(self, loop_args_name: Text, this_variable_name: Text):
         """
@@ -70,9 +70,8 @@ class OpsGroup(object):
     if not _pipeline.Pipeline.get_default_pipeline():
       raise ValueError('Default pipeline not defined.')
 
-    self.name = (self.type + '-' + ('' if self.name is None else self.name + '-') +
-                   str(_pipeline.Pipeline.get_default_pipeline().get_next_group_id()))
-    self.name = self.name.replace('_', '-')
+    name = self.type + ('' if self.name is None else '-' + self.name)
+    self.name = _pipeline.Pipeline.get_default_pipeline()._make_group_name_unique(name.replace('_', '-'))
 
   def __enter__(self):
     if not _pipeline.Pipeline.get_default_pipeline():
@@ -163,6 +162,18 @@ class Graph(OpsGroup):
     self.dependencies = []
 
 
+# Splits the JSON list into JSON lists of at most batch size items, the same way as LoopArguments.split_into_batches.
+_BATCH_SPLITTER_PROGRAM = '''\
+import json, os, sys
+items = json.loads(sys.argv[1])
+batch_size = int(sys.argv[2])
+batches = [json.dumps(items[i:i + batch_size], sort_keys=True) for i in range(0, len(items), batch_size)]
+os.makedirs(os.path.dirname(sys.argv[3]), exist_ok=True)
+with open(sys.argv[3], 'w') as f:
+    json.dump(batches, f)
+'''
+
+
 class ParallelFor(OpsGroup):
   """Represents a parallel for loop over a static set of items.
 
@@ -173,14 +184,50 @@ class ParallelFor(OpsGroup):
     op2 = ContainerOp(..., args=['echo {}'.format(item.b])
   ```
   and op1 would be executed twice, once with args=['echo 1'] and once with args=['echo 2']
+
+  Fine-grained loops can process the items in batches to save the pod startup time:
+  ```python
+  with dsl.ParallelFor(list(range(1000)), batch_size=50) as batch:
+    op1 = ContainerOp(..., args=['process-items', batch])
+  ```
+  and op1 would be executed 20 times, each time with a JSON list of 50 items.
   """
   TYPE_NAME = 'for_loop'
+  # The image of the step which splits the PipelineParam loop items into batches.
+  BATCH_SPLITTER_IMAGE = 'python:3.7-alpine'
+  # The pod label of the loop ops whose iterations are spread over the nodes.
+  SPREAD_LABEL = 'pipelines.kubeflow.org/spread-group'
 
   @staticmethod
   def _get_unique_id_code():
     return uuid.uuid4().hex[:_for_loop.LoopArguments.NUM_CODE_CHARS]
 
-  def __init__(self, loop_args: Union[_for_loop.ItemList, _pipeline_param.PipelineParam]):
+  def __init__(self, loop_args: Union[_for_loop.ItemList, _pipeline_param.PipelineParam], parallelism: int = None,
+               batch_size: int = None, spread_iterations: bool = False):
+    """Create a new instance of ParallelFor.
+
+    Args:
+      loop_args: The items to loop over, a list or a PipelineParam with a JSON list.
+      parallelism: Optional maximum number of the loop iterations which run at the same time.
+      batch_size: Optional number of the items processed by a single loop iteration. Every
+        iteration gets a JSON list of the items of its batch instead of a single item, so the
+        batch can only be passed to the component inputs which have list types (e.g.
+        JsonArray) or no types. The PipelineParam items are split by an additional step which
+        runs before the loop.
+      spread_iterations: Whether the pods of the loop iterations preferably run on different
+        nodes. The ops of the loop get a preferred pod anti-affinity against each other.
+    """
+    if parallelism is not None and parallelism < 1:
+      raise ValueError('ParallelFor parallelism must be a positive integer, got {}.'.format(parallelism))
+    if batch_size is not None and batch_size < 1:
+      raise ValueError('ParallelFor batch_size must be a positive integer, got {}.'.format(batch_size))
+    if batch_size is not None and isinstance(loop_args, _for_loop.LoopArguments):
+      raise ValueError('ParallelFor batch_size cannot be used with LoopArguments.')
+    self.parallelism = parallelism
+    self.batch_size = batch_size
+    self.spread_iterations = spread_iterations
+    if batch_size is not None and isinstance(loop_args, _pipeline_param.PipelineParam):
+      loop_args = self._create_batch_splitter(loop_args, batch_size).output
     self.items_is_pipeline_param = isinstance(loop_args, _pipeline_param.PipelineParam)
 
     # use a random code to uniquely identify this loop
@@ -189,13 +236,42 @@ class ParallelFor(OpsGroup):
     super().__init__(self.TYPE_NAME, name=group_name)
 
     if self.items_is_pipeline_param:
-      loop_args = _for_loop.LoopArguments.from_pipeline_param(loop_args)
+      loop_args = _for_loop.LoopArguments.from_pipeline_param(loop_args, batch_size=batch_size)
     elif not self.items_is_pipeline_param and not isinstance(loop_args, _for_loop.LoopArguments):
       # we were passed a raw list, wrap it in loop args
-      loop_args = _for_loop.LoopArguments(loop_args, code)
+      loop_args = _for_loop.LoopArguments(loop_args, code, batch_size=batch_size)
 
     self.loop_args = loop_args
 
+  @classmethod
+  def _create_batch_splitter(cls, items: _pipeline_param.PipelineParam, batch_size: int):
+    """Creates the op which splits the JSON list of the items into a JSON list of the batches."""
+    return _container_op.ContainerOp(
+        name='split-into-batches',
+        image=cls.BATCH_SPLITTER_IMAGE,
+        command=['python3', '-c', _BATCH_SPLITTER_PROGRAM, items, str(batch_size), '/tmp/outputs/batches'],
+        file_outputs={'batches': '/tmp/outputs/batches'},
+    )
+
   def __enter__(self) -> _for_loop.LoopArguments:
     _ = super().__enter__()
     return self.loop_args
+
+  def __exit__(self, *args):
+    super().__exit__(*args)
+    if self.spread_iterations:
+      # Argo labels the pods with the workflow name, so only the pods of the same run avoid each other.
+      label_selector = {
+          self.SPREAD_LABEL: self.name,
+          'workflows.argoproj.io/workflow': '{{workflow.name}}',
+      }
+      groups = [self]
+      while groups:
+        group = groups.pop()
+        groups.extend(group.groups)
+        for op in group.ops:
+          # The ops of the nested spread loops are spread by the innermost loop
+          if self.SPREAD_LABEL in op.pod_labels:
+            continue
+          op.add_pod_label(self.SPREAD_LABEL, self.name)
+          op.add_pod_anti_affinity_term(label_selector)
@@ -16,7 +16,7 @@
 from . import _container_op
 from . import _resource_op
 from . import _ops_group
-from ..components._naming import _make_name_unique_by_adding_index
+from ..components._naming import _UniqueNameRegistry
 import sys
 
 
@@ -60,6 +60,11 @@ class PipelineConf():
     self.ttl_seconds_after_finished = -1
     self.artifact_location = None
     self.op_transformers = []
+    self.deduplicate_templates = False
+    self.parallelism = None
+    self.caching_enabled = False
+    self.cache_max_age = None
+    self.default_resources = {}
 
   def set_image_pull_secrets(self, image_pull_secrets):
     """Configures the pipeline level imagepullsecret
@@ -81,6 +86,39 @@ class PipelineConf():
     self.timeout = seconds
     return self
 
+  def set_parallelism(self, max_num_pods: int):
+    """Configures the maximum number of pods of the pipeline which run at the same time.
+
+    Use the parallelism argument of dsl.ParallelFor to limit the concurrent iterations of
+    a single loop.
+
+    Args:
+      max_num_pods: max number of concurrent pods.
+    """
+    if max_num_pods < 1:
+      raise ValueError('Pipeline parallelism must be a positive integer, got {}.'.format(max_num_pods))
+    self.parallelism = max_num_pods
+    return self
+
+  def set_caching(self, enabled: bool = True, max_age=None):
+    """Configures whether the outputs of the pipeline tasks are reused from the previous runs.
+
+    A task is skipped when a previous task with the same container spec and the same
+    input parameter values has succeeded. Use `set_caching_options` of the ops to
+    override the options for a single task. The caching uses the Argo memoization, so
+    it requires Argo 2.10 or later. The tasks which get input artifacts (e.g. the file
+    inputs of the components) from other tasks are not cached, since the artifact
+    contents are not part of the key.
+
+    Args:
+      enabled: Whether the task outputs are cached.
+      max_age: Optional maximum age of the reused outputs, the number of seconds or
+        a duration string, e.g. "12h".
+    """
+    self.caching_enabled = enabled
+    self.cache_max_age = _container_op._make_cache_max_age(max_age)
+    return self
+
   def set_ttl_seconds_after_finished(self, seconds: int):
     """Configures the ttl after the pipeline has finished.
 
@@ -124,6 +162,65 @@ class PipelineConf():
     self.artifact_location = artifact_location
     return self
 
+  def set_deduplicate_templates(self, deduplicate_templates: bool = True):
+    """Configures whether the identical container templates are merged.
+
+    Ops which only differ by their names and container argument values (e.g. ops
+    created in a loop) share a single template and the differing values are
+    passed as input parameters. This makes the compiled workflow smaller.
+
+    Args:
+      deduplicate_templates: whether to merge the identical container templates.
+    """
+    self.deduplicate_templates = deduplicate_templates
+    return self
+
+  def set_default_resources(self, cpu_request=None, memory_request=None, cpu_limit=None, memory_limit=None):
+    """Configures the resources of the container ops which do not set them.
+
+    The defaults let the scheduler pack the pods which would otherwise have no
+    requests. The defaults are applied by an op transformer. A default limit which is
+    lower than the op request and a default request which is higher than the op limit
+    are skipped, since Kubernetes rejects the pods with such resources.
+
+    Args:
+      cpu_request: Default CPU request, e.g. "500m".
+      memory_request: Default memory request, e.g. "512Mi".
+      cpu_limit: Default CPU limit.
+      memory_limit: Default memory limit.
+    """
+    if not self.default_resources:
+      self.add_op_transformer(self._set_default_resources)
+    for key, value in (('cpu_request', cpu_request), ('memory_request', memory_request),
+                       ('cpu_limit', cpu_limit), ('memory_limit', memory_limit)):
+      if value is not None:
+        self.default_resources[key] = value
+    return self
+
+  def _set_default_resources(self, op):
+    if not isinstance(op, _container_op.ContainerOp):
+      return op
+    # The defaults which would make a limit lower than the request are skipped since Kubernetes rejects such pods.
+    resources = op.container.resources
+    limits = (resources.limits if resources else None) or {}
+    requests = (resources.requests if resources else None) or {}
+    cpu_request = self.default_resources.get('cpu_request')
+    if cpu_request is not None and 'cpu' not in requests and not _is_quantity_less_than(limits.get('cpu'), cpu_request):
+      op.container.set_cpu_request(cpu_request)
+    memory_request = self.default_resources.get('memory_request')
+    if memory_request is not None and 'memory' not in requests and not _is_quantity_less_than(limits.get('memory'), memory_request):
+      op.container.set_memory_request(memory_request)
+
+    resources = op.container.resources
+    requests = (resources.requests if resources else None) or {}
+    cpu_limit = self.default_resources.get('cpu_limit')
+    if cpu_limit is not None and 'cpu' not in limits and not _is_quantity_less_than(cpu_limit, requests.get('cpu')):
+      op.container.set_cpu_limit(cpu_limit)
+    memory_limit = self.default_resources.get('memory_limit')
+    if memory_limit is not None and 'memory' not in limits and not _is_quantity_less_than(memory_limit, requests.get('memory')):
+      op.container.set_memory_limit(memory_limit)
+    return op
+
   def add_op_transformer(self, transformer):
     """Configures the op_transformers which will be applied to all ops in the pipeline.
 
@@ -133,6 +230,17 @@ class PipelineConf():
     self.op_transformers.append(transformer)
 
 
+def _is_quantity_less_than(quantity, other_quantity) -> bool:
+  """Compares two resource quantities. Missing quantities and the quantities which are
+  not known at compile time (e.g. pipeline parameters) are never less than others."""
+  if quantity is None or other_quantity is None:
+    return False
+  try:
+    return _container_op._parse_quantity(quantity) < _container_op._parse_quantity(other_quantity)
+  except ValueError:
+    return False
+
+
 def get_pipeline_conf():
   """Configure the pipeline level setting to the current pipeline
     Note: call the function inside the user defined pipeline function.
@@ -181,6 +289,9 @@ class Pipeline():
     # Add the root group.
     self.groups = [_ops_group.OpsGroup('pipeline', name=name)]
     self.group_id = 0
+    # The used op and group names. Keeping them in registries makes adding an op or a group O(1) amortized.
+    self._op_names = _UniqueNameRegistry(' ')
+    self._group_names = _UniqueNameRegistry('-')
     self.conf = PipelineConf()
     self._metadata = None
 
@@ -211,7 +322,7 @@ class Pipeline():
       op_name: a unique op name.
     """
     #If there is an existing op with this name then generate a new name.
-    op_name = _make_name_unique_by_adding_index(op.human_name, list(self.ops.keys()), ' ')
+    op_name = self._op_names.make_unique(op.human_name)
 
     self.ops[op_name] = op
     if not define_only:
@@ -242,6 +353,10 @@ class Pipeline():
     self.group_id += 1
     return self.group_id
 
+  def _make_group_name_unique(self, name: str):
+    """Generates a unique name for a new group by adding the next group id to the name."""
+    return self._group_names.make_unique(name + '-' + str(self.get_next_group_id()))
+
   def _set_metadata(self, metadata):
     '''_set_metadata passes the containerop the metadata information
     Args:
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import re
+import sys
 from collections import namedtuple
 from typing import List, Dict, Union
 
@@ -51,7 +52,7 @@ def match_serialized_pipelineparam(payload: str):
   matches = re.findall(r'{{pipelineparam:op=([\w\s_-]*);name=([\w\s_-]+)}}', payload)
   param_tuples = []
   for match in matches:
-      pattern = '{{pipelineparam:op=%s;name=%s}}' % (match[0], match[1])
+      pattern = sys.intern('{{pipelineparam:op=%s;name=%s}}' % (match[0], match[1]))
       param_tuples.append(PipelineParamTuple(
                           name=sanitize_k8s_name(match[1], True),
                           op=sanitize_k8s_name(match[0]), 
@@ -91,49 +92,71 @@ def extract_pipelineparams_from_any(payload) -> List['PipelineParam']:
   Return:
     List[PipelineParam]
   """
+  pipeline_params = []
+  _collect_pipelineparams(payload, pipeline_params)
+  return _unique_pipelineparams(pipeline_params)
+
+
+def _collect_pipelineparams(payload, pipeline_params: List['PipelineParam']):
+  """Appends all PipelineParam instances and serialized PipelineParams found in the payload to pipeline_params.
+  The result can contain duplicates. Use _unique_pipelineparams to remove them once at the end.
+  """
   if not payload:
-    return []
+    return
 
   # PipelineParam
   if isinstance(payload, PipelineParam):
-    return [payload]
- 
+    pipeline_params.append(payload)
+    return
+
   # str
   if isinstance(payload, str):
-    return list(set(_extract_pipelineparams(payload)))
-  
+    if '{{pipelineparam:' in payload:
+      pipeline_params.extend(_extract_pipelineparams(payload))
+    return
+
   # list or tuple
   if isinstance(payload, list) or isinstance(payload, tuple):
-    pipeline_params = []
     for item in payload:
-      pipeline_params += extract_pipelineparams_from_any(item)
-    return list(set(pipeline_params))
+      _collect_pipelineparams(item, pipeline_params)
+    return
 
   # dict
   if isinstance(payload, dict):
-    pipeline_params = []
     for item in payload.values():
-      pipeline_params += extract_pipelineparams_from_any(item)
-    return list(set(pipeline_params))
+      _collect_pipelineparams(item, pipeline_params)
+    return
 
   # k8s swagger object
   if hasattr(payload, 'swagger_types') and isinstance(payload.swagger_types, dict):
-    pipeline_params = []
     for key in payload.swagger_types.keys():
-      pipeline_params += extract_pipelineparams_from_any(getattr(payload, key))
-
-    return list(set(pipeline_params))
+      _collect_pipelineparams(getattr(payload, key), pipeline_params)
+    return
 
   # k8s openapi object
   if hasattr(payload, 'openapi_types') and isinstance(payload.openapi_types, dict):
-    pipeline_params = []
     for key in payload.openapi_types.keys():
-      pipeline_params += extract_pipelineparams_from_any(getattr(payload, key))
+      _collect_pipelineparams(getattr(payload, key), pipeline_params)
+
+
+def _unique_pipelineparams(pipeline_params: List['PipelineParam']) -> List['PipelineParam']:
+  """Removes the duplicate PipelineParams (the ones with the same op_name and name) keeping the first ones."""
+  seen_keys = set()
+  unique_params = []
+  for param in pipeline_params:
+    key = (param.op_name, param.name)
+    if key not in seen_keys:
+      seen_keys.add(key)
+      unique_params.append(param)
+  return unique_params
+
 
-    return list(set(pipeline_params))
+_VALID_PARAM_NAME_REGEX = re.compile(r'^[A-Za-z][A-Za-z0-9\s_-]*$')
 
-  # return empty list  
-  return []
+
+def _intern(name):
+  # The same names are stored in many PipelineParams. str subclasses cannot be interned.
+  return sys.intern(name) if type(name) is str else name
 
 
 class PipelineParam(object):
@@ -143,7 +166,12 @@ class PipelineParam(object):
   pipeline parameter that shows up in ML Pipelines system UI. It can also represent an intermediate
   value passed between components.
   """
-  
+
+  # Big pipelines create a lot of PipelineParams, so they have no __dict__.
+  # The serialized string, full_name and hash only depend on the name and op_name,
+  # so they are computed once every time one of them changes.
+  __slots__ = ('_name', '_op_name', 'value', 'param_type', 'pattern', '_full_name', '_serialized', '_hash')
+
   def __init__(self, name: str, op_name: str=None, value: str=None, param_type : Union[str, Dict] = None, pattern: str=None):
     """Create a new instance of PipelineParam.
     Args:
@@ -160,29 +188,52 @@ class PipelineParam(object):
             and value are set.
     """
 
-    valid_name_regex = r'^[A-Za-z][A-Za-z0-9\s_-]*$'
-    if not re.match(valid_name_regex, name):
+    if not _VALID_PARAM_NAME_REGEX.match(name):
       raise ValueError('Only letters, numbers, spaces, "_", and "-" are allowed in name. Must begin with a letter.  '
                        'Got name: {}'.format(name))
 
     if op_name and value:
       raise ValueError('op_name and value cannot be both set.')
 
-    self.name = name
+    self._name = _intern(name)
     # ensure value is None even if empty string or empty list
     # so that serialization and unserialization remain consistent
     # (i.e. None => '' => None)
-    self.op_name = op_name if op_name else None
+    self._op_name = _intern(op_name) if op_name else None
+    self._update_derived_names()
     self.value = value if value else None
     self.param_type = param_type
-    self.pattern = pattern or str(self)
+    self.pattern = pattern or self._serialized
+
+  def _update_derived_names(self):
+    op_name = self._op_name
+    name = self._name
+    self._full_name = op_name + '-' + name if op_name else name
+    self._serialized = '{{pipelineparam:op=%s;name=%s}}' % (op_name or '', name)
+    self._hash = hash((op_name, name))
+
+  @property
+  def name(self):
+    return self._name
+
+  @name.setter
+  def name(self, value):
+    self._name = _intern(value)
+    self._update_derived_names()
+
+  @property
+  def op_name(self):
+    return self._op_name
+
+  @op_name.setter
+  def op_name(self, value):
+    self._op_name = _intern(value) if value else None
+    self._update_derived_names()
 
   @property
   def full_name(self):
     """Unique name in the argo yaml for the PipelineParam"""
-    if self.op_name:
-        return self.op_name + '-' + self.name
-    return self.name
+    return self._full_name
 
   def __str__(self):
     """String representation.
@@ -198,8 +249,7 @@ class PipelineParam(object):
     #if self.value:
     #  return str(self.value)
 
-    op_name = self.op_name if self.op_name else ''
-    return '{{pipelineparam:op=%s;name=%s}}' % (op_name, self.name)
+    return self._serialized
   
   def __repr__(self):
     # return str({self.__class__.__name__: self.__dict__})
@@ -229,7 +279,7 @@ class PipelineParam(object):
     return ConditionOperator('>=', self, other)
 
   def __hash__(self):
-    return hash((self.op_name, self.name))
+    return self._hash
 
   def ignore_type(self):
     """ignore_type ignores the type information such that type checking would also pass"""
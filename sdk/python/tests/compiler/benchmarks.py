@@ -0,0 +1,311 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compiler benchmarks with synthetic pipelines.
+
+Usage (from sdk/python):
+  python -m tests.compiler.benchmarks --output results.json
+  python -m tests.compiler.benchmarks --sizes 10 100 --compare results.json
+
+Every scenario generates the same pipeline for the same size, so the results of
+different commits can be compared. The time metrics are the minimum over the
+repeats and the memory metrics are the tracemalloc peaks of a separate run.
+The fix_big_data_passing peak only covers that phase on Python 3.9+; on older
+versions it is the peak of the whole compilation up to the end of the phase.
+"""
+
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict
+
+import kfp
+import kfp.dsl as dsl
+from kfp.compiler import Compiler, CompileProfiler
+from kfp.components import func_to_container_op
+
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+
+_BIG_COMPONENT_COUNT = 10
+_BIG_COMPONENT_SOURCE_LINES = 1000
+
+
+def _producer_op(name, consumed_value=None):
+  return dsl.ContainerOp(
+      name=name,
+      image='busybox',
+      command=['sh', '-c', 'echo "$0" > /tmp/out', consumed_value or name],
+      file_outputs={'out': '/tmp/out'},
+  )
+
+
+def fan_out_pipeline(size):
+  """One producer and size - 1 consumers of its output."""
+  def fan_out(message: str = 'hello'):
+    producer = _producer_op('producer', message)
+    for i in range(size - 1):
+      _producer_op('consumer-%d' % i, producer.output)
+  return fan_out
+
+
+def chain_pipeline(size):
+  """Each op consumes the output of the previous one."""
+  def chain(message: str = 'hello'):
+    previous_output = message
+    for i in range(size):
+      previous_output = _producer_op('step-%d' % i, previous_output).output
+  return chain
+
+
+def nested_groups_pipeline(size):
+  """Blocks of 10 ops inside ParallelFor > Condition > ParallelFor."""
+  def nested_groups(message: str = 'hello'):
+    root = _producer_op('root', message)
+    for block in range((size - 1 + 9) // 10):
+      with dsl.ParallelFor([{'a': 1, 'b': 'x'}, {'a': 2, 'b': 'y'}]) as item:
+        with dsl.Condition(root.output == 'block-%d' % block):
+          with dsl.ParallelFor([1, 2, 3]) as inner_item:
+            previous_output = _producer_op('block-%d-start' % block, item.b).output
+            for i in range(min(9, size - 1 - block * 10 - 1)):
+              previous_output = _producer_op(
+                  'block-%d-step-%d' % (block, i),
+                  '%s %s %s' % (previous_output, item.a, inner_item)).output
+  return nested_groups
+
+
+def recursive_graph_pipeline(size):
+  """A recursive graph component with a chain of size - 2 ops in its body."""
+  @dsl.graph_component
+  def recursive_body(value):
+    with dsl.Condition(value != 'done'):
+      previous_output = value
+      for i in range(size - 2):
+        previous_output = _producer_op('body-%d' % i, previous_output).output
+      recursive_body(previous_output)
+
+  def recursive_graph(message: str = 'hello'):
+    start = _producer_op('start', message)
+    recursive_body(start.output)
+    _producer_op('end', start.output)
+  return recursive_graph
+
+
+def _generate_big_components(module_dir):
+  """Generates python functions with big sources and converts them to components."""
+  module_path = os.path.join(module_dir, 'kfp_benchmark_components.py')
+  with open(module_path, 'w') as f:
+    for component_index in range(_BIG_COMPONENT_COUNT):
+      f.write('def big_component_%d(value: str) -> str:\n' % component_index)
+      f.write('    table = {\n')
+      for line in range(_BIG_COMPONENT_SOURCE_LINES):
+        f.write('        %d: "line %d of component %d",\n' % (line, line, component_index))
+      f.write('    }\n')
+      f.write('    return value + table[len(value) %% %d]\n\n\n' % _BIG_COMPONENT_SOURCE_LINES)
+  spec = importlib.util.spec_from_file_location('kfp_benchmark_components', module_path)
+  module = importlib.util.module_from_spec(spec)
+  sys.modules[spec.name] = module
+  spec.loader.exec_module(module)
+  return [
+      func_to_container_op(getattr(module, 'big_component_%d' % i))
+      for i in range(_BIG_COMPONENT_COUNT)
+  ]
+
+
+def big_python_components_pipeline(size, module_dir):
+  """A chain of ops created from python functions with big sources."""
+  components = _generate_big_components(module_dir)
+  def big_python_components(message: str = 'hello'):
+    previous_output = message
+    for i in range(size):
+      previous_output = components[i % len(components)](previous_output).output
+  return big_python_components
+
+
+SCENARIOS = OrderedDict([
+    ('fan_out', fan_out_pipeline),
+    ('chain', chain_pipeline),
+    ('nested_groups', nested_groups_pipeline),
+    ('recursive_graph', recursive_graph_pipeline),
+    ('big_python_components', big_python_components_pipeline),
+])
+
+
+def _create_workflow(pipeline_func, profiler=None):
+  return Compiler(profiler=profiler)._create_workflow(pipeline_func)
+
+
+def measure(pipeline_func, package_path, repeats=3):
+  """Measures compiling the pipeline.
+
+  Returns:
+    Dict with the *_seconds, *_peak_bytes metrics and the number of templates.
+  """
+  metrics = OrderedDict()
+  create_times = []
+  fix_times = []
+  write_times = []
+  for _ in range(repeats):
+    gc.collect()
+    profiler = CompileProfiler(trace_allocations=False)
+    start_time = time.perf_counter()
+    workflow = _create_workflow(pipeline_func, profiler)
+    create_times.append(time.perf_counter() - start_time)
+    fix_times.append(profiler.phases['fix_big_data_passing']['wall_time_seconds'])
+
+    gc.collect()
+    start_time = time.perf_counter()
+    Compiler._write_workflow(workflow, package_path)
+    write_times.append(time.perf_counter() - start_time)
+
+  metrics['create_workflow_seconds'] = min(create_times)
+  metrics['fix_big_data_passing_seconds'] = min(fix_times)
+  metrics['write_workflow_seconds'] = min(write_times)
+
+  gc.collect()
+  with CompileProfiler() as profiler:
+    workflow = _create_workflow(pipeline_func, profiler)
+    metrics['create_workflow_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+  metrics['fix_big_data_passing_peak_bytes'] = profiler.phases['fix_big_data_passing']['peak_traced_bytes']
+
+  gc.collect()
+  tracemalloc.start()
+  try:
+    Compiler._write_workflow(workflow, package_path)
+    metrics['write_workflow_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+  finally:
+    tracemalloc.stop()
+
+  metrics['templates'] = len(workflow['spec']['templates'])
+  return metrics
+
+
+def _get_git_revision():
+  try:
+    return subprocess.check_output(
+        ['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+        stderr=subprocess.DEVNULL).decode().strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def run_benchmarks(scenarios=None, sizes=None, repeats=3, package_suffix='.yaml', log=None):
+  """Runs the benchmarks.
+
+  Args:
+    scenarios: Names of the scenarios to run. Defaults to all SCENARIOS.
+    sizes: Pipeline sizes in ops. Defaults to DEFAULT_SIZES.
+    repeats: Number of the timed runs of each benchmark.
+    package_suffix: The package format used to measure _write_workflow.
+    log: Optional function which is called with a progress message.
+
+  Returns:
+    Dict with the environment metadata and the metrics keyed by "<scenario>/<size>".
+  """
+  results = OrderedDict()
+  tmpdir = tempfile.mkdtemp()
+  try:
+    for scenario in scenarios or SCENARIOS:
+      create_pipeline = SCENARIOS[scenario]
+      for size in sizes or DEFAULT_SIZES:
+        if scenario == 'big_python_components':
+          pipeline_func = create_pipeline(size, tmpdir)
+        else:
+          pipeline_func = create_pipeline(size)
+        key = '%s/%d' % (scenario, size)
+        results[key] = measure(pipeline_func, os.path.join(tmpdir, 'pipeline' + package_suffix), repeats)
+        if log:
+          log('%s: %s' % (key, json.dumps(results[key])))
+  finally:
+    shutil.rmtree(tmpdir)
+
+  return OrderedDict([
+      ('metadata', OrderedDict([
+          ('kfp_version', kfp.__version__),
+          ('git_revision', _get_git_revision()),
+          ('python_version', platform.python_version()),
+          ('platform', platform.platform()),
+          ('repeats', repeats),
+          ('package_suffix', package_suffix),
+      ])),
+      ('results', results),
+  ])
+
+
+def compare_results(baseline, current, max_ratio):
+  """Compares the metrics with the baseline.
+
+  Returns:
+    List of (key, metric, baseline value, current value, ratio) for the metrics which
+    grew more than max_ratio times.
+  """
+  regressions = []
+  for key, metrics in current['results'].items():
+    baseline_metrics = baseline['results'].get(key)
+    if not baseline_metrics:
+      continue
+    for metric, value in metrics.items():
+      if not (metric.endswith('_seconds') or metric.endswith('_bytes')):
+        continue
+      baseline_value = baseline_metrics.get(metric)
+      if not baseline_value:
+        continue
+      ratio = value / baseline_value
+      if ratio > max_ratio:
+        regressions.append((key, metric, baseline_value, value, ratio))
+  return regressions
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Runs the compiler benchmarks.')
+  parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), help='The scenarios to run. Defaults to all.')
+  parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES, help='The pipeline sizes in ops.')
+  parser.add_argument('--repeats', type=int, default=3, help='The number of timed runs of each benchmark.')
+  parser.add_argument('--package-suffix', default='.yaml', help='The package format used to measure writing the workflow.')
+  parser.add_argument('--output', help='Path of the JSON file to write the results to.')
+  parser.add_argument('--compare', help='Path of the baseline JSON results to compare with.')
+  parser.add_argument('--max-ratio', type=float, default=1.25,
+                      help='Fail when a metric is more than this many times bigger than the baseline.')
+  args = parser.parse_args()
+
+  results = run_benchmarks(args.scenarios, args.sizes, args.repeats, args.package_suffix,
+                           log=lambda message: print(message, file=sys.stderr))
+  results_json = json.dumps(results, indent=2)
+  if args.output:
+    with open(args.output, 'w') as f:
+      f.write(results_json)
+  else:
+    print(results_json)
+
+  if args.compare:
+    with open(args.compare) as f:
+      baseline = json.load(f)
+    regressions = compare_results(baseline, results, args.max_ratio)
+    for key, metric, baseline_value, value, ratio in regressions:
+      print('Regression in %s %s: %s -> %s (%.2fx)' % (key, metric, baseline_value, value, ratio), file=sys.stderr)
+    if regressions:
+      sys.exit(1)
+
+
+if __name__ == '__main__':
+  main()
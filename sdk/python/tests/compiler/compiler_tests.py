@@ -15,6 +15,7 @@
 import kfp
 import kfp.compiler as compiler
 import kfp.dsl as dsl
+import copy
 import json
 import os
 import shutil
@@ -25,6 +26,7 @@ import tarfile
 import tempfile
 import unittest
 import yaml
+from unittest import mock
 
 from kfp.dsl._component import component
 from kfp.dsl import ContainerOp, pipeline
@@ -41,6 +43,11 @@ def some_op():
   )
 
 
+def echo_op(name, *args):
+  return dsl.ContainerOp(name=name, image='busybox', command=['echo'] + list(args), file_outputs={'out': '/out'})
+
+
+
 class TestCompiler(unittest.TestCase):
   # Define the places of samples covered by unit tests.
   core_sample_path = os.path.join(os.path.dirname(__file__), '..', '..', '..',
@@ -795,3 +802,716 @@ implementation:
     template_names = set(template['name'] for template in workflow_dict['spec']['templates'])
     self.assertGreater(len(template_names), 1)
     self.assertEqual(template_names, {'some-name', 'some-name-2'})
+
+  def test_group_tree_index_uncommon_ancestors(self):
+    from kfp.compiler._group_tree import GroupTreeIndex
+
+    with dsl.Pipeline('some-pipeline') as p:
+      op1 = dsl.ContainerOp(name='flip', image='busybox', file_outputs={'result': '/tmp/result'})
+      with dsl.Condition(op1.output == 'a') as condition1:
+        with dsl.Condition(op1.output == 'b') as condition2:
+          op2 = some_op()
+        op3 = some_op()
+      with dsl.Condition(op1.output == 'c') as condition3:
+        op4 = some_op()
+
+    root_name = p.groups[0].name
+    index = GroupTreeIndex(p.groups[0])
+    self.assertEqual(index.op_groups[op2.name], [root_name, condition1.name, condition2.name, op2.name])
+    self.assertEqual(index.opsgroup_groups[condition2.name], [root_name, condition1.name, condition2.name])
+    self.assertEqual(index.uncommon_ancestors(op2.name, op3.name), ([condition2.name, op2.name], [op3.name]))
+    self.assertEqual(index.uncommon_ancestors(op1.name, op4.name), ([op1.name], [condition3.name, op4.name]))
+    self.assertEqual(index.first_uncommon_ancestors(op2.name, op4.name), (condition1.name, condition3.name))
+    self.assertEqual(index.uncommon_ancestors(condition1.name, op2.name), ([], [condition2.name, op2.name]))
+    with self.assertRaises(ValueError):
+      index.ancestors('non-existent')
+    self.assertEqual(set(index.groups), {root_name, condition1.name, condition2.name, condition3.name})
+    self.assertEqual([param.full_name for param in index.condition_params[op2.name]], [op1.output.full_name])
+    self.assertEqual(index.for_loop_ops, {})
+
+  def test_process_obj_replaces_serialized_pipelineparams(self):
+    from kfp.compiler._op_to_template import _process_obj
+
+    param1 = dsl.PipelineParam(name='param1', op_name='op1')
+    param2 = dsl.PipelineParam(name='param2')
+    map_to_tmpl_var = {
+      str(param1): '{{inputs.parameters.op1-param1}}',
+      str(param2): '{{inputs.parameters.param2}}',
+    }
+    processed = _process_obj({
+      'args': ['echo %s %s %s' % (param1, param2, param1), 'no params'],
+      'param': param2,
+    }, map_to_tmpl_var)
+    self.assertEqual(processed, {
+      'args': ['echo {{inputs.parameters.op1-param1}} {{inputs.parameters.param2}} {{inputs.parameters.op1-param1}}', 'no params'],
+      'param': '{{inputs.parameters.param2}}',
+    })
+
+  def test_compile_cache(self):
+    calls = []
+
+    def cached_pipeline(message: str = 'hello'):
+      calls.append(message)
+      dsl.ContainerOp(name='echo', image='busybox', command=['echo', message])
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+      cache = compiler.CompileCache(os.path.join(tmpdir, 'cache'))
+      package_path = os.path.join(tmpdir, 'workflow.yaml')
+      compiler.Compiler(cache=cache).compile(cached_pipeline, package_path)
+      with open(package_path) as f:
+        first_yaml = f.read()
+      os.remove(package_path)
+
+      compiler.Compiler(cache=cache).compile(cached_pipeline, package_path)
+      with open(package_path) as f:
+        self.assertEqual(f.read(), first_yaml)
+      self.assertEqual(compiler.Compiler(cache=cache)._create_workflow(cached_pipeline), yaml.safe_load(first_yaml))
+      self.assertEqual(len(calls), 1)
+
+      # The pipeline conf is part of the cache key.
+      compiler.Compiler(cache=cache).compile(cached_pipeline, package_path, pipeline_conf=dsl.PipelineConf().set_timeout(10))
+      self.assertEqual(len(calls), 2)
+
+      # The key is calculated once per compilation.
+      with mock.patch.object(cache, 'make_key', wraps=cache.make_key) as make_key_mock:
+        compiler.Compiler(cache=cache).compile(cached_pipeline, package_path, pipeline_conf=dsl.PipelineConf().set_timeout(20))
+      self.assertEqual(make_key_mock.call_count, 1)
+      self.assertEqual(len(calls), 3)
+
+      # The entries which are evicted by a concurrent compilation after they are read are cache misses.
+      with mock.patch('os.utime', side_effect=FileNotFoundError):
+        compiler.Compiler(cache=cache).compile(cached_pipeline, package_path)
+      self.assertEqual(len(calls), 4)
+
+      # The modules of the helper functions are part of the key.
+      module_dir = os.path.join(tmpdir, 'modules')
+      os.makedirs(module_dir)
+      with open(os.path.join(module_dir, 'kfp_test_cache_ops.py'), 'w') as f:
+        f.write('import kfp_test_cache_utils\ndef make_op(message):\n  return kfp_test_cache_utils.make_echo_op(message)\n')
+      utils_path = os.path.join(module_dir, 'kfp_test_cache_utils.py')
+      with open(utils_path, 'w') as f:
+        f.write('import kfp.dsl as dsl\ndef make_echo_op(message):\n  return dsl.ContainerOp(name="echo", image="busybox", command=["echo", message])\n')
+      sys.path.insert(0, module_dir)
+      try:
+        import kfp_test_cache_ops
+        def helper_pipeline(message: str = 'hello'):
+          kfp_test_cache_ops.make_op(message)
+        key = cache.make_key(helper_pipeline)
+        self.assertEqual(cache.make_key(helper_pipeline), key)
+        with open(utils_path, 'a') as f:
+          f.write('# changed\n')
+        self.assertNotEqual(cache.make_key(helper_pipeline), key)
+      finally:
+        sys.path.remove(module_dir)
+        sys.modules.pop('kfp_test_cache_ops', None)
+        sys.modules.pop('kfp_test_cache_utils', None)
+
+      cache.max_size_bytes = 0
+      cache.evict()
+      self.assertEqual(os.listdir(cache.cache_dir), [])
+    finally:
+      shutil.rmtree(tmpdir)
+
+  def test_write_workflow_formats(self):
+    workflow = {
+      'kind': 'Workflow',
+      'spec': {'templates': [{'name': 'echo', 'container': {'args': ['line 1\nline 2']}}]},
+    }
+    tmpdir = tempfile.mkdtemp()
+    try:
+      for file_name in ['pipeline.yaml', 'pipeline.json']:
+        package_path = os.path.join(tmpdir, file_name)
+        compiler.Compiler._write_workflow(workflow, package_path)
+        with open(package_path) as f:
+          self.assertEqual(yaml.safe_load(f), workflow)
+
+      package_path = os.path.join(tmpdir, 'pipeline.tar.gz')
+      compiler.Compiler._write_workflow(workflow, package_path)
+      with tarfile.open(package_path) as tar:
+        self.assertEqual(yaml.safe_load(tar.extractfile('pipeline.yaml')), workflow)
+
+      package_path = os.path.join(tmpdir, 'pipeline.zip')
+      compiler.Compiler._write_workflow(workflow, package_path)
+      with zipfile.ZipFile(package_path) as zip:
+        self.assertEqual(yaml.safe_load(zip.read('pipeline.yaml')), workflow)
+
+      self.assertEqual(yaml.safe_load(compiler.Compiler._write_workflow(workflow)), workflow)
+    finally:
+      shutil.rmtree(tmpdir)
+
+  def test_write_workflow_with_unresolved_pipelineparam(self):
+    workflow = {'spec': {'templates': [{'name': 'echo {{pipelineparam:op=;name=msg}}'}]}}
+    tmpdir = tempfile.mkdtemp()
+    try:
+      for file_name in ['pipeline.yaml', 'pipeline.json', 'pipeline.zip']:
+        package_path = os.path.join(tmpdir, file_name)
+        with self.assertRaises(RuntimeError):
+          compiler.Compiler._write_workflow(workflow, package_path)
+        self.assertFalse(os.path.exists(package_path))
+    finally:
+      shutil.rmtree(tmpdir)
+
+  def test_fix_big_data_passing_in_place(self):
+    from kfp.compiler._data_passing_rewriter import fix_big_data_passing, extract_all_placeholders
+
+    def consumer_pipeline():
+      producer = dsl.ContainerOp(name='producer', image='busybox', file_outputs={'data': '/tmp/data'})
+      dsl.ContainerOp(name='consumer', image='busybox', artifact_argument_paths=[dsl.InputArgumentPath(producer.output)])
+      dsl.ContainerOp(name='printer', image='busybox', command=['echo', producer.output])
+
+    with dsl.Pipeline('consumer-pipeline') as p:
+      consumer_pipeline()
+    workflow = compiler.Compiler()._create_pipeline_workflow([], p, pipeline_conf=dsl.PipelineConf())
+    original_workflow = copy.deepcopy(workflow)
+    fixed_workflow = fix_big_data_passing(workflow)
+    self.assertEqual(workflow, original_workflow)
+    self.assertIs(fix_big_data_passing(workflow, in_place=True), workflow)
+    self.assertEqual(workflow, fixed_workflow)
+    self.assertEqual(
+      extract_all_placeholders({'{{inputs.parameters.a}}': ['x {{item.b}} {{pod.name}}', 1, None]}),
+      {'inputs.parameters.a', 'item.b', 'pod.name'})
+
+  def test_dump_workflow_yaml_streaming_folds_long_strings(self):
+    import io
+    from kfp.compiler._workflow_serializer import dump_workflow_yaml, dump_workflow_yaml_streaming
+
+    # The long strings with trailing spaces and tabs are emitted as the folded double-quoted scalars.
+    words = ' '.join('word%d' % i for i in range(60))
+    templates = [
+        {'name': 'echo', 'container': {'image': 'busybox', 'args': [words + ' ', 'x\t' + words, {'nested': [words + ' ']}]}},
+        {'name': 'echo-2', 'container': {'image': 'busybox', 'args': ['line 1\n' + words + ' \n']}},
+    ]
+    workflow = {'kind': 'Workflow', 'spec': {'entrypoint': 'echo', 'templates': templates}}
+    stream = io.StringIO()
+    dump_workflow_yaml_streaming(workflow, templates, stream)
+    self.assertEqual(stream.getvalue(), dump_workflow_yaml(workflow))
+
+  def test_streaming_compile(self):
+    def streaming_pipeline(message: str = 'hello'):
+      producer = dsl.ContainerOp(name='producer', image='busybox', command=['echo', message], file_outputs={'data': '/tmp/data'})
+      dsl.ContainerOp(name='consumer', image='busybox', artifact_argument_paths=[dsl.InputArgumentPath(producer.output)])
+      with dsl.Condition(producer.output == 'a'):
+        with dsl.ParallelFor([{'a': 1}, {'a': 2}]) as item:
+          dsl.ContainerOp(name='printer', image='busybox', command=['echo', producer.output, item.a])
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+      for file_name in ['pipeline.yaml', 'pipeline.json', 'pipeline.tar.gz']:
+        packages = []
+        for streaming in [False, True]:
+          package_path = os.path.join(tmpdir, str(streaming) + file_name)
+          with mock.patch.object(dsl.ParallelFor, '_get_unique_id_code', return_value='00000001'):
+            compiler.Compiler(streaming=streaming).compile(streaming_pipeline, package_path)
+          if file_name.endswith('.tar.gz'):
+            with tarfile.open(package_path) as tar:
+              packages.append(tar.extractfile('pipeline.yaml').read().decode())
+          else:
+            with open(package_path) as f:
+              packages.append(f.read())
+        self.assertEqual(packages[0], packages[1])
+
+      with self.assertRaises(ValueError):
+        compiler.Compiler(streaming=True).compile(
+            streaming_pipeline, os.path.join(tmpdir, 'pipeline.yaml'),
+            pipeline_conf=dsl.PipelineConf().set_deduplicate_templates())
+    finally:
+      shutil.rmtree(tmpdir)
+
+  def test_workflow_templates(self):
+    from kfp.components import load_component_from_text
+    echo_op = load_component_from_text('''
+name: Echo
+inputs:
+- {name: message}
+outputs:
+- {name: out}
+implementation:
+  container:
+    image: busybox
+    command: [sh, -c, 'echo "$0" > "$1"', {inputValue: message}, {outputPath: out}]
+''')
+
+    def first_pipeline(message: str = 'hello'):
+      producer = echo_op(message)
+      with dsl.Condition(producer.outputs['out'] == 'a'):
+        echo_op(producer.outputs['out'])
+
+    def second_pipeline(text: str = 'hi'):
+      echo_op(echo_op(text).output)
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+      workflow_templates_dir = os.path.join(tmpdir, 'workflow-templates')
+      workflows = []
+      for pipeline_func in [first_pipeline, second_pipeline]:
+        package_path = os.path.join(tmpdir, pipeline_func.__name__ + '.yaml')
+        compiler.Compiler(workflow_templates_dir=workflow_templates_dir).compile(pipeline_func, package_path)
+        with open(package_path) as f:
+          workflows.append(yaml.safe_load(f))
+
+      # The consumer templates differ from the producer templates since their output is not used.
+      workflow_template_names = sorted(os.listdir(workflow_templates_dir))
+      self.assertEqual(len(workflow_template_names), 2)
+      for file_name in workflow_template_names:
+        with open(os.path.join(workflow_templates_dir, file_name)) as f:
+          workflow_template = yaml.safe_load(f)
+        self.assertEqual(workflow_template['kind'], 'WorkflowTemplate')
+        self.assertEqual(workflow_template['metadata']['name'] + '.yaml', file_name)
+        self.assertTrue(file_name.startswith('echo-'))
+        [template] = workflow_template['spec']['templates']
+        self.assertEqual(template['inputs']['parameters'], [{'name': 'input-0'}])
+        self.assertEqual(template['container']['command'][3], '{{inputs.parameters.input-0}}')
+
+      # Only the DAG templates are left in the workflows and the same components are shared.
+      first_templates = {template['name']: template for template in workflows[0]['spec']['templates']}
+      self.assertEqual(set(first_templates), {'first-pipeline', 'condition-1'})
+      first_tasks = {task['name']: task for task in first_templates['first-pipeline']['dag']['tasks']}
+      self.assertEqual(first_tasks['echo']['arguments']['parameters'], [{'name': 'input-0', 'value': '{{inputs.parameters.message}}'}])
+      self.assertEqual(first_tasks['condition-1']['when'], '"{{tasks.echo.outputs.parameters.out}}" == "a"')
+      second_tasks = {task['name']: task for task in workflows[1]['spec']['templates'][0]['dag']['tasks']}
+      self.assertEqual(second_tasks['echo-2']['arguments']['parameters'], [{'name': 'input-0', 'value': '{{tasks.echo.outputs.parameters.out}}'}])
+      self.assertEqual(first_tasks['echo']['templateRef'], second_tasks['echo']['templateRef'])
+      self.assertNotIn('template', second_tasks['echo'])
+      self.assertIn(second_tasks['echo-2']['templateRef']['name'] + '.yaml', workflow_template_names)
+
+      with self.assertRaises(ValueError):
+        compiler.Compiler(streaming=True, workflow_templates_dir=workflow_templates_dir).compile(
+            first_pipeline, os.path.join(tmpdir, 'pipeline.yaml'))
+    finally:
+      shutil.rmtree(tmpdir)
+
+  def test_analyze_workflow(self):
+    def analyzed_pipeline(message: str = 'hello'):
+      with dsl.ExitHandler(echo_op('cleanup', message)):
+        first = echo_op('first', message).set_cpu_request('500m').set_memory_request('1Gi')
+        second = echo_op('second', first.output)
+        with dsl.ParallelFor([1, 2, 3]) as item:
+          train = echo_op('train', item, second.output).set_cpu_request('2').set_memory_request('512Mi')
+          echo_op('evaluate', train.output)
+        with dsl.ParallelFor(first.output) as dynamic_item:
+          echo_op('dynamic', dynamic_item)
+        echo_op('side', message).set_memory_request(message)
+
+    with mock.patch.object(dsl.ParallelFor, '_get_unique_id_code', return_value='00000001'):
+      workflow = compiler.Compiler()._create_workflow(analyzed_pipeline)
+    analysis = compiler.analyze_workflow(workflow)
+    self.assertEqual(analysis.critical_path_length, 5)
+    self.assertEqual(analysis.critical_path, [
+        'exit-handler-1/first',
+        'exit-handler-1/second',
+        'exit-handler-1/for-loop-for-loop-00000001-2/train',
+        'exit-handler-1/for-loop-for-loop-00000001-2/evaluate',
+        'cleanup',
+    ])
+    # first + side, second + dynamic, 3 x train, 3 x evaluate, cleanup
+    self.assertEqual(analysis.level_widths, [2, 2, 3, 3, 1])
+    self.assertEqual(analysis.peak_pods, 3)
+    self.assertEqual(analysis.peak_cpu, 6.0)
+    self.assertEqual(analysis.peak_memory_bytes, 3 * 512 * 2 ** 20)
+    self.assertEqual(analysis.total_pods, 11)
+    self.assertEqual(analysis.unknown_loop_sizes, 1)
+    self.assertEqual(analysis.unknown_resource_requests, 1)
+    self.assertEqual(json.loads(analysis.to_json())['peak_pods'], 3)
+
+    test_data_dir = os.path.join(os.path.dirname(__file__), 'testdata')
+    tmpdir = tempfile.mkdtemp()
+    try:
+      package_path = os.path.join(tmpdir, 'recursive.tar.gz')
+      output = subprocess.check_output([
+          'dsl-compile', '--py', os.path.join(test_data_dir, 'recursive_do_while.py'), '--output', package_path,
+          '--analyze'])
+      analysis = json.loads(output.decode())
+      self.assertGreater(analysis['critical_path_length'], 1)
+      self.assertEqual(analysis['recursive_tasks'], 1)
+    finally:
+      shutil.rmtree(tmpdir)
+
+  def test_parallelism(self):
+    def parallel_pipeline(message: str = 'hello'):
+      producer = echo_op('producer', message)
+      with dsl.ParallelFor(list(range(5)), parallelism=2) as item:
+        echo_op('consumer', item, message).after(producer)
+      dsl.get_pipeline_conf().set_parallelism(10)
+
+    with mock.patch.object(dsl.ParallelFor, '_get_unique_id_code', return_value='00000001'):
+      workflow = compiler.Compiler()._create_workflow(parallel_pipeline)
+    self.assertEqual(workflow['spec']['parallelism'], 10)
+    templates = {template['name']: template for template in workflow['spec']['templates']}
+
+    # The loop task is moved to a wrapper template which limits the concurrent iterations.
+    root_tasks = {task['name']: task for task in templates['parallel-pipeline']['dag']['tasks']}
+    self.assertEqual(root_tasks['for-loop-for-loop-00000001-1'], {
+        'name': 'for-loop-for-loop-00000001-1',
+        'template': 'for-loop-for-loop-00000001-1-parallelism',
+        'dependencies': ['producer'],
+        'arguments': {'parameters': [{'name': 'message', 'value': '{{inputs.parameters.message}}'}]},
+    })
+    wrapper_template = templates['for-loop-for-loop-00000001-1-parallelism']
+    self.assertEqual(wrapper_template['parallelism'], 2)
+    self.assertEqual(wrapper_template['inputs'], {'parameters': [{'name': 'message'}]})
+    [loop_task] = wrapper_template['dag']['tasks']
+    self.assertEqual(loop_task['template'], 'for-loop-for-loop-00000001-1')
+    self.assertEqual(loop_task['withItems'], [0, 1, 2, 3, 4])
+    self.assertNotIn('dependencies', loop_task)
+    self.assertEqual(loop_task['arguments']['parameters'], [
+        {'name': 'loop-item-param-00000001', 'value': '{{item}}'},
+        {'name': 'message', 'value': '{{inputs.parameters.message}}'},
+    ])
+
+    # 5 iterations in the waves of 2, 2 and 1
+    analysis = compiler.analyze_workflow(workflow)
+    self.assertEqual(analysis.level_widths, [1, 2, 2, 1])
+
+    with self.assertRaises(ValueError):
+      dsl.ParallelFor([1, 2], parallelism=0)
+    with self.assertRaises(ValueError):
+      dsl.PipelineConf().set_parallelism(0)
+
+  def test_parallel_for_batching(self):
+    def batched_pipeline():
+      producer = echo_op('producer')
+      with dsl.ParallelFor([{'a': 1}, {'a': 2}, {'a': 3}], batch_size=2) as batch:
+        echo_op('static-consumer', batch)
+      with dsl.ParallelFor(producer.output, batch_size=10) as batch:
+        echo_op('dynamic-consumer', batch)
+
+    with mock.patch.object(dsl.ParallelFor, '_get_unique_id_code', return_value='00000001'):
+      workflow = compiler.Compiler()._create_workflow(batched_pipeline)
+    templates = {template['name']: template for template in workflow['spec']['templates']}
+    root_tasks = {task['name']: task for task in templates['batched-pipeline']['dag']['tasks']}
+
+    # The static items are split at the compile time.
+    self.assertEqual(root_tasks['for-loop-for-loop-00000001-1']['withItems'], ['[{"a": 1}, {"a": 2}]', '[{"a": 3}]'])
+
+    # The pipeline parameter items are split by an additional step.
+    splitter_task = root_tasks['split-into-batches']
+    self.assertEqual(splitter_task['dependencies'], ['producer'])
+    loop_task = root_tasks['for-loop-for-loop-00000001-2']
+    self.assertEqual(loop_task['dependencies'], ['split-into-batches'])
+    self.assertEqual(loop_task['withParam'], '{{tasks.split-into-batches.outputs.parameters.split-into-batches-batches}}')
+    splitter_command = templates['split-into-batches']['container']['command']
+    self.assertEqual(splitter_command[3:], ['{{inputs.parameters.producer-out}}', '10', '/tmp/outputs/batches'])
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+      output_path = os.path.join(tmpdir, 'outputs', 'batches')
+      subprocess.check_call([sys.executable, '-c', splitter_command[2], json.dumps(list(range(5))), '2', output_path])
+      with open(output_path) as f:
+        self.assertEqual(json.load(f), ['[0, 1]', '[2, 3]', '[4]'])
+    finally:
+      shutil.rmtree(tmpdir)
+
+    # The batches can only be passed to the list inputs of the components.
+    from kfp.components import load_component_from_text
+    def make_component(input_type):
+      return load_component_from_text('''
+name: Process
+inputs:
+- {name: items, type: %s}
+implementation:
+  container:
+    image: busybox
+    command: [echo, {inputValue: items}]
+''' % input_type)
+
+    def typed_pipeline():
+      with dsl.ParallelFor([1, 2, 3], batch_size=2) as batch:
+        make_component('JsonArray')(batch)
+    compiler.Compiler()._create_workflow(typed_pipeline)
+
+    def mistyped_pipeline():
+      with dsl.ParallelFor([1, 2, 3], batch_size=2) as batch:
+        make_component('Integer')(batch)
+    with self.assertRaisesRegex(InconsistentTypeException, 'batched ParallelFor loop'):
+      compiler.Compiler()._create_workflow(mistyped_pipeline)
+
+    with self.assertRaises(ValueError):
+      dsl.ParallelFor([1, 2], batch_size=0)
+    with self.assertRaises(AttributeError):
+      dsl.ParallelFor([{'a': 1}], batch_size=1).loop_args.a
+
+  def test_step_caching(self):
+    def cached_pipeline(message: str = 'hello'):
+      producer = echo_op('producer', message)
+      echo_op('consumer', producer.output).set_caching_options(max_age=3600)
+      echo_op('uncached', 'constant').set_caching_options(enabled=False)
+      dsl.get_pipeline_conf().set_caching(max_age='12h')
+
+    workflow = compiler.Compiler()._create_workflow(cached_pipeline)
+    templates = {template['name']: template for template in workflow['spec']['templates']}
+    self.assertNotIn('memoize', templates['uncached'])
+    self.assertNotIn('memoize', templates['cached-pipeline'])
+    self.assertEqual(templates['producer']['memoize']['maxAge'], '12h')
+    self.assertEqual(templates['consumer']['memoize']['maxAge'], '3600s')
+    self.assertEqual(templates['consumer']['memoize']['cache'], {'configMap': {'name': 'kfp-step-cache'}})
+    producer_key = templates['producer']['memoize']['key']
+    self.assertRegex(producer_key, r"^[0-9a-f]{64}\.{{inputs\.parameters\.message}}$")
+
+    # The key only changes when the container spec changes.
+    def retried_pipeline(message: str = 'hello'):
+      producer = echo_op('producer', message).set_caching_options().set_retry(2).set_display_name('Producer')
+      echo_op('consumer', producer.output)
+
+    def changed_pipeline(message: str = 'hello'):
+      producer = echo_op('producer', message, '-n').set_caching_options()
+      echo_op('consumer', producer.output)
+
+    def get_producer_key(pipeline_func):
+      workflow = compiler.Compiler()._create_workflow(pipeline_func)
+      [template] = [template for template in workflow['spec']['templates'] if template['name'] == 'producer']
+      return template['memoize']['key']
+
+    self.assertEqual(get_producer_key(retried_pipeline), producer_key)
+    self.assertNotEqual(get_producer_key(changed_pipeline), producer_key)
+
+    # The streaming mode produces the same keys.
+    tmpdir = tempfile.mkdtemp()
+    try:
+      package_path = os.path.join(tmpdir, 'workflow.yaml')
+      compiler.Compiler(streaming=True).compile(cached_pipeline, package_path)
+      with open(package_path) as f:
+        streamed_workflow = yaml.safe_load(f)
+      streamed_templates = {template['name']: template for template in streamed_workflow['spec']['templates']}
+      self.assertEqual(streamed_templates['producer']['memoize'], templates['producer']['memoize'])
+    finally:
+      shutil.rmtree(tmpdir)
+
+    # The steps with input artifacts are not cached, and the user is warned.
+    from kfp.components import load_component_from_text
+    count_op = load_component_from_text('''
+name: Count
+inputs:
+- {name: data}
+implementation:
+  container:
+    image: busybox
+    command: [wc, -l, {inputPath: data}]
+''')
+
+    def artifact_pipeline(message: str = 'hello'):
+      count_op(echo_op('producer', message).output)
+      dsl.get_pipeline_conf().set_caching()
+
+    with self.assertWarnsRegex(UserWarning, 'The outputs of the step "count" will not be cached'):
+      workflow = compiler.Compiler()._create_workflow(artifact_pipeline)
+    templates = {template['name']: template for template in workflow['spec']['templates']}
+    self.assertIn('memoize', templates['producer'])
+    self.assertNotIn('memoize', templates['count'])
+
+    with self.assertRaises(ValueError):
+      dsl.PipelineConf().set_caching(max_age=-1)
+
+  def test_scheduling_options(self):
+    def scheduled_pipeline():
+      echo_op('preprocess').set_priority_class('high-priority').set_scheduler_name('bin-packing').container.set_cpu_request('2')
+      with dsl.ParallelFor([1, 2, 3], spread_iterations=True) as item:
+        echo_op('train', item)
+      dsl.get_pipeline_conf().set_default_resources(cpu_request='100m', memory_request='64Mi')
+
+    with mock.patch.object(dsl.ParallelFor, '_get_unique_id_code', return_value='00000001'):
+      workflow = compiler.Compiler()._create_workflow(scheduled_pipeline)
+    templates = {template['name']: template for template in workflow['spec']['templates']}
+
+    preprocess_template = templates['preprocess']
+    self.assertEqual(preprocess_template['priorityClassName'], 'high-priority')
+    self.assertEqual(preprocess_template['schedulerName'], 'bin-packing')
+    # The defaults do not override the op resources.
+    self.assertEqual(preprocess_template['container']['resources'], {'requests': {'cpu': '2', 'memory': '64Mi'}})
+
+    train_template = templates['train']
+    self.assertNotIn('priorityClassName', train_template)
+    self.assertEqual(train_template['container']['resources'], {'requests': {'cpu': '100m', 'memory': '64Mi'}})
+    self.assertEqual(train_template['metadata']['labels'], {'pipelines.kubeflow.org/spread-group': 'for-loop-for-loop-00000001-1'})
+    self.assertEqual(train_template['affinity'], {
+        'podAntiAffinity': {
+            'preferredDuringSchedulingIgnoredDuringExecution': [{
+                'weight': 100,
+                'podAffinityTerm': {
+                    'labelSelector': {'matchLabels': {
+                        'pipelines.kubeflow.org/spread-group': 'for-loop-for-loop-00000001-1',
+                        'workflows.argoproj.io/workflow': '{{workflow.name}}',
+                    }},
+                    'topologyKey': 'kubernetes.io/hostname',
+                },
+            }],
+        },
+    })
+
+  def test_default_resources_do_not_conflict_with_op_resources(self):
+    def resources_pipeline():
+      dsl.ContainerOp(name='big-request', image='busybox').container.set_memory_request('4Gi').set_cpu_request('500m')
+      dsl.ContainerOp(name='small-limit', image='busybox').container.set_cpu_limit('250m').set_memory_limit('128Mi')
+      dsl.get_pipeline_conf().set_default_resources(cpu_request='1', memory_request='256Mi', cpu_limit='2', memory_limit='1Gi')
+
+    workflow = compiler.Compiler()._create_workflow(resources_pipeline)
+    templates = {template['name']: template for template in workflow['spec']['templates']}
+    # The default memory limit is lower than the memory request, so it's skipped. The default CPU limit is still applied.
+    self.assertEqual(templates['big-request']['container']['resources'], {
+        'requests': {'cpu': '500m', 'memory': '4Gi'},
+        'limits': {'cpu': '2'},
+    })
+    # The default requests are higher than the limits, so they are skipped.
+    self.assertEqual(templates['small-limit']['container']['resources'], {
+        'limits': {'cpu': '250m', 'memory': '128Mi'},
+    })
+
+  def test_compile_batch(self):
+    from kfp.compiler.main import compile_batch
+
+    test_data_dir = os.path.join(os.path.dirname(__file__), 'testdata')
+    tmpdir = tempfile.mkdtemp()
+    try:
+      results = compile_batch(
+          [os.path.join(test_data_dir, 'basic.py'), os.path.join(test_data_dir, 'with*_global.py:pipeline')],
+          tmpdir, type_check=True, workers=2)
+      self.assertEqual(
+          [(os.path.basename(result.pyfile), result.function_name, result.error) for result in results],
+          [('basic.py', 'save_most_frequent_word', None), ('withparam_global.py', 'pipeline', None)])
+      for result in results:
+        self.assertTrue(os.path.isfile(result.output_path))
+      self.assertEqual(os.path.basename(results[0].output_path), 'basic_save_most_frequent_word.yaml')
+
+      results = compile_batch([os.path.join(test_data_dir, 'basic.py:missing')], tmpdir, type_check=True, workers=1)
+      self.assertIn('does not exist', results[0].error)
+
+      # The files with the same name in different directories get different package names.
+      for team in ['team_a', 'team_b']:
+        os.makedirs(os.path.join(tmpdir, 'src', team))
+        shutil.copy(os.path.join(test_data_dir, 'basic.py'), os.path.join(tmpdir, 'src', team, 'basic.py'))
+      output_dir = os.path.join(tmpdir, 'out')
+      results = compile_batch([os.path.join(tmpdir, 'src', '*', 'basic.py')], output_dir, type_check=True, workers=2)
+      self.assertEqual([result.error for result in results], [None, None])
+      self.assertEqual(sorted(os.listdir(output_dir)), [
+          'team_a_basic_save_most_frequent_word.yaml', 'team_b_basic_save_most_frequent_word.yaml'])
+    finally:
+      shutil.rmtree(tmpdir)
+
+  def test_pipelineparam_split_cache_is_cleared_after_compilation(self):
+    from kfp.compiler._op_to_template import _split_serialized_pipelineparams
+
+    def echo_pipeline(message: str = 'hello'):
+      echo_op('echo', message)
+
+    workflow = compiler.Compiler()._create_workflow(echo_pipeline)
+    self.assertEqual(workflow['spec']['templates'][0]['container']['command'], ['echo', '{{inputs.parameters.message}}'])
+    self.assertEqual(_split_serialized_pipelineparams.cache_info().currsize, 0)
+
+  def test_compile_profiler(self):
+    def profiled_pipeline(message: str = 'hello'):
+      op1 = dsl.ContainerOp(name='echo', image='busybox', command=['echo', message], file_outputs={'out': '/out'})
+      with dsl.Condition(message == 'a'):
+        dsl.ContainerOp(name='echo2', image='busybox', command=['echo', op1.output])
+
+    ended_phases = []
+    tmpdir = tempfile.mkdtemp()
+    try:
+      with compiler.CompileProfiler(on_phase_end=lambda name, stats: ended_phases.append(name)) as profiler:
+        compiler.Compiler(profiler=profiler).compile(profiled_pipeline, os.path.join(tmpdir, 'pipeline.yaml'))
+    finally:
+      shutil.rmtree(tmpdir)
+
+    profile = json.loads(profiler.to_json())
+    phases = {phase['name']: phase for phase in profile['phases']}
+    self.assertEqual(set(phases), {
+        'dsl_function', 'sanitize_and_inject_artifact', 'create_dag_templates',
+        'op_to_template', 'fix_big_data_passing', 'write_workflow'})
+    self.assertEqual(ended_phases.count('op_to_template'), 2)
+    self.assertEqual(phases['op_to_template']['calls'], 2)
+    self.assertEqual(phases['dsl_function']['counts'], {'ops': 2, 'params': 1})
+    self.assertEqual(phases['create_dag_templates']['counts']['groups'], 2)
+    self.assertEqual(phases['create_dag_templates']['counts']['templates'], 4)
+    for phase in profile['phases']:
+      self.assertGreaterEqual(phase['wall_time_seconds'], 0)
+      self.assertIn('peak_traced_bytes', phase)
+
+  def test_benchmarks(self):
+    sys.path.insert(0, os.path.dirname(__file__))
+    try:
+      import benchmarks
+    finally:
+      del sys.path[0]
+
+    results = benchmarks.run_benchmarks(sizes=[10], repeats=1)
+    self.assertEqual(list(results['results']), ['%s/10' % scenario for scenario in benchmarks.SCENARIOS])
+    for metrics in results['results'].values():
+      self.assertGreater(metrics['create_workflow_seconds'], 0)
+      self.assertGreater(metrics['write_workflow_peak_bytes'], 0)
+      self.assertGreater(metrics['templates'], 1)
+    self.assertEqual(benchmarks.compare_results(results, results, max_ratio=1.0), [])
+
+    slower_results = copy.deepcopy(results)
+    slower_results['results']['chain/10']['write_workflow_seconds'] *= 2
+    self.assertEqual(
+        [(key, metric) for key, metric, _, _, _ in benchmarks.compare_results(results, slower_results, max_ratio=1.5)],
+        [('chain/10', 'write_workflow_seconds')])
+
+  def test_deduplicate_templates(self):
+    def sh_echo_op(name, message):
+      return dsl.ContainerOp(
+          name=name,
+          image='busybox',
+          command=['sh', '-c', 'echo "$0" "$1" > /tmp/out', message, name],
+          file_outputs={'out': '/tmp/out'},
+      )
+
+    def fan_out_pipeline(message: str = 'hello'):
+      producer = sh_echo_op('producer', message)
+      consumers = [sh_echo_op('consumer-%d' % i, producer.output) for i in range(3)]
+      sh_echo_op('summary', consumers[2].output)
+      dsl.get_pipeline_conf().set_deduplicate_templates()
+
+    workflow = compiler.Compiler()._create_workflow(fan_out_pipeline)
+    templates = {template['name']: template for template in workflow['spec']['templates']}
+    # The producer only differs by its input name and the argument values, so it's merged too.
+    self.assertEqual(set(templates), {'fan-out-pipeline', 'consumer-0'})
+
+    shared_template = templates['consumer-0']
+    self.assertEqual(
+        shared_template['container']['command'],
+        ['sh', '-c', 'echo "$0" "$1" > /tmp/out', '{{inputs.parameters.producer-out}}', '{{inputs.parameters.consumer-0-value}}'])
+
+    tasks = {task['name']: task for task in templates['fan-out-pipeline']['dag']['tasks']}
+    self.assertEqual(tasks['producer']['template'], 'consumer-0')
+    self.assertEqual(tasks['producer']['arguments']['parameters'], [
+        {'name': 'consumer-0-value', 'value': 'producer'},
+        {'name': 'producer-out', 'value': '{{inputs.parameters.message}}'},
+    ])
+    self.assertEqual(tasks['consumer-2']['template'], 'consumer-0')
+    self.assertEqual(tasks['consumer-2']['arguments']['parameters'], [
+        {'name': 'consumer-0-value', 'value': 'consumer-2'},
+        {'name': 'producer-out', 'value': '{{tasks.producer.outputs.parameters.consumer-0-out}}'},
+    ])
+    self.assertEqual(tasks['summary']['template'], 'consumer-0')
+    self.assertEqual(tasks['summary']['arguments']['parameters'], [
+        {'name': 'consumer-0-value', 'value': 'summary'},
+        {'name': 'producer-out', 'value': '{{tasks.consumer-2.outputs.parameters.consumer-0-out}}'},
+    ])
+    # The shared output parameter is still needed by the summary task.
+    self.assertEqual([output['name'] for output in shared_template['outputs']['parameters']], ['consumer-0-out'])
+
+    # Without the option every op gets its own template
+    workflow = compiler.Compiler()._create_workflow(fan_out_pipeline, pipeline_conf=dsl.PipelineConf())
+    self.assertEqual(len(workflow['spec']['templates']), 6)
+
+  def test_deduplicate_templates_does_not_hoist_resources(self):
+    def sized_op(name, memory, cpu):
+      op = dsl.ContainerOp(name=name, image='busybox', command=['echo', name])
+      op.container.set_memory_request(memory).set_memory_limit(memory).set_cpu_request(cpu).set_cpu_limit(cpu)
+      return op
+
+    def resources_pipeline():
+      sized_op('small', '1Gi', '1')
+      sized_op('large', '4Gi', '1')
+      sized_op('wide', '1Gi', '2')
+      sized_op('small-2', '1Gi', '1')
+      dsl.get_pipeline_conf().set_deduplicate_templates()
+
+    workflow = compiler.Compiler()._create_workflow(resources_pipeline)
+    templates = {template['name']: template for template in workflow['spec']['templates']}
+    # Only the ops with the same resources are merged. The resource quantities are never replaced with placeholders.
+    self.assertEqual(set(templates), {'resources-pipeline', 'small', 'large', 'wide'})
+    self.assertEqual(templates['large']['container']['resources'], {'requests': {'memory': '4Gi', 'cpu': '1'}, 'limits': {'memory': '4Gi', 'cpu': '1'}})
+    self.assertEqual(templates['wide']['container']['resources'], {'requests': {'memory': '1Gi', 'cpu': '2'}, 'limits': {'memory': '1Gi', 'cpu': '2'}})
+    self.assertEqual(templates['small']['container']['resources'], {'requests': {'memory': '1Gi', 'cpu': '1'}, 'limits': {'memory': '1Gi', 'cpu': '1'}})
+    self.assertEqual(templates['small']['container']['command'], ['echo', '{{inputs.parameters.small-value}}'])
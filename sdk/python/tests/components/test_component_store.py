@@ -0,0 +1,153 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import requests
+
+from kfp.components import ComponentCache, ComponentStore
+from kfp.components._structures import ComponentReference
+
+
+_COMPONENT_TEXT = b'''\
+name: Echo
+inputs:
+- {name: message}
+implementation:
+  container:
+    image: busybox
+    command: [echo, {inputValue: message}]
+'''
+
+_URL_PREFIX = 'https://example.com/components/'
+
+
+def _make_response(content):
+    response = mock.Mock()
+    response.content = content
+    response.raise_for_status.return_value = None
+    return response
+
+
+class ComponentStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def _make_store(self, **kwargs):
+        return ComponentStore(local_search_paths=[], url_search_prefixes=[_URL_PREFIX], **kwargs)
+
+    def test_load_component_reuses_loaded_spec(self):
+        store = self._make_store()
+        with mock.patch.object(requests.Session, 'get', return_value=_make_response(_COMPONENT_TEXT)) as get_mock:
+            task_factory1 = store.load_component('echo', digest='abc')
+            task_factory2 = store.load_component('echo', digest='abc')
+        get_mock.assert_called_once_with(_URL_PREFIX + 'echo/versions/sha256/abc')
+        self.assertEqual(task_factory1.component_spec.name, 'Echo')
+        self.assertIs(task_factory1.component_spec, task_factory2.component_spec)
+
+    def test_mutable_components_expire(self):
+        store = self._make_store(mutable_ttl_seconds=0)
+        with mock.patch.object(requests.Session, 'get', return_value=_make_response(_COMPONENT_TEXT)) as get_mock:
+            store.load_component('echo', tag='v1')
+            with mock.patch('time.time', return_value=10 ** 10):
+                store.load_component('echo', tag='v1')
+        self.assertEqual(get_mock.call_count, 2)
+
+    def test_disk_cache_is_shared_between_stores(self):
+        cache = ComponentCache(self.cache_dir)
+        with mock.patch.object(requests.Session, 'get', return_value=_make_response(_COMPONENT_TEXT)) as get_mock:
+            self._make_store(cache=cache).load_component('echo', digest='abc')
+            task_factory = self._make_store(cache=ComponentCache(self.cache_dir)).load_component('echo', digest='abc')
+        get_mock.assert_called_once()
+        self.assertEqual(task_factory.component_spec.name, 'Echo')
+
+        # The mutable entries are not used after they expire.
+        self.assertIsNotNone(cache.get(_URL_PREFIX + 'echo/versions/sha256/abc', max_age_seconds=60))
+        with mock.patch('time.time', return_value=10 ** 10):
+            self.assertIsNone(cache.get(_URL_PREFIX + 'echo/versions/sha256/abc', max_age_seconds=60))
+
+    def test_disk_cache_evicts_least_recently_used_entries(self):
+        cache = ComponentCache(self.cache_dir, max_size_bytes=2 * len(_COMPONENT_TEXT))
+        cache.put('url1', _COMPONENT_TEXT)
+        cache.put('url2', _COMPONENT_TEXT)
+        for path in Path(self.cache_dir).iterdir():
+            os.utime(str(path), (1, 1))
+        cache.get('url1')
+        cache.put('url3', _COMPONENT_TEXT)
+        self.assertIsNotNone(cache.get('url1'))
+        self.assertIsNone(cache.get('url2'))
+        self.assertIsNotNone(cache.get('url3'))
+
+    def test_load_components(self):
+        def get(url):
+            if 'missing' in url:
+                raise requests.HTTPError('404 Not Found')
+            return _make_response(_COMPONENT_TEXT.replace(b'name: Echo', b'name: ' + url.rsplit('/', 1)[-1].encode()))
+
+        store = self._make_store()
+        with mock.patch.object(requests.Session, 'get', side_effect=get):
+            task_factories = store.load_components_from_urls(['https://example.com/a', 'https://example.com/b'], max_workers=2)
+            self.assertEqual([task_factory.component_spec.name for task_factory in task_factories], ['a', 'b'])
+
+            task_factories = store.load_components(['c', ComponentReference(name='d', tag='v1')])
+            self.assertEqual([task_factory.component_spec.name for task_factory in task_factories], ['component.yaml', 'v1'])
+
+            # All failures are reported together
+            with self.assertRaisesRegex(RuntimeError, r'Failed to load 2 of 3 components:\n.*missing1.*\n.*missing2'):
+                store.load_components_from_urls(['https://example.com/missing1', 'https://example.com/a', 'https://example.com/missing2'])
+
+    def test_load_components_uses_session_per_thread(self):
+        barrier = threading.Barrier(2)
+        sessions = []
+        def get(session, url):
+            barrier.wait(timeout=10)
+            sessions.append(session)
+            return _make_response(_COMPONENT_TEXT)
+
+        cache = ComponentCache(self.cache_dir)
+        store = self._make_store(cache=cache)
+        with mock.patch.object(requests.Session, 'get', autospec=True, side_effect=get):
+            # Both threads download and cache the same URL at the same time.
+            with mock.patch('os.replace', wraps=os.replace) as replace_mock:
+                store.load_components_from_urls(['https://example.com/a', 'https://example.com/a'], max_workers=2)
+        self.assertEqual(len(sessions), 2)
+        self.assertIsNot(sessions[0], sessions[1])
+        tmp_paths = [call[0][0] for call in replace_mock.call_args_list]
+        self.assertEqual(len(tmp_paths), 2)
+        self.assertNotEqual(tmp_paths[0], tmp_paths[1])
+        self.assertIsNotNone(cache.get('https://example.com/a'))
+
+    def test_load_component_from_file_parses_changed_file(self):
+        component_path = os.path.join(self.cache_dir, 'component.yaml')
+        Path(component_path).write_bytes(_COMPONENT_TEXT)
+        store = self._make_store()
+        task_factory1 = store.load_component_from_file(component_path)
+        self.assertIs(store.load_component_from_file(component_path).component_spec, task_factory1.component_spec)
+
+        Path(component_path).write_bytes(_COMPONENT_TEXT.replace(b'name: Echo', b'name: Echo 2'))
+        os.utime(component_path, (1, 1))
+        self.assertEqual(store.load_component_from_file(component_path).component_spec.name, 'Echo 2')
+
+
+if __name__ == '__main__':
+    unittest.main()
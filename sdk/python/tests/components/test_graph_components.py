@@ -16,6 +16,7 @@ import os
 import sys
 import unittest
 from pathlib import Path
+from unittest import mock
 
 
 import kfp.components as comp
@@ -241,7 +242,54 @@ implementation:
         op = comp.load_component_from_text(component_text)
         task = op('graph 1', 'graph 2')
         self.assertEqual(len(task.outputs), 4)
+
+        # The task factories of the graph tasks are only loaded once
+        with mock.patch.object(comp.ComponentStore, '_load_component_from_ref') as load_mock:
+            task = op('graph 3', 'graph 4')
+        load_mock.assert_not_called()
+        self.assertEqual(task.outputs['graph out 3'], 'graph 4')
     
+    def test_graph_task_factories_of_mutable_components_expire(self):
+        component_text = '''\
+inputs:
+- {name: graph in 1}
+outputs:
+- {name: graph out 1}
+implementation:
+  graph:
+    tasks:
+      task 1:
+        componentRef: {url: 'https://example.com/graph-components/mutable/component.yaml'}
+        arguments:
+          in1: {graphInput: {inputName: graph in 1}}
+    outputValues:
+      graph out 1: {taskOutput: {taskId: task 1, outputName: out1}}
+'''
+        child_component_text = b'''\
+name: Child
+inputs:
+- {name: in1}
+outputs:
+- {name: out1}
+implementation:
+  container:
+    image: busybox
+    command: [sh, -c, 'echo "$0" > "$1"', {inputValue: in1}, {outputPath: out1}]
+'''
+        response = mock.Mock()
+        response.content = child_component_text
+        response.raise_for_status.return_value = None
+
+        op = comp.load_component_from_text(component_text)
+        with mock.patch('requests.Session.get', return_value=response) as get_mock:
+            op('a')
+            op('b')
+            self.assertEqual(get_mock.call_count, 1)
+            # The component is loaded again after the store mutable_ttl_seconds
+            with mock.patch('time.time', return_value=10 ** 10):
+                op('c')
+            self.assertEqual(get_mock.call_count, 2)
+
     def test_load_nested_graph_components(self):
         component_text = '''\
 inputs:
@@ -15,6 +15,7 @@
 import os
 import sys
 import unittest
+import unittest.mock
 from pathlib import Path
 
 from typing import List, Dict, Union, Optional
@@ -244,6 +245,71 @@ class StructureModelBaseTestCase(unittest.TestCase):
         
         self.assertNotEqual(A(1, 2), B(1, 2))
 
+    def test_handle_from_dict_for_union_of_classes(self):
+        class InputRef(ModelBase):
+            _serialized_names = {'input_name': 'inputName'}
+            def __init__(self, input_name: str):
+                super().__init__(locals())
+
+        class OutputRef(ModelBase):
+            _serialized_names = {'output_name': 'outputName'}
+            def __init__(self, output_name: str, optional: Optional[str] = None):
+                super().__init__(locals())
+
+        class AnyRef(ModelBase):
+            def __init__(self, optional: Optional[str] = None):
+                super().__init__(locals())
+
+        class OtherRef(ModelBase):
+            def __init__(self, optional: Optional[str] = None):
+                super().__init__(locals())
+
+        class Holder(ModelBase):
+            def __init__(self, value: Union[str, int, InputRef, OutputRef], ambiguous: Optional[Union[OutputRef, AnyRef, OtherRef]] = None):
+                super().__init__(locals())
+
+        # The member class is chosen by the structure keys without trying the other classes
+        from kfp.components import modelbase
+        with unittest.mock.patch.object(modelbase, 'parse_object_from_struct_based_on_class_init', wraps=modelbase.parse_object_from_struct_based_on_class_init) as parse_mock:
+            self.assertEqual(Holder.from_dict({'value': {'inputName': 'in'}}).value, InputRef('in'))
+        self.assertEqual([call[0][0] for call in parse_mock.call_args_list], [Holder, InputRef])
+        self.assertEqual(Holder.from_dict({'value': {'outputName': 'out', 'optional': 'x'}}).value, OutputRef('out', 'x'))
+        self.assertEqual(Holder.from_dict({'value': True}).value, True)
+        self.assertEqual(Holder.from_dict({'value': {'outputName': 'out'}}).to_dict(), {'value': {'outputName': 'out'}})
+
+        with self.assertRaises(TypeError):
+            Holder.from_dict({'value': {'inputName': 'in', 'outputName': 'out'}})
+
+        with self.assertRaises(TypeError):
+            Holder.from_dict({'value': 1.5})
+
+        # The ambiguous structures are still rejected
+        self.assertEqual(Holder.from_dict({'value': 1, 'ambiguous': {'outputName': 'out'}}).ambiguous, OutputRef('out'))
+        with self.assertRaisesRegex(TypeError, 'ambiguous'):
+            Holder.from_dict({'value': 1, 'ambiguous': {'optional': 'x'}})
+
+    def test_skip_type_verification(self):
+        from kfp.components.modelbase import _skip_type_verification
+        with _skip_type_verification():
+            self.assertEqual(TestModel1(prop_0=1).prop_0, 1)
+            with _skip_type_verification():
+                pass
+            self.assertEqual(TestModel1(prop_0=None).prop_0, None)
+
+            # The objects parsed from structures are still verified
+            with self.assertRaises(TypeError):
+                TestModel1.from_dict({'prop_0': 1})
+
+        with self.assertRaises(TypeError):
+            TestModel1(prop_0=1)
+
+        with self.assertRaises(TypeError):
+            with _skip_type_verification():
+                raise TypeError()
+        with self.assertRaises(TypeError):
+            TestModel1(prop_0=1)
+
+
 
 if __name__ == '__main__':
     unittest.main()
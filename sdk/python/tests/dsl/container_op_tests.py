@@ -49,6 +49,36 @@ class TestContainerOp(unittest.TestCase):
 
     kfp.compiler.Compiler()._compile(my_pipeline)
 
+  def test_inputs_tracking(self):
+    """Test that the inputs follow the changes of the op attributes."""
+    param1 = kfp.dsl.PipelineParam('param1')
+    param2 = kfp.dsl.PipelineParam('param2')
+    param3 = kfp.dsl.PipelineParam('param3')
+    param4 = kfp.dsl.PipelineParam('param4')
+    sidecar = Sidecar(name='sidecar', image='image')
+    op = ContainerOp(name='op1', image='image', arguments=['echo %s' % param1]).add_sidecar(sidecar)
+    self.assertCountEqual([x.name for x in op.inputs], ['param1'])
+
+    # Attached with the add_* methods
+    op.add_pod_label('label', param2)
+    op.container.add_env_variable(V1EnvVar(name='env', value=str(param3)))
+    op.container.set_memory_limit(param3)
+    self.assertCountEqual([x.name for x in op.inputs], ['param1', 'param2', 'param3'])
+
+    # Replaced attributes
+    op.arguments = ['echo %s' % param4]
+    sidecar.image = str(param1)
+    self.assertCountEqual([x.name for x in op.inputs], ['param1', 'param2', 'param3', 'param4'])
+    op.pod_labels = {}
+    sidecar.image = 'image'
+    self.assertCountEqual([x.name for x in op.inputs], ['param3', 'param4'])
+
+    # Explicitly set inputs are kept until the op changes
+    op.inputs = [param1]
+    self.assertCountEqual([x.name for x in op.inputs], ['param1'])
+    op.add_pod_annotation('annotation', param2)
+    self.assertCountEqual([x.name for x in op.inputs], ['param2', 'param3', 'param4'])
+
   def test_after_op(self):
     """Test duplicate ops."""
     op1 = ContainerOp(name='op1', image='image')
@@ -37,6 +37,22 @@ class TestPipelineParam(unittest.TestCase):
     p = PipelineParam(name='param3', value='value3')
     self.assertEqual('{{pipelineparam:op=;name=param3}}', str(p))
 
+  def test_rename(self):
+    """Test that the derived names follow the name changes."""
+    p = PipelineParam(name='param 1', op_name='op 1')
+    self.assertFalse(hasattr(p, '__dict__'))
+    self.assertEqual(p.full_name, 'op 1-param 1')
+    p.name = 'param-1'
+    p.op_name = 'op-1'
+    self.assertEqual(p.full_name, 'op-1-param-1')
+    self.assertEqual(str(p), '{{pipelineparam:op=op-1;name=param-1}}')
+    self.assertEqual(hash(p), hash(PipelineParam(name='param-1', op_name='op-1')))
+    # The pattern is the string the param was created from
+    self.assertEqual(p.pattern, '{{pipelineparam:op=op 1;name=param 1}}')
+    p.op_name = None
+    self.assertEqual(p.full_name, 'param-1')
+    self.assertEqual(str(p), '{{pipelineparam:op=;name=param-1}}')
+
   def test_extract_pipelineparams(self):
     """Test _extract_pipeleineparams."""
 
@@ -33,6 +33,16 @@ class TestPipeline(unittest.TestCase):
     self.assertEqual(p.ops['op1'].name, 'op1')
     self.assertEqual(p.ops['op2'].name, 'op2')
 
+  def test_unique_op_names(self):
+    """Test that the ops with the same name get unique names."""
+    with Pipeline('somename') as p:
+      ops = [ContainerOp(name='train', image='image') for _ in range(3)]
+      ContainerOp(name='train 5', image='image')
+      ops.extend(ContainerOp(name='train', image='image') for _ in range(3))
+
+    self.assertEqual([op.name for op in ops], ['train', 'train 2', 'train 3', 'train 4', 'train 6', 'train 7'])
+    self.assertEqual(len(p.ops), 7)
+
   def test_nested_pipelines(self):
     """Test nested pipelines"""
     with self.assertRaises(Exception):